@@ -1,39 +1,155 @@
+import json
 import os
 import subprocess
 import time
-from flask import Flask, request, jsonify, send_from_directory
+import torch
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
 from dotenv import load_dotenv
-from werkzeug.utils import secure_filename
-from scripts.transcribe_video import transcribe_video
+from scripts.transcribe_video import transcript_cache_stats
+from scripts.transcription_backends import BACKENDS, get_backend
 from scripts.record_video import record_video
-from scripts.convert_audio_to_video import convert_audio_to_video
+from scripts.model_backends import DEFAULT_BACKEND, variant_path
+from scripts.inference import get_model, input_lengths, translate_batch
+from scripts.batch_translator import BatchTranslator
+from scripts.translation_cache import TranslationCache, normalize_text
+from scripts.segmentation import segment_for_translation
+from scripts.decoding_policy import get_policy
+from scripts.translation_streaming import LatencyRecorder, stream_translation
+from scripts.process_stats import memory_usage
+from scripts.job_queue import JobManager, JobQueueFull, FINISHED_STATES, create_job_store
+from scripts.upload_scratch import (
+    ScratchSpace,
+    scratch_request_class,
+    upload_path,
+    keep_upload,
+    cleanup_request_files,
+)
 
 # --- Initialization ---
 load_dotenv()
 app = Flask(__name__, static_folder='new_frontend/dist')
 CORS(app)
 
+# Uploads are streamed into a managed scratch space and removed when the request ends
+scratch = ScratchSpace(
+    directory=os.getenv("UPLOAD_DIR", "temp_uploads"),
+    memory_directory=os.getenv("UPLOAD_MEMORY_DIR") or None,
+    memory_threshold=int(os.getenv("UPLOAD_MEMORY_THRESHOLD", str(8 * 1024 * 1024))),
+    max_total_bytes=int(os.getenv("UPLOAD_SCRATCH_QUOTA", str(2 * 1024 * 1024 * 1024))),
+    max_age=float(os.getenv("UPLOAD_MAX_AGE", "14400")),
+)
+app.request_class = scratch_request_class(scratch)
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv("UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+scratch.start_sweeper()
+
+@app.teardown_request
+def remove_request_uploads(exc):
+    cleanup_request_files(scratch)
+
 # Load Translation Model
 model_path = "./results/final_model"
-tokenizer = AutoTokenizer.from_pretrained(model_path)
-model = AutoModelForSeq2SeqLM.from_pretrained(model_path)
-
-def translate_text(text, model, tokenizer):
-    prompt = f"Translate the following Caribbean dialect phrase to standard English: \"{text}\""
-    inputs = tokenizer(prompt, return_tensors="pt", padding=True, truncation=True)
-    
-    output_sequences = model.generate(
-        input_ids=inputs['input_ids'],
-        attention_mask=inputs['attention_mask'],
-        max_length=100,
-        num_beams=5,
-        early_stopping=True
-    )
-    
-    translation = tokenizer.decode(output_sequences[0], skip_special_tokens=True)
-    return translation.strip()
+model_backend = DEFAULT_BACKEND
+tokenizer, model = get_model(model_path, model_backend)
+
+# Beam width and output length are chosen per input by the decoding policy
+decoding_policy = get_policy(os.getenv("DECODING_POLICY"))
+
+GENERATION_PARAMS = {
+    "max_length": 100,
+    "num_beams": 5,
+    "early_stopping": True,
+}
+
+def generation_settings(texts, latency_budget_ms=None):
+    """Returns the decoding policy's `generate` settings for each text."""
+    return [decoding_policy.settings(length, latency_budget_ms) for length in input_lengths(texts, tokenizer)]
+
+# Concurrent requests are grouped into a single generate call
+translator = BatchTranslator(
+    lambda texts, **generation_params: translate_batch(texts, tokenizer, model, **(generation_params or GENERATION_PARAMS)),
+    max_batch_size=int(os.getenv("BATCH_MAX_SIZE", "8")),
+    max_wait_ms=float(os.getenv("BATCH_MAX_WAIT_MS", "10")),
+)
+
+# Repeated phrases are served from memory or disk instead of the model
+translation_cache = TranslationCache(
+    variant_path(model_path, model_backend),
+    GENERATION_PARAMS,
+    db_path=os.getenv("TRANSLATION_CACHE_PATH", "cache/translations.sqlite3"),
+    max_memory_entries=int(os.getenv("TRANSLATION_CACHE_SIZE", "4096")),
+    max_disk_entries=int(os.getenv("TRANSLATION_CACHE_DISK_SIZE", "200000")),
+)
+
+def translate_cached(text, latency_budget_ms=None):
+    """
+    Translates text sentence by sentence so long transcripts are neither truncated nor cut short.
+    Cached sentences are reused, and the rest are queued together to share batches.
+
+    Args:
+        text (str): The text to translate.
+        latency_budget_ms (float, optional): Lets the decoding policy trade beams for speed.
+    """
+    # Segment before normalizing, which would fold line breaks between utterances into spaces
+    chunks = [normalize_text(chunk) for chunk in segment_for_translation(text, tokenizer)]
+    settings = generation_settings(chunks, latency_budget_ms)
+    translations = [translation_cache.get(chunk, params) for chunk, params in zip(chunks, settings)]
+    missing = [i for i, translation in enumerate(translations) if translation is None]
+    if missing:
+        results = translator.translate_many([chunks[i] for i in missing], [settings[i] for i in missing])
+        for i, translation in zip(missing, results):
+            translations[i] = translation
+            translation_cache.put(chunks[i], translation, settings[i])
+    return " ".join(translations)
+
+def parse_latency_budget(values):
+    """Reads the optional latency_budget_ms field, raising ValueError if it is not a positive number."""
+    budget = values.get('latency_budget_ms')
+    if budget in (None, ''):
+        return None
+    budget = float(budget)
+    if budget <= 0:
+        raise ValueError("latency_budget_ms must be positive.")
+    return budget
+
+# Latency of /api/translate/stream, as seen by the user
+time_to_first_token = LatencyRecorder()
+stream_total_time = LatencyRecorder()
+MAX_STREAMING_BEAMS = int(os.getenv("MAX_STREAMING_BEAMS", "2"))
+
+def transcribe_media(file_path, content_type, backend=None):
+    """Transcribes an uploaded audio or video file with the chosen (or default) backend."""
+    return get_backend(backend).transcribe(file_path, content_type)
+
+def run_media_job(payload):
+    raw_transcript = transcribe_media(payload["file_path"], payload["content_type"], payload.get("backend"))
+    if not raw_transcript:
+        raise RuntimeError("Could not extract text from input.")
+    return {
+        "original": raw_transcript,
+        "translated": translate_cached(raw_transcript),
+    }
+
+def remove_job_upload(payload):
+    scratch.remove(payload["file_path"])
+
+# Media uploads submitted to /api/jobs run on a bounded background pool
+job_manager = JobManager(
+    run_media_job,
+    store=create_job_store(os.getenv("JOB_STORE", "memory"), os.getenv("JOB_STORE_PATH")),
+    max_workers=int(os.getenv("JOB_WORKERS", "2")),
+    max_queued=int(os.getenv("JOB_QUEUE_LIMIT", "16")),
+)
+
+def public_job(job):
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "result": job["result"],
+        "error": job["error"],
+    }
 
 # --- API Routes ---
 @app.route('/')
@@ -50,36 +166,27 @@ def translate():
     files = request.files
     raw_transcript = ""
 
+    backend = data.get('backend')
+    if backend and backend not in BACKENDS:
+        return jsonify({"error": f"Unknown transcription backend '{backend}'."}), 400
+    try:
+        latency_budget_ms = parse_latency_budget(data)
+    except ValueError:
+        return jsonify({"error": "latency_budget_ms must be a positive number."}), 400
+
     try:
         if 'text' in data:
             raw_transcript = data['text']
         elif 'file' in files:
             file = files['file']
-            upload_folder = 'temp_uploads'
-            os.makedirs(upload_folder, exist_ok=True)
-            filename = secure_filename(file.filename)
-            file_path = os.path.join(upload_folder, filename)
-            file.save(file_path)
-
-            if file.content_type.startswith('audio/'):
-                video_path = os.path.join(upload_folder, f"{os.path.splitext(filename)[0]}.mp4")
-                if convert_audio_to_video(file_path, video_path):
-                    raw_transcript = transcribe_video(video_path)
-                    os.remove(video_path)
-                else:
-                    os.remove(file_path)
-                    return jsonify({"error": "Failed to convert audio to video."}), 500
-            else:
-                raw_transcript = transcribe_video(file_path)
-            
-            os.remove(file_path)
+            raw_transcript = transcribe_media(upload_path(file), file.content_type, backend)
         else:
             return jsonify({"error": "No input provided."}), 400
 
         if not raw_transcript:
             return jsonify({"error": "Could not extract text from input."}), 400
 
-        translated_text = translate_text(raw_transcript, model, tokenizer)
+        translated_text = translate_cached(raw_transcript, latency_budget_ms)
         
         return jsonify({
             "original": raw_transcript,
@@ -90,27 +197,98 @@ def translate():
         print(f"Error during translation: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/translate/stream', methods=['GET', 'POST'])
+def translate_stream():
+    text = request.values.get('text', '').strip()
+    if not text:
+        return jsonify({"error": "No input provided."}), 400
+    try:
+        num_beams = int(request.values.get('num_beams', 1))
+    except ValueError:
+        return jsonify({"error": "num_beams must be an integer."}), 400
+    if not 1 <= num_beams <= MAX_STREAMING_BEAMS:
+        return jsonify({"error": f"num_beams must be between 1 and {MAX_STREAMING_BEAMS} when streaming."}), 400
+
+    started = time.perf_counter()
+    # Long input is streamed sentence by sentence, as translate_cached translates it, so it is not
+    # truncated at the model's input limit
+    chunks = [normalize_text(chunk) for chunk in segment_for_translation(text, tokenizer)]
+    # The policy picks the output length; the caller picks the beams, which bound streaming
+    settings = generation_settings(chunks)
+    for params in settings:
+        params["num_beams"] = num_beams
+        if num_beams > 1:
+            params["early_stopping"] = True
+        else:
+            params.pop("early_stopping", None)
+
+    def event(name, payload):
+        return f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+
+    def stream():
+        first_token_at = None
+        translations = []
+        try:
+            for i, (chunk, params) in enumerate(zip(chunks, settings)):
+                # A cached translation is sent at once as a single piece
+                cached = translation_cache.get(chunk, params)
+                source = [cached] if cached is not None else stream_translation(
+                    chunk, model, tokenizer, num_beams=num_beams, max_length=params["max_length"]
+                )
+                pieces = []
+                for piece in source:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        time_to_first_token.record(first_token_at - started)
+                    # Chunks are joined with a space, as translate_cached joins them
+                    if i and not pieces:
+                        piece = " " + piece.lstrip()
+                    pieces.append(piece)
+                    yield event("token", {"text": piece})
+                translation = "".join(pieces).strip()
+                if cached is None:
+                    translation_cache.put(chunk, translation, params)
+                translations.append(translation)
+        except Exception as e:
+            print(f"Error during streaming translation: {e}")
+            yield event("error", {"error": str(e)})
+            return
+
+        finished = time.perf_counter()
+        stream_total_time.record(finished - started)
+        yield event("done", {
+            "original": " ".join(chunks),
+            "translated": " ".join(translations),
+            "time_to_first_token_ms": 1000 * ((first_token_at or finished) - started),
+            "total_ms": 1000 * (finished - started),
+        })
+
+    return Response(stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.route('/api/record', methods=['POST'])
 def record_and_transcribe():
+    backend = request.form.get('backend')
+    if backend and backend not in BACKENDS:
+        return jsonify({"error": f"Unknown transcription backend '{backend}'."}), 400
+
     try:
-        output_folder = 'temp_recordings'
-        os.makedirs(output_folder, exist_ok=True)
-        video_path = os.path.join(output_folder, f"recording_{int(time.time())}.mp4")
-        
-        # Record video
-        record_video(video_path, duration=10)
-        
-        # Transcribe video
-        raw_transcript = transcribe_video(video_path)
-        
-        # Clean up the recorded file
-        os.remove(video_path)
+        video_path = scratch.new_path(suffix=".mp4")
+        try:
+            # Record video
+            record_video(video_path, duration=10)
+            scratch.settle(video_path)
+
+            # Transcribe video
+            raw_transcript = transcribe_media(video_path, "video/mp4", backend)
+        finally:
+            # Clean up the recorded file
+            scratch.remove(video_path)
         
         if not raw_transcript:
             return jsonify({"error": "Could not transcribe the recording."}), 400
             
         # Translate the transcript
-        translated_text = translate_text(raw_transcript, model, tokenizer)
+        translated_text = translate_cached(raw_transcript)
         
         return jsonify({
             "original": raw_transcript,
@@ -121,5 +299,72 @@ def record_and_transcribe():
         print(f"Error during recording/transcription: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    if 'file' not in request.files:
+        return jsonify({"error": "No file provided."}), 400
+
+    backend = request.form.get('backend')
+    if backend and backend not in BACKENDS:
+        return jsonify({"error": f"Unknown transcription backend '{backend}'."}), 400
+
+    file = request.files['file']
+    payload = {"file_path": upload_path(file), "content_type": file.content_type, "backend": backend}
+    try:
+        job_id = job_manager.submit(payload, on_finish=remove_job_upload)
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    # The job now owns the upload and removes it when it finishes
+    keep_upload(file)
+
+    return jsonify({"job_id": job_id, "status_url": f"/api/jobs/{job_id}"}), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(public_job(job))
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    if job_manager.get(job_id) is None:
+        return jsonify({"error": "Job not found."}), 404
+
+    def stream():
+        since = 0
+        while True:
+            job = job_manager.wait_for_update(job_id, since)
+            if job is None:
+                return
+            if job["updated_at"] > since:
+                since = job["updated_at"]
+                yield f"data: {json.dumps(public_job(job))}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            if job["status"] in FINISHED_STATES:
+                return
+
+    return Response(stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    return jsonify({
+        "batching": translator.stats(),
+        "cache": translation_cache.stats(),
+        "transcripts": transcript_cache_stats(),
+        "scratch": scratch.stats(),
+        "worker": {
+            "pid": os.getpid(),
+            "model_backend": model_backend,
+            "torch_threads": torch.get_num_threads(),
+            "memory": memory_usage(),
+        },
+        "streaming": {
+            "time_to_first_token": time_to_first_token.summary(),
+            "total": stream_total_time.summary(),
+        },
+    })
+
 if __name__ == "__main__":
     app.run(debug=True, port=5002)
\ No newline at end of file
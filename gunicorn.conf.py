@@ -0,0 +1,55 @@
+# Gunicorn settings for serving app.py in production:
+#     gunicorn -c gunicorn.conf.py app:app
+#
+# The app, including the translation model, is loaded once in the master process and
+# the workers are forked from it, so they share the model weights copy-on-write instead
+# of each loading its own copy. Each worker gets an explicit torch thread count so that
+# N workers on an M-core machine do not oversubscribe the CPU.
+#
+# Media jobs (POST /api/jobs) are polled with later requests that may land on any worker,
+# so with more than one worker their state must live in a store every worker can read.
+# JOB_STORE therefore defaults to sqlite here, and the in-memory store is refused.
+import gc
+import os
+from scripts.process_stats import memory_usage, threads_per_worker
+
+bind = os.getenv("BIND", "0.0.0.0:5002")
+workers = int(os.getenv("WEB_WORKERS", "2"))
+# Several threads per worker let concurrent requests meet in the batching scheduler
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "8"))
+preload_app = True
+# Transcription requests can take minutes
+timeout = int(os.getenv("WEB_TIMEOUT", "600"))
+pidfile = os.getenv("WEB_PIDFILE", "gunicorn.pid")
+
+# Set before the app is preloaded, since app.py creates its job store on import
+if workers > 1:
+    os.environ.setdefault("JOB_STORE", "sqlite")
+    if os.environ["JOB_STORE"] == "memory":
+        raise RuntimeError("JOB_STORE=memory cannot be used with more than one worker: each worker would have "
+                           "its own copy of the jobs. Use JOB_STORE=sqlite or file, or set WEB_WORKERS=1.")
+
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", "0")) or threads_per_worker(workers)
+
+def when_ready(server):
+    # Move everything loaded so far out of the garbage collector's reach, so collections
+    # in the workers do not write to (and un-share) the pages holding those objects
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Master {os.getpid()} ready with {memory_usage().get('rss_mb', 0):.0f} MB RSS; "
+                    f"forking {workers} workers with {TORCH_THREADS} torch threads each")
+
+def post_fork(server, worker):
+    import torch
+    torch.set_num_threads(TORCH_THREADS)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only allowed before any inter-op parallel work has started
+        pass
+
+    # Background threads do not survive a fork, so restart them in the worker
+    import app
+    app.scratch.start_sweeper()
+    server.log.info(f"Worker {worker.pid} using {TORCH_THREADS} torch threads")
@@ -0,0 +1,153 @@
+# This module provides a micro-batching scheduler for the translation model.
+# Concurrent translation requests are collected for a few milliseconds,
+# translated together in a single padded `generate` call, and the results
+# are handed back to the requests that are waiting for them.
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+class BatchTranslator:
+    """
+    Collects concurrent translation requests and runs them as one batch.
+    Requests with different generation settings are never mixed in the same batch, except for
+    max_length: texts of different lengths share a batch, which gets the largest max_length any
+    of them asked for, so no text is cut shorter than its own settings allow.
+
+    Args:
+        translate_batch_fn (callable): Takes a list of texts, plus any generation settings as
+            keyword arguments, and returns a list of translations in the same order.
+        max_batch_size (int): The maximum number of texts sent to the model in one call.
+        max_wait_ms (float): How long the first request of a batch waits for others to join it.
+    """
+
+    def __init__(self, translate_batch_fn, max_batch_size=8, max_wait_ms=10):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.translate_batch_fn = translate_batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+        self._worker_pid = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._batch_sizes = Counter()
+        self._requests = 0
+        self._total_queue_wait = 0.0
+        self._total_batch_time = 0.0
+
+    def _ensure_worker(self):
+        """Starts the batching thread lazily, and again in a forked child process."""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return self._queue
+            self._queue = queue.Queue()
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, args=(self._queue,), daemon=True)
+            self._worker.start()
+            return self._queue
+
+    def submit(self, text, settings=None):
+        """
+        Queues a single text for translation and returns a Future for the result.
+
+        Args:
+            text (str): The text to translate.
+            settings (dict, optional): Generation settings passed to translate_batch_fn.
+        """
+        future = Future()
+        settings = dict(settings or {})
+        max_length = settings.pop("max_length", None)
+        key = tuple(sorted(settings.items()))
+        self._ensure_worker().put((text, future, time.monotonic(), key, max_length))
+        return future
+
+    def translate(self, text, settings=None, timeout=None):
+        """Translates a single text, blocking until its batch has been processed."""
+        return self.submit(text, settings).result(timeout=timeout)
+
+    def translate_many(self, texts, settings=None, timeout=None):
+        """
+        Queues several texts at once so they can share batches, and returns them in order.
+
+        Args:
+            texts (list): The texts to translate.
+            settings (list, optional): Generation settings for each text.
+        """
+        settings = settings or [None] * len(texts)
+        futures = [self.submit(text, text_settings) for text, text_settings in zip(texts, settings)]
+        return [future.result(timeout=timeout) for future in futures]
+
+    def _run(self, work_queue):
+        max_wait = self.max_wait_ms / 1000.0
+        while True:
+            batch = [work_queue.get()]
+            deadline = time.monotonic() + max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(work_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Split the collected requests by generation settings, keeping arrival order
+            groups = {}
+            for item in batch:
+                groups.setdefault(item[3], []).append(item)
+            for key, group in groups.items():
+                self._process_batch(group, key)
+
+    def _process_batch(self, batch, key=()):
+        texts = [item[0] for item in batch]
+        settings = dict(key)
+        max_lengths = [item[4] for item in batch if item[4] is not None]
+        if max_lengths:
+            # The longest text's max_length covers every shorter text in the batch
+            settings["max_length"] = max(max_lengths)
+        started = time.monotonic()
+        try:
+            translations = self.translate_batch_fn(texts, **settings)
+            if len(translations) != len(texts):
+                raise RuntimeError(f"Expected {len(texts)} translations, got {len(translations)}")
+        except Exception as e:
+            for item in batch:
+                item[1].set_exception(e)
+            translations = None
+        finished = time.monotonic()
+
+        if translations is not None:
+            for item, translation in zip(batch, translations):
+                item[1].set_result(translation)
+
+        with self._lock:
+            self._batch_sizes[len(batch)] += 1
+            self._requests += len(batch)
+            self._total_queue_wait += sum(started - item[2] for item in batch)
+            self._total_batch_time += finished - started
+
+    def stats(self):
+        """Returns the batch-size distribution and timing achieved so far."""
+        with self._lock:
+            batches = sum(self._batch_sizes.values())
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "requests": self._requests,
+                "batches": batches,
+                "mean_batch_size": self._requests / batches if batches else 0.0,
+                "batch_size_distribution": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+                "mean_queue_wait_ms": 1000 * self._total_queue_wait / self._requests if self._requests else 0.0,
+                "mean_batch_time_ms": 1000 * self._total_batch_time / batches if batches else 0.0,
+            }
+
+    def reset_stats(self):
+        """Clears the collected statistics, e.g. after a warm-up period."""
+        with self._lock:
+            self._reset_stats()
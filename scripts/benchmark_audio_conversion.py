@@ -0,0 +1,89 @@
+# This script benchmarks the audio-to-video conversion profiles.
+# It converts each sample clip with every profile and reports the wall time
+# and output size, so the cheapest profile the transcription backend accepts can be chosen.
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.convert_audio_to_video import PROFILES, convert_audio_to_video
+
+def generate_sample_clips(output_dir, durations=(5, 30, 120)):
+    """Generates sine-wave clips of the given durations in seconds, in WAV and AAC form."""
+    clips = []
+    for duration in durations:
+        for extension, codec_args in (("wav", []), ("m4a", ['-c:a', 'aac'])):
+            clip_path = os.path.join(output_dir, f"sample_{duration}s.{extension}")
+            command = [
+                'ffmpeg', '-f', 'lavfi', '-i', f"sine=frequency=440:duration={duration}",
+                *codec_args, '-y', clip_path
+            ]
+            subprocess.run(command, check=True, capture_output=True)
+            clips.append(clip_path)
+    return clips
+
+def benchmark(clips, profiles, repeat=3):
+    """
+    Converts every clip with every profile and returns one result row per pair.
+
+    Each row holds the best wall time over `repeat` runs and the output size in bytes.
+    """
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="conversion_benchmark_")
+    try:
+        for clip in clips:
+            for profile in profiles:
+                output_path = os.path.join(work_dir, f"{os.path.basename(clip)}.{profile}.mp4")
+                timings = []
+                succeeded = True
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    succeeded = convert_audio_to_video(clip, output_path, profile)
+                    timings.append(time.perf_counter() - start)
+                    if not succeeded:
+                        break
+                results.append({
+                    "clip": os.path.basename(clip),
+                    "clip_bytes": os.path.getsize(clip),
+                    "profile": profile,
+                    "ok": succeeded,
+                    "seconds": min(timings),
+                    "output_bytes": os.path.getsize(output_path) if succeeded else 0,
+                })
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def print_results(results):
+    print(f"\n{'clip':<24} {'profile':<8} {'time (s)':>9} {'output (KB)':>12} {'vs clip':>8}")
+    for row in results:
+        if not row["ok"]:
+            print(f"{row['clip']:<24} {row['profile']:<8} {'failed':>9}")
+            continue
+        ratio = row["output_bytes"] / row["clip_bytes"] if row["clip_bytes"] else 0.0
+        print(f"{row['clip']:<24} {row['profile']:<8} {row['seconds']:>9.3f} "
+              f"{row['output_bytes'] / 1024:>12.1f} {ratio:>7.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark audio-to-video conversion profiles.")
+    parser.add_argument("clips", nargs="*", help="Audio clips to convert. Sine-wave samples are generated if omitted.")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES),
+                        help="The profiles to compare.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per clip and profile; the fastest is reported.")
+    args = parser.parse_args()
+
+    sample_dir = None
+    clips = args.clips
+    if not clips:
+        sample_dir = tempfile.mkdtemp(prefix="conversion_samples_")
+        print("No clips given, generating sample clips...")
+        clips = generate_sample_clips(sample_dir)
+
+    try:
+        print_results(benchmark(clips, args.profiles, repeat=args.repeat))
+    finally:
+        if sample_dir:
+            shutil.rmtree(sample_dir, ignore_errors=True)
@@ -0,0 +1,59 @@
+# This script benchmarks get_youtube_comments.py against the local mock of the YouTube
+# Data API, comparing comment throughput for several worker counts. The first count is
+# the baseline the others are compared against.
+#
+#     python scripts/benchmark_comment_harvest.py --workers 1 4 8 16 --latency-ms 80
+import argparse
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.get_youtube_comments import get_youtube_comments
+from scripts.mock_youtube_api import MockYouTubeData, start_mock_server
+
+CHANNELS = ['WhatYuhKnow', 'MachelMontano', 'BujuBanton', 'Aytian']
+
+def benchmark(worker_counts, videos_per_channel=10, comments_per_video=250, max_comments=500, latency_ms=50,
+              error_rate=0.0, requests_per_second=200.0):
+    """Harvests the same mock channels once per worker count and prints a comparison."""
+    data = MockYouTubeData(CHANNELS, videos_per_channel, comments_per_video)
+    server = start_mock_server(data, latency_ms=latency_ms, error_rate=error_rate)
+    print(f"Mock API at {server.base_url}: {len(CHANNELS)} channels, {videos_per_channel} videos each, "
+          f"{comments_per_video} comments per video, {latency_ms:.0f} ms latency, {error_rate:.0%} errors")
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for workers in worker_counts:
+                print(f"\n--- {workers} workers ---")
+                results.append((workers, get_youtube_comments(
+                    "mock", CHANNELS, os.path.join(temp_dir, f"comments_{workers}.csv"), server.base_url,
+                    workers=workers, max_comments_per_video=max_comments, max_videos_per_channel=videos_per_channel,
+                    requests_per_second=requests_per_second, quota_units=10 ** 9,
+                    state_file=os.path.join(temp_dir, f"crawl_state_{workers}.json"),
+                )))
+    finally:
+        server.shutdown()
+
+    baseline = results[0][1]
+    baseline_rate = baseline["comments"] / baseline["elapsed_s"] if baseline["elapsed_s"] else 0.0
+    print(f"\n{'workers':>7} {'comments':>9} {'requests':>9} {'retries':>8} {'time (s)':>9} {'comments/s':>11} {'speedup':>8}")
+    for workers, stats in results:
+        rate = stats["comments"] / stats["elapsed_s"] if stats["elapsed_s"] else 0.0
+        print(f"{workers:>7} {stats['comments']:>9} {stats['requests']:>9} {stats['retries']:>8} "
+              f"{stats['elapsed_s']:>9.2f} {rate:>11.0f} {rate / baseline_rate if baseline_rate else 0.0:>7.2f}x")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark comment harvesting against a local mock API.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16], help="Worker counts to compare.")
+    parser.add_argument("--videos-per-channel", type=int, default=10, help="Videos per mock channel.")
+    parser.add_argument("--comments-per-video", type=int, default=250, help="Comments per mock video.")
+    parser.add_argument("--max-comments", type=int, default=500, help="The per-video comment cap.")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Delay the mock adds to every response.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests the mock fails with a 429.")
+    parser.add_argument("--requests-per-second", type=float, default=200.0, help="The harvester's rate limit.")
+    args = parser.parse_args()
+
+    benchmark(args.workers, args.videos_per_channel, args.comments_per_video, args.max_comments, args.latency_ms,
+              args.error_rate, args.requests_per_second)
@@ -0,0 +1,125 @@
+# This script load-tests a running server and reports aggregate throughput,
+# request latency and the memory used by each worker process.
+#
+# Start the server first, e.g. `gunicorn -c gunicorn.conf.py app:app`, then run
+#     python scripts/benchmark_serving.py --concurrency 16 --duration 30
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.process_stats import child_pids, memory_usage
+
+DEFAULT_PHRASES = [
+    "Wah gwan",
+    "Me deh yah, yuh know",
+    "Mi nuh know wah yuh a talk bout",
+    "Ah going by meh tantie later",
+    "Dem pickney deh a mek too much noise",
+    "Wha yuh a seh?",
+]
+
+def load_phrases(path):
+    """Loads phrases from a text file (one per line) or a validation JSONL file."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            phrases = []
+            for line in f:
+                prompt = json.loads(line)["input_text"]
+                phrases.append(prompt.split('"')[1] if '"' in prompt else prompt)
+            return phrases
+        return [line.strip() for line in f if line.strip()]
+
+def send_translation(url, text, timeout=600):
+    data = urllib.parse.urlencode({"text": text}).encode("utf-8")
+    with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=timeout) as response:
+        return json.loads(response.read())
+
+def run_load(url, phrases, concurrency, duration, unique=True):
+    """Keeps `concurrency` requests in flight for `duration` seconds and returns the latencies."""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(10 ** 9))
+    deadline = time.monotonic() + duration
+
+    def client():
+        while time.monotonic() < deadline:
+            with lock:
+                n = next(counter)
+            text = phrases[n % len(phrases)]
+            if unique:
+                # A distinct suffix keeps the translation cache from answering
+                text = f"{text} {n}"
+            start = time.perf_counter()
+            try:
+                send_translation(url, text)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    return latencies, errors, time.perf_counter() - started
+
+def read_pidfile(path):
+    try:
+        with open(path, "r") as f:
+            return int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+def print_memory(master_pid):
+    pids = child_pids(master_pid)
+    print(f"\n{'process':<18} {'RSS (MB)':>10} {'PSS (MB)':>10} {'shared (MB)':>12} {'private (MB)':>13}")
+    total_pss = 0.0
+    for label, pid in [("master", master_pid)] + [("worker", pid) for pid in pids]:
+        usage = memory_usage(pid)
+        if not usage:
+            print(f"{label} {pid:<11} unavailable")
+            continue
+        total_pss += usage["pss_mb"]
+        print(f"{label} {pid:<11} {usage['rss_mb']:>10.0f} {usage['pss_mb']:>10.0f} "
+              f"{usage['shared_mb']:>12.0f} {usage['private_mb']:>13.0f}")
+    print(f"Combined footprint (sum of PSS): {total_pss:.0f} MB across {len(pids)} workers")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure serving throughput and per-worker memory.")
+    parser.add_argument("--url", default="http://127.0.0.1:5002/api/translate", help="The translate endpoint.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests kept in flight at once.")
+    parser.add_argument("--duration", type=float, default=30, help="How long to generate load, in seconds.")
+    parser.add_argument("--phrases", help="A text file (one phrase per line) or validation JSONL file.")
+    parser.add_argument("--allow-cache", action="store_true", help="Repeat phrases verbatim so the cache can answer.")
+    parser.add_argument("--pidfile", default="gunicorn.pid", help="The gunicorn pidfile, used to find the workers.")
+    args = parser.parse_args()
+
+    phrases = load_phrases(args.phrases) if args.phrases else DEFAULT_PHRASES
+    print(f"Sending requests to {args.url} with concurrency {args.concurrency} for {args.duration:.0f}s...")
+    latencies, errors, elapsed = run_load(args.url, phrases, args.concurrency, args.duration,
+                                          unique=not args.allow_cache)
+
+    latencies.sort()
+    print(f"\nCompleted requests: {len(latencies)} ({len(errors)} errors)")
+    if latencies:
+        print(f"Throughput:         {len(latencies) / elapsed:.2f} requests/sec")
+        print(f"Latency p50:        {1000 * latencies[len(latencies) // 2]:.0f} ms")
+        print(f"Latency p95:        {1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]:.0f} ms")
+    if errors:
+        print(f"First error: {errors[0]}")
+
+    master_pid = read_pidfile(args.pidfile)
+    if master_pid:
+        print_memory(master_pid)
+    else:
+        print(f"\nNo pidfile at {args.pidfile}; skipping per-worker memory report.")
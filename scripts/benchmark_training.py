@@ -0,0 +1,168 @@
+# This script compares training throughput settings for phase2b_finetune_llm.py. Each
+# configuration trains the same number of steps in its own subprocess, so settings such
+# as thread counts and torch.compile cannot leak between runs, and the samples/sec
+# reported by the Trainer is printed next to the run's peak resident memory.
+#
+#     python scripts/benchmark_training.py --steps 30
+#     python scripts/benchmark_training.py --config "bs16=--batch-size 16" --config "bs16-bf16=--batch-size 16 --bf16"
+#
+# With --nproc, one configuration is instead trained with 1 to N data-parallel ranks
+# (launched with torchrun) to measure scaling efficiency:
+#
+#     python scripts/benchmark_training.py --nproc 1 2 4
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FINETUNE_SCRIPT = os.path.join(ROOT, "scripts", "phase2b_finetune_llm.py")
+
+# Name -> extra phase2b_finetune_llm.py options. The first configuration is the baseline.
+DEFAULT_CONFIGS = {
+    "baseline": [],
+    "bf16": ["--bf16"],
+    "accumulate-4": ["--gradient-accumulation-steps", "4"],
+    "workers-2": ["--dataloader-workers", "2", "--prefetch-factor", "4"],
+    "compile": ["--torch-compile"],
+    # Leaves half the cores to the dataloader and the OS
+    "threads-half": ["--num-threads", str(max(1, (os.cpu_count() or 2) // 2))],
+    "bs16-bf16-workers": ["--batch-size", "16", "--bf16", "--dataloader-workers", "2"],
+}
+
+def parse_config(value):
+    """Parses a --config value of the form 'name=--option value ...'."""
+    name, separator, options = value.partition("=")
+    if not separator or not name:
+        raise argparse.ArgumentTypeError(f"expected name=options, got '{value}'")
+    return name, shlex.split(options)
+
+def run_config(options, steps, train_file, val_file, model_name, nproc=1):
+    """
+    Trains `steps` steps with the given options in a subprocess, or in nproc torchrun ranks.
+
+    Returns:
+        dict: The Trainer's training metrics plus wall_time_s and peak_rss_mb (the largest process
+            of the run, the trainer or one of its dataloader workers), or an error message.
+    """
+    with tempfile.TemporaryDirectory() as output_dir:
+        metrics_file = os.path.join(output_dir, "metrics.json")
+        log_file = os.path.join(output_dir, "train.log")
+        launcher = [sys.executable]
+        if nproc > 1:
+            launcher += ["-m", "torch.distributed.run", "--standalone", "--nproc_per_node", str(nproc)]
+        command = launcher + [FINETUNE_SCRIPT, "--train-file", train_file, "--val-file", val_file,
+                   "--model-name", model_name, "--output-dir", output_dir, "--max-steps", str(steps), "--no-save",
+                   "--metrics-file", metrics_file] + options
+        started = time.perf_counter()
+        with open(log_file, "w") as log:
+            process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+            # wait4 returns this run's own resource usage, including its reaped children
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+        elapsed = time.perf_counter() - started
+        if process.returncode != 0 or not os.path.exists(metrics_file):
+            with open(log_file, "r") as log:
+                lines = log.read().strip().splitlines()
+            return {"error": lines[-1] if lines else f"exit code {process.returncode}"}
+        with open(metrics_file, "r") as f:
+            metrics = json.load(f)
+    metrics["wall_time_s"] = elapsed
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    metrics["peak_rss_mb"] = usage.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else usage.ru_maxrss / 1024
+    return metrics
+
+def benchmark(configs, steps=30, train_file="data/train.jsonl", val_file="data/validation.jsonl",
+              model_name="t5-base"):
+    """
+    Trains each configuration for the same number of steps and prints a comparison.
+
+    Args:
+        configs (dict): Configuration name -> list of phase2b_finetune_llm.py options. The first is the baseline.
+        steps (int): Optimizer steps per configuration.
+    """
+    # Tokenize once up front so the first configuration does not pay for filling the cache
+    print("Warming the tokenized dataset cache...")
+    run_config([], 1, train_file, val_file, model_name)
+
+    results = []
+    for name, options in configs.items():
+        print(f"--- {name}: {' '.join(options) or '(defaults)'} ---")
+        result = run_config(options, steps, train_file, val_file, model_name)
+        if "error" in result:
+            print(f"  failed: {result['error']}")
+        else:
+            print(f"  {result['train_samples_per_second']:.2f} samples/s, peak RSS {result['peak_rss_mb']:.0f} MB")
+        results.append((name, result))
+
+    baseline = next((result for _, result in results if "error" not in result), None)
+    baseline_rate = baseline["train_samples_per_second"] if baseline else 0.0
+    print(f"\n{'config':<20} {'samples/s':>10} {'train (s)':>10} {'wall (s)':>9} {'peak RSS (MB)':>14} {'speedup':>8}")
+    for name, result in results:
+        if "error" in result:
+            print(f"{name:<20} {'failed':>10}")
+            continue
+        rate = result["train_samples_per_second"]
+        print(f"{name:<20} {rate:>10.2f} {result['train_runtime']:>10.1f} {result['wall_time_s']:>9.1f} "
+              f"{result['peak_rss_mb']:>14.0f} {rate / baseline_rate if baseline_rate else 0.0:>7.2f}x")
+    return results
+
+def benchmark_scaling(nprocs, options=(), steps=30, train_file="data/train.jsonl", val_file="data/validation.jsonl",
+                      model_name="t5-base"):
+    """
+    Trains the same configuration with each number of data-parallel ranks and prints the scaling efficiency:
+    the throughput gained relative to the smallest rank count, divided by the increase in ranks.
+
+    The ranks on a node share its cores (each gets cores / ranks threads), so this compares data
+    parallelism with intra-op threading on the same hardware. Each rank trains a full per-device
+    batch, so the global batch grows with the number of ranks.
+    """
+    options = list(options)
+    print("Warming the tokenized dataset cache...")
+    run_config(options, 1, train_file, val_file, model_name)
+
+    results = []
+    for nproc in nprocs:
+        print(f"--- {nproc} rank(s): {' '.join(options) or '(defaults)'} ---")
+        result = run_config(options, steps, train_file, val_file, model_name, nproc=nproc)
+        if "error" in result:
+            print(f"  failed: {result['error']}")
+        else:
+            print(f"  {result['train_samples_per_second']:.2f} samples/s, peak RSS {result['peak_rss_mb']:.0f} MB")
+        results.append((nproc, result))
+
+    measured = [(nproc, result) for nproc, result in results if "error" not in result]
+    base_nproc, base = measured[0] if measured else (1, None)
+    print(f"\n{'ranks':>5} {'samples/s':>10} {'wall (s)':>9} {'peak RSS/rank (MB)':>19} {'speedup':>8} {'efficiency':>11}")
+    for nproc, result in results:
+        if "error" in result:
+            print(f"{nproc:>5} {'failed':>10}")
+            continue
+        speedup = result["train_samples_per_second"] / base["train_samples_per_second"]
+        print(f"{nproc:>5} {result['train_samples_per_second']:>10.2f} {result['wall_time_s']:>9.1f} "
+              f"{result['peak_rss_mb']:>19.0f} {speedup:>7.2f}x {speedup / (nproc / base_nproc):>10.0%}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare training throughput settings for the T5 fine-tune.")
+    parser.add_argument("--steps", type=int, default=30, help="Optimizer steps per configuration.")
+    parser.add_argument("--config", type=parse_config, action="append", metavar="NAME=OPTIONS",
+                        help="A configuration to run instead of the defaults, e.g. \"bf16=--bf16 --batch-size 8\". "
+                             "Repeat for several; the first is the baseline.")
+    parser.add_argument("--train-file", default="data/train.jsonl", help="The JSONL training set.")
+    parser.add_argument("--val-file", default="data/validation.jsonl", help="The JSONL validation set.")
+    parser.add_argument("--model-name", default="t5-base", help="The pre-trained model to start from.")
+    parser.add_argument("--nproc", type=int, nargs="+",
+                        help="Measure scaling over these rank counts, e.g. 1 2 4, with the first --config (or the defaults).")
+    args = parser.parse_args()
+
+    if args.nproc:
+        options = args.config[0][1] if args.config else []
+        benchmark_scaling(sorted(args.nproc), options, args.steps, args.train_file, args.val_file, args.model_name)
+    else:
+        configs = dict(args.config) if args.config else DEFAULT_CONFIGS
+        benchmark(configs, args.steps, args.train_file, args.val_file, args.model_name)
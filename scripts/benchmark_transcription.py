@@ -0,0 +1,71 @@
+# This script compares the end-to-end latency of the transcription backends.
+# Every clip is transcribed by every backend (with the transcript cache disabled),
+# and the wall time and transcript length are reported side by side.
+import argparse
+import mimetypes
+import os
+import sys
+import time
+
+# Allow `python scripts/benchmark_transcription.py` to import the app's modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.transcription_backends import BACKENDS, TwelveLabsBackend
+
+def create_backend(name):
+    """Creates a fresh backend instance; Twelve Labs runs without its transcript cache."""
+    if name == TwelveLabsBackend.name:
+        return TwelveLabsBackend(use_cache=False)
+    return BACKENDS[name]()
+
+def benchmark(clips, backend_names, repeat=1):
+    """Returns one result row per clip and backend holding the best wall time over `repeat` runs."""
+    results = []
+    for name in backend_names:
+        backend = create_backend(name)
+        for clip in clips:
+            content_type = mimetypes.guess_type(clip)[0] or "video/mp4"
+            timings = []
+            transcript = None
+            error = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                try:
+                    transcript = backend.transcribe(clip, content_type)
+                except Exception as e:
+                    error = str(e)
+                    break
+                timings.append(time.perf_counter() - start)
+            results.append({
+                "backend": name,
+                "clip": os.path.basename(clip),
+                "seconds": min(timings) if timings else None,
+                "first_run_seconds": timings[0] if timings else None,
+                "words": len(transcript.split()) if transcript else 0,
+                "transcript": transcript,
+                "error": error,
+            })
+    return results
+
+def print_results(results):
+    print(f"\n{'backend':<12} {'clip':<28} {'first (s)':>10} {'best (s)':>10} {'words':>6}")
+    for row in results:
+        if row["error"]:
+            print(f"{row['backend']:<12} {row['clip']:<28} failed: {row['error']}")
+            continue
+        print(f"{row['backend']:<12} {row['clip']:<28} {row['first_run_seconds']:>10.2f} "
+              f"{row['seconds']:>10.2f} {row['words']:>6}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare transcription backend latency on the same clips.")
+    parser.add_argument("clips", nargs="+", help="Audio or video clips to transcribe.")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS),
+                        help="The backends to compare.")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per clip and backend; the fastest is reported.")
+    parser.add_argument("--show-transcripts", action="store_true", help="Print each transcript after the table.")
+    args = parser.parse_args()
+
+    results = benchmark(args.clips, args.backends, repeat=args.repeat)
+    print_results(results)
+    if args.show_transcripts:
+        for row in results:
+            print(f"\n[{row['backend']}] {row['clip']}:\n{row['transcript']}")
@@ -1,34 +1,108 @@
 # This script converts an audio file to a video file with a black screen using ffmpeg.
 # This is useful for processing audio files with tools that expect video input.
+#
+# Several conversion profiles are available. The original 720p, 30 fps encode is kept
+# as "legacy"; the other profiles produce the smallest video track the transcription
+# backend needs, so almost all of the work (and the output size) goes to the audio.
 import os
 import subprocess
 import sys
 
-def convert_audio_to_video(audio_path, output_path):
+# Audio codecs that can be stored in an MP4 container without re-encoding
+MP4_AUDIO_CODECS = {"aac", "mp3", "alac"}
+
+PROFILES = {
+    # 1280x720 at 30 fps, as originally shipped
+    "legacy": {"size": "1280x720", "rate": 30, "video_args": ['-c:v', 'libx264'], "copy_audio": False},
+    # Small frame at 1 fps with the fastest x264 settings
+    "minimal": {
+        "size": "360x360",
+        "rate": 1,
+        "video_args": ['-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'stillimage'],
+        "copy_audio": False,
+    },
+    # A single black frame followed by the full audio track
+    "still": {
+        "size": "360x360",
+        "rate": 1,
+        "video_args": ['-frames:v', '1', '-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'stillimage'],
+        "copy_audio": False,
+    },
+    # Like "minimal", but the audio stream is copied when MP4 can hold its codec
+    "copy": {
+        "size": "360x360",
+        "rate": 1,
+        "video_args": ['-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'stillimage'],
+        "copy_audio": True,
+    },
+}
+DEFAULT_PROFILE = os.getenv("AUDIO_CONVERSION_PROFILE", "minimal")
+
+def probe_audio_codec(audio_path):
+    """Returns the codec name of the first audio stream, or None if it cannot be determined."""
+    command = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'stream=codec_name',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        audio_path
+    ]
+    try:
+        result = subprocess.run(command, check=True, capture_output=True, text=True)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+    return result.stdout.strip() or None
+
+def build_ffmpeg_command(audio_path, output_path, profile=DEFAULT_PROFILE):
+    """Builds the ffmpeg command for a conversion profile."""
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown conversion profile '{profile}'. Choose from: {', '.join(PROFILES)}")
+    settings = PROFILES[profile]
+
+    audio_args = ['-c:a', 'aac']
+    if settings["copy_audio"] and probe_audio_codec(audio_path) in MP4_AUDIO_CODECS:
+        audio_args = ['-c:a', 'copy']
+
+    command = [
+        'ffmpeg',
+        '-f', 'lavfi',
+        '-i', f"color=c=black:s={settings['size']}:r={settings['rate']}", # Black screen input
+        '-i', audio_path,
+        '-map', '0:v', '-map', '1:a',
+    ]
+    command += settings["video_args"] + audio_args
+    # A single-frame video must not cut the audio short
+    if '-frames:v' not in settings["video_args"]:
+        command.append('-shortest')
+    command += [
+        '-y', # Overwrite output file if it exists
+        output_path
+    ]
+    return command
+
+def convert_audio_to_video(audio_path, output_path, profile=DEFAULT_PROFILE):
     """
     Converts an audio file to a video file with a black screen using ffmpeg.
+
+    Args:
+        audio_path (str): The audio file to convert.
+        output_path (str): The video file to write.
+        profile (str): One of the keys of PROFILES. Defaults to AUDIO_CONVERSION_PROFILE or "minimal".
     """
     if not os.path.exists(audio_path):
         print(f"Error: Audio file not found at {audio_path}")
         return False
 
     # Ensure the output directory exists
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
 
     # Construct the ffmpeg command
-    command = [
-        'ffmpeg',
-        '-f', 'lavfi',
-        '-i', 'color=c=black:s=1280x720:r=30', # Black screen input
-        '-i', audio_path,
-        '-c:v', 'libx264',
-        '-c:a', 'aac',
-        '-shortest',
-        '-y', # Overwrite output file if it exists
-        output_path
-    ]
+    command = build_ffmpeg_command(audio_path, output_path, profile)
 
-    print(f"Converting {audio_path} to {output_path}...")
+    print(f"Converting {audio_path} to {output_path} (profile: {profile})...")
     try:
         subprocess.run(command, check=True, capture_output=True, text=True)
         print("Conversion successful.")
@@ -44,11 +118,13 @@ def convert_audio_to_video(audio_path, output_path):
 if __name__ == '__main__':
     # This block is for testing the script directly from the command line.
     # The main application imports and uses the convert_audio_to_video function.
-    if len(sys.argv) != 3:
-        print("Usage: python scripts/convert_audio_to_video.py <input_audio_path> <output_video_path>")
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python scripts/convert_audio_to_video.py <input_audio_path> <output_video_path> [profile]")
+        print(f"Profiles: {', '.join(PROFILES)}")
         sys.exit(1)
-    
+
     input_audio_file = sys.argv[1]
     output_video_file = sys.argv[2]
-    
-    convert_audio_to_video(input_audio_file, output_video_file)
\ No newline at end of file
+    profile = sys.argv[3] if len(sys.argv) == 4 else DEFAULT_PROFILE
+
+    convert_audio_to_video(input_audio_file, output_video_file, profile)
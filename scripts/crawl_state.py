@@ -0,0 +1,55 @@
+# This module keeps the incremental crawl state shared by get_youtube_comments.py and
+# get_channel_videos.py: per-channel and per-video watermarks (the newest publish time
+# and ids seen so far), so later runs only fetch content published since.
+import json
+import os
+import threading
+
+DEFAULT_STATE_FILE = "data/crawl_state.json"
+
+class CrawlState:
+    """
+    A JSON file of named sections, each mapping a key (a channel or video) to its watermark.
+
+    Args:
+        path (str): The state file; it is created on the first save.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self._data = json.load(f)
+
+    def get(self, section, key):
+        """Returns a copy of the watermark stored for key, or an empty dict."""
+        with self._lock:
+            return dict(self._data.get(section, {}).get(key, {}))
+
+    def keys(self, section):
+        with self._lock:
+            return list(self._data.get(section, {}))
+
+    def update(self, section, key, **fields):
+        """Merges fields into key's watermark and saves the file."""
+        with self._lock:
+            self._data.setdefault(section, {}).setdefault(key, {}).update(fields)
+            self._save()
+
+    def clear(self, section):
+        """Forgets every watermark in a section, e.g. before a full re-crawl."""
+        with self._lock:
+            self._data.pop(section, None)
+            self._save()
+
+    def _save(self):
+        """Atomically replaces the state file."""
+        state_dir = os.path.dirname(self.path)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        temp_file = f"{self.path}.tmp"
+        with open(temp_file, "w") as f:
+            json.dump(self._data, f, indent=2)
+        os.replace(temp_file, self.path)
@@ -0,0 +1,79 @@
+# This module defines how many beams and how many output tokens a translation gets.
+# The same policies are used by the web app, the command-line scripts and the
+# evaluation harness, so the quality measured offline is the quality served.
+import math
+import os
+
+class DecodingPolicy:
+    """
+    Picks `generate` settings from the input length and an optional latency budget.
+
+    Args:
+        tiers (list): (max_input_tokens, num_beams) pairs in increasing order; the first tier
+            whose limit is at least the input length is used. A limit of None matches anything.
+        length_ratio (float): Output tokens allowed per input token.
+        length_margin (int): Output tokens allowed on top of the ratio.
+        max_length_cap (int): The largest max_length ever used.
+        fixed_max_length (int, optional): Use this max_length regardless of input length.
+        ms_per_beam_token (float): Estimated decoder cost of one token on one beam, used to fit a latency budget.
+    """
+
+    def __init__(self, tiers, length_ratio=1.5, length_margin=10, max_length_cap=100, fixed_max_length=None,
+                 ms_per_beam_token=None):
+        self.tiers = tiers
+        self.length_ratio = length_ratio
+        self.length_margin = length_margin
+        self.max_length_cap = max_length_cap
+        self.fixed_max_length = fixed_max_length
+        if ms_per_beam_token is None:
+            ms_per_beam_token = float(os.getenv("DECODING_MS_PER_BEAM_TOKEN", "4"))
+        self.ms_per_beam_token = ms_per_beam_token
+
+    def max_length(self, input_tokens):
+        if self.fixed_max_length:
+            return self.fixed_max_length
+        return min(self.max_length_cap, math.ceil(input_tokens * self.length_ratio) + self.length_margin)
+
+    def num_beams(self, input_tokens):
+        for limit, beams in self.tiers:
+            if limit is None or input_tokens <= limit:
+                return beams
+        return self.tiers[-1][1]
+
+    def settings(self, input_tokens, latency_budget_ms=None):
+        """
+        Returns the keyword arguments for `model.generate`.
+
+        Args:
+            input_tokens (int): The token length of the text being translated (without the prompt).
+            latency_budget_ms (float, optional): The time the caller can wait. Beams are dropped,
+                down to greedy decoding, until the estimated decoding cost fits.
+        """
+        max_length = self.max_length(input_tokens)
+        num_beams = self.num_beams(input_tokens)
+        if latency_budget_ms is not None:
+            while num_beams > 1 and num_beams * max_length * self.ms_per_beam_token > latency_budget_ms:
+                num_beams -= 1
+        settings = {"max_length": max_length, "num_beams": num_beams}
+        if num_beams > 1:
+            settings["early_stopping"] = True
+        return settings
+
+POLICIES = {
+    # Full beam search for short phrases, narrower beams as inputs grow
+    "adaptive": DecodingPolicy(tiers=[(16, 5), (48, 3), (None, 2)]),
+    # The settings the web app and translate_new_data.py used before policies existed
+    "legacy": DecodingPolicy(tiers=[(None, 5)], fixed_max_length=100),
+    # The settings evaluate_model.py and phase2c_custom_translation_agent.py used before policies existed
+    "legacy-cli": DecodingPolicy(tiers=[(None, 5)], fixed_max_length=50),
+    "fast": DecodingPolicy(tiers=[(16, 2), (None, 1)]),
+    "greedy": DecodingPolicy(tiers=[(None, 1)]),
+}
+DEFAULT_POLICY = os.getenv("DECODING_POLICY", "adaptive")
+
+def get_policy(name=None):
+    """Returns a policy by name, defaulting to DECODING_POLICY or "adaptive"."""
+    name = name or DEFAULT_POLICY
+    if name not in POLICIES:
+        raise ValueError(f"Unknown decoding policy '{name}'. Choose from: {', '.join(POLICIES)}")
+    return POLICIES[name]
@@ -1,73 +1,201 @@
 # This script evaluates the fine-tuned translation model using the BLEU score.
 # It compares the model's translations against a validation set of reference translations.
-import os
-import json
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
-from nltk.translate.bleu_score import sentence_bleu, SmoothingFunction
+# Samples are translated in length-sorted batches, per-sample results are written to a
+# JSONL file, and throughput and peak memory are reported alongside the scores.
+# Several decoding policies can be compared in one run to measure what each costs in quality.
+import argparse
 import json
 import os
+import resource
+import sys
+import time
+from nltk.translate.bleu_score import corpus_bleu, sentence_bleu, SmoothingFunction
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.model_backends import BACKENDS, DEFAULT_BACKEND, variant_path
+from scripts.decoding_policy import DEFAULT_POLICY, POLICIES
+from scripts.inference import (
+    batch_settings,
+    encode_prompts,
+    generate_translations,
+    get_model,
+    length_sorted_batches,
+    prompt_overhead,
+)
 
 # --- Configuration ---
 CUSTOM_MODEL_NAME = "./results/final_model"
 
-def evaluate_model(validation_file="data/validation.jsonl"):
+def peak_rss_mb():
+    """Returns the peak resident set size of this process in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def evaluate_model(validation_file="data/validation.jsonl", batch_size=16, output_file="data/eval_results.jsonl",
+                   backend=DEFAULT_BACKEND, policy=DEFAULT_POLICY):
     """
     Evaluates the fine-tuned custom model against the validation set and calculates the BLEU score.
+
+    Args:
+        validation_file (str): The JSONL file of prompts and reference translations.
+        batch_size (int): The number of samples translated in one `generate` call.
+        output_file (str): The JSONL file per-sample predictions and scores are written to.
+        backend (str): The inference backend to evaluate: "pytorch", "int8" or "onnx".
+        policy (str): The decoding policy that picks beam width and output length per batch.
+
+    Returns:
+        dict: The evaluation metrics, or None if the model or validation file is missing.
     """
-    if not os.path.exists(CUSTOM_MODEL_NAME):
-        print(f"Error: Model not found at {CUSTOM_MODEL_NAME}")
+    model_path = variant_path(CUSTOM_MODEL_NAME, backend)
+    if not os.path.exists(model_path):
+        print(f"Error: Model not found at {model_path}")
         return
 
     if not os.path.exists(validation_file):
         print(f"Error: Validation file not found at {validation_file}")
         return
 
-    tokenizer = AutoTokenizer.from_pretrained(CUSTOM_MODEL_NAME)
-    model = AutoModelForSeq2SeqLM.from_pretrained(CUSTOM_MODEL_NAME)
-    
+    # Loaded once per process, however many policies are evaluated
+    tokenizer, model = get_model(CUSTOM_MODEL_NAME, backend)
+    overhead = prompt_overhead(tokenizer)
+
     with open(validation_file, "r") as f:
         validation_data = [json.loads(line) for line in f]
 
     total_bleu_score = 0
     chencherry = SmoothingFunction()
+    references = []
+    candidates = []
+    errors = 0
+
+    print(f"--- Evaluating model '{model_path}' ({backend}, {policy} decoding) on {len(validation_data)} samples ---")
+
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    # Sort by token length so each batch holds prompts of similar size
+    encoded = encode_prompts([item['input_text'] for item in validation_data], tokenizer)
+
+    generation_time = 0.0
+    total_beams = 0
+    start_time = time.perf_counter()
+    with open(output_file, "w") as f_out:
+        done = 0
+        for batch_number, batch_indices in enumerate(length_sorted_batches(encoded, batch_size), start=1):
+            done += len(batch_indices)
+            try:
+                # Get the model's translations
+                batch_start = time.perf_counter()
+                input_ids = [encoded[idx] for idx in batch_indices]
+                settings = batch_settings(input_ids, tokenizer, policy, overhead=overhead)
+                model_translations = generate_translations(tokenizer, model, input_ids, **settings)
+                generation_time += time.perf_counter() - batch_start
+            except Exception as e:
+                errors += len(batch_indices)
+                print(f"Error processing samples {[idx + 1 for idx in batch_indices]}: {e}")
+                continue
+
+            total_beams += settings["num_beams"] * len(batch_indices)
+            for idx, model_translation in zip(batch_indices, model_translations):
+                item = validation_data[idx]
+
+                # Calculate BLEU score
+                reference = [item['output_text'].split()]
+                candidate = model_translation.split()
+                bleu_score = sentence_bleu(reference, candidate, smoothing_function=chencherry.method1)
+                total_bleu_score += bleu_score
+                references.append(reference)
+                candidates.append(candidate)
+
+                f_out.write(json.dumps({
+                    "sample": idx + 1,
+                    "prompt": item['input_text'],
+                    "reference": item['output_text'],
+                    "model": model_translation,
+                    "bleu": bleu_score,
+                }) + "\n")
+
+            if batch_number % 10 == 0 or done == len(encoded):
+                print(f"  ...evaluated {done}/{len(encoded)} samples")
+
+    elapsed = time.perf_counter() - start_time
+    evaluated = len(candidates)
+    metrics = {
+        "backend": backend,
+        "policy": policy,
+        "samples": len(validation_data),
+        "errors": errors,
+        "average_bleu": total_bleu_score / len(validation_data) if validation_data else 0.0,
+        "corpus_bleu": corpus_bleu(references, candidates, smoothing_function=chencherry.method1) if candidates else 0.0,
+        "latency_per_sample_ms": 1000 * generation_time / evaluated if evaluated else 0.0,
+        "samples_per_sec": evaluated / elapsed if elapsed > 0 else 0.0,
+        "mean_num_beams": total_beams / evaluated if evaluated else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
 
-    print(f"--- Evaluating model '{CUSTOM_MODEL_NAME}' on {len(validation_data)} samples ---")
-
-    for i, item in enumerate(validation_data):
-        prompt = item['input_text']
-        reference_translation = item['output_text']
-
-        try:
-            # Get the model's translation
-            inputs = tokenizer(prompt, return_tensors="pt", padding=True, truncation=True)
-            output_sequences = model.generate(
-                input_ids=inputs['input_ids'],
-                attention_mask=inputs['attention_mask'],
-                max_length=50,
-                num_beams=5,
-                early_stopping=True
-            )
-            model_translation = tokenizer.decode(output_sequences[0], skip_special_tokens=True).strip()
-
-            # Calculate BLEU score
-            reference = [reference_translation.split()]
-            candidate = model_translation.split()
-            bleu_score = sentence_bleu(reference, candidate, smoothing_function=chencherry.method1)
-            total_bleu_score += bleu_score
-
-            print(f"\nSample {i+1}:")
-            print(f"  Prompt:     '{prompt}'")
-            print(f"  Reference:  '{reference_translation}'")
-            print(f"  Model:      '{model_translation}'")
-            print(f"  BLEU Score: {bleu_score:.4f}")
-
-        except Exception as e:
-            print(f"\nError processing sample {i+1}: {e}")
-
-    average_bleu_score = total_bleu_score / len(validation_data)
     print("\n--- Evaluation Complete ---")
-    print(f"Average BLEU Score: {average_bleu_score:.4f}")
+    print(f"Average BLEU Score: {metrics['average_bleu']:.4f}")
+    print(f"Corpus BLEU Score:  {metrics['corpus_bleu']:.4f}")
+    print(f"Latency per sample: {metrics['latency_per_sample_ms']:.1f} ms")
+    print(f"Throughput:         {metrics['samples_per_sec']:.2f} samples/sec")
+    print(f"Peak memory:        {metrics['peak_rss_mb']:.0f} MB")
+    print(f"Per-sample results saved to {output_file}")
     print("Note: A higher BLEU score (closer to 1.0) indicates a better translation quality.")
+    return metrics
+
+def compare_policies(policies, validation_file="data/validation.jsonl", batch_size=16,
+                     output_file="data/eval_results.jsonl", backend=DEFAULT_BACKEND):
+    """
+    Evaluates several decoding policies with one loaded model and prints their quality and speed side by side.
+    The first policy is the baseline the others are compared against.
+
+    Returns:
+        list: The metrics of each policy, or None if the model or validation file is missing.
+    """
+    root, ext = os.path.splitext(output_file)
+    results = []
+    for policy in policies:
+        metrics = evaluate_model(validation_file, batch_size, f"{root}_{policy}{ext}", backend, policy)
+        if metrics is None:
+            return
+        results.append(metrics)
+        print()
+
+    baseline = results[0]
+    print(f"--- Decoding policies compared with '{policies[0]}' ---")
+    print(f"{'policy':<10} {'corpus BLEU':>12} {'change':>8} {'ms/sample':>10} {'samples/s':>10} {'speedup':>8} {'beams':>6}")
+    for metrics in results:
+        speedup = baseline["latency_per_sample_ms"] / metrics["latency_per_sample_ms"] if metrics["latency_per_sample_ms"] else 0.0
+        print(f"{metrics['policy']:<10} {metrics['corpus_bleu']:>12.4f} "
+              f"{metrics['corpus_bleu'] - baseline['corpus_bleu']:>+8.4f} {metrics['latency_per_sample_ms']:>10.1f} "
+              f"{metrics['samples_per_sec']:>10.2f} {speedup:>7.2f}x {metrics['mean_num_beams']:>6.2f}")
+    return results
 
 if __name__ == "__main__":
-    evaluate_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Evaluate the fine-tuned translation model using the BLEU score.")
+    parser.add_argument("--validation-file", default="data/validation.jsonl", help="The JSONL validation set.")
+    parser.add_argument("--batch-size", type=int, default=16, help="The number of samples translated per generate call.")
+    parser.add_argument("--output-file", default="data/eval_results.jsonl", help="Where to write per-sample results.")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS, help="The inference backend to evaluate.")
+    parser.add_argument("--policy", default=DEFAULT_POLICY, choices=list(POLICIES), help="The decoding policy to evaluate.")
+    parser.add_argument("--policies", help="Compare several decoding policies, e.g. 'legacy-cli,adaptive,greedy'. "
+                                           "The first is the baseline.")
+    parser.add_argument("--metrics-file", help="Also write the summary metrics to this JSON file.")
+    args = parser.parse_args()
+
+    if args.policies:
+        policies = [name.strip() for name in args.policies.split(",") if name.strip()]
+        unknown = [name for name in policies if name not in POLICIES]
+        if unknown:
+            parser.error(f"Unknown decoding policies: {', '.join(unknown)}. Choose from: {', '.join(POLICIES)}")
+        metrics = compare_policies(policies, args.validation_file, args.batch_size, args.output_file, args.backend)
+    else:
+        metrics = evaluate_model(args.validation_file, batch_size=args.batch_size, output_file=args.output_file,
+                                 backend=args.backend, policy=args.policy)
+    if metrics is None:
+        sys.exit(1)
+    if args.metrics_file:
+        with open(args.metrics_file, "w") as f:
+            json.dump(metrics, f, indent=2)
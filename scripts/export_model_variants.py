@@ -0,0 +1,56 @@
+# This script exports CPU inference variants of the fine-tuned model:
+# an int8 dynamically quantized copy and an ONNX Runtime copy. They are saved
+# next to the original (e.g. ./results/final_model_int8 and ./results/final_model_onnx)
+# and can be served by setting MODEL_BACKEND or passing --backend to the scripts.
+import argparse
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.model_backends import DEFAULT_MODEL_PATH, export_int8, export_onnx
+
+EXPORTERS = {
+    "int8": export_int8,
+    "onnx": export_onnx,
+}
+
+def directory_size_mb(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total / (1024 * 1024)
+
+def export_model_variants(model_path=DEFAULT_MODEL_PATH, variants=tuple(EXPORTERS)):
+    """
+    Exports each requested variant of the model at model_path.
+
+    Args:
+        model_path (str): The fine-tuned fp32 model directory.
+        variants (iterable): Keys of EXPORTERS.
+    """
+    if not os.path.exists(model_path):
+        print(f"Error: Model not found at {model_path}")
+        return
+
+    print(f"fp32 model: {model_path} ({directory_size_mb(model_path):.0f} MB)")
+    for variant in variants:
+        print(f"Exporting {variant} variant...")
+        start = time.perf_counter()
+        try:
+            output_path = EXPORTERS[variant](model_path)
+        except ImportError as e:
+            print(f"  Skipped: {e}. Install optimum[onnxruntime] to export the ONNX variant.")
+            continue
+        print(f"  Saved to {output_path} ({directory_size_mb(output_path):.0f} MB) in {time.perf_counter() - start:.1f}s")
+
+    print("\nRun scripts/parity_report.py to compare the variants against the fp32 model.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export int8 and ONNX Runtime variants of the fine-tuned model.")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH, help="The fine-tuned model directory.")
+    parser.add_argument("--variants", nargs="+", default=list(EXPORTERS), choices=list(EXPORTERS),
+                        help="The variants to export.")
+    args = parser.parse_args()
+
+    export_model_variants(args.model_path, args.variants)
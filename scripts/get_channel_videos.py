@@ -1,7 +1,13 @@
 # This script fetches video URLs from a specified YouTube channel using yt-dlp.
-# It filters out YouTube Shorts and saves the URLs to a text file.
+# It filters out YouTube Shorts and appends new URLs to a text file, listing the channel
+# only until it reaches a video it has already seen (see crawl_state.py).
+import argparse
 import subprocess
 import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.crawl_state import DEFAULT_STATE_FILE, CrawlState
 
 # --- Configuration ---
 # The URL of the YouTube channel you want to scrape.
@@ -9,50 +15,124 @@ CHANNEL_URL = "https://www.youtube.com/c/WhatYuhKnow"
 # The file where the video URLs will be saved.
 OUTPUT_FILE = "data/video_urls.txt"
 VIDEO_LIMIT = 10
+# How many playlist entries each yt-dlp call lists. Channels list newest first, so an
+# incremental run usually stops after the first window.
+WINDOW_SIZE = 10
 
-def get_video_urls_from_channel(channel_url, output_file, limit=None, timeout=60):
+def list_playlist_window(channel_url, start, end, timeout):
+    """Returns the URLs of playlist entries start to end (1-based, inclusive), newest first."""
+    # --flat-playlist: Do not extract video information, just list them.
+    # --get-url: Print the URL of each video.
+    command = ["yt-dlp", "--flat-playlist", "--get-url", "--playlist-items", f"{start}-{end}", channel_url]
+    result = subprocess.run(command, capture_output=True, text=True, check=True, timeout=timeout)
+    return [url for url in result.stdout.strip().split('\n') if url]
+
+def get_video_urls_from_channel(channel_url, output_file, limit=None, timeout=60, state_file=DEFAULT_STATE_FILE,
+                                incremental=True, window_size=WINDOW_SIZE):
     """
     Uses yt-dlp to extract video URLs from a YouTube channel.
 
+    URLs already in the output file are kept and only newer ones are appended. Listing
+    stops at the first URL seen before (or the channel's watermark in the crawl state),
+    so a repeat run costs one small yt-dlp call.
+
+    The watermark only moves to the newest video once the listing has reached the old
+    watermark (or the end of the channel). If limit cuts the listing short, the watermark
+    is kept and the last URL listed and its playlist position are saved instead. The next
+    run lists the videos published since, then jumps past the URLs the cut-short run
+    already saved (shifted by the number of new videos) and carries on down to the old
+    watermark, so the older videos are not left out.
+
     Args:
         channel_url (str): The URL of the YouTube channel.
         output_file (str): The path to the file to save the URLs in.
         limit (int, optional): The maximum number of videos to fetch.
-        timeout (int, optional): The timeout in seconds for the yt-dlp command.
+        timeout (int, optional): The timeout in seconds for each yt-dlp command.
+        state_file (str, optional): The crawl state holding the channel's watermark.
+        incremental (bool, optional): Whether to keep the existing URLs; otherwise the file is rewritten.
+        window_size (int, optional): The number of playlist entries listed per yt-dlp call.
     """
     print(f"Fetching video URLs from channel: {channel_url}")
     
     # Ensure the output directory exists
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
-    try:
-        # Command to run yt-dlp
-        # --flat-playlist: Do not extract video information, just list them.
-        # --get-url: Print the URL of each video.
-        command = [
-            "yt-dlp",
-            "--flat-playlist",
-            "--get-url",
-        ]
-        if limit:
-            # Use yt-dlp to limit the number of videos fetched for efficiency
-            command.extend(["--playlist-items", f"1-{limit}"])
-        
-        command.append(channel_url)
-
-        # Run the command and capture the output
-        result = subprocess.run(command, capture_output=True, text=True, check=True, timeout=timeout)
-        
-        video_urls = result.stdout.strip().split('\n')
+    state = CrawlState(state_file)
+    known = set()
+    listing = {}
+    if incremental:
+        if os.path.exists(output_file):
+            with open(output_file, "r") as f:
+                known = {line.strip() for line in f if line.strip()}
+        listing = state.get("video_url_channels", channel_url)
+    watermark = listing.get("latest_video_url")
+    resume_url = listing.get("resume_after_url")
+    # What a URL already in the file means: the end of the listing ("stop"), the top of
+    # what a cut-short run saved ("resume"), or just a URL to pass over ("skip")
+    mode = "resume" if resume_url else "stop"
 
-        # Filter out YouTube Shorts
-        filtered_urls = [url for url in video_urls if "watch?v=" in url]
+    try:
+        new_urls = []
+        newest = None
+        start = 1
+        last_listed = None
+        finished = False
+        while not finished and (not limit or len(new_urls) < limit):
+            end = start + window_size - 1
+            if limit:
+                end = min(end, start + limit - len(new_urls) - 1)
+            video_urls = list_playlist_window(channel_url, start, end, timeout)
+            jump_to = None
+            for index, url in enumerate(video_urls, start):
+                last_listed = (index, url)
+                if newest is None and "watch?v=" in url:
+                    newest = url
+                if url == watermark:
+                    finished = True
+                    break
+                if url in known:
+                    if mode == "stop":
+                        finished = True
+                        break
+                    if mode == "resume":
+                        # The videos above this one are new since the cut-short run, so its
+                        # saved position has moved down by as many entries
+                        target = listing["resume_index"] + index - 1
+                        mode = "skip"
+                        if target > index and list_playlist_window(channel_url, target - 1, target - 1,
+                                                                   timeout) == [resume_url]:
+                            jump_to = target
+                            mode = "stop"
+                            break
+                    continue
+                # Filter out YouTube Shorts
+                if "watch?v=" in url and url not in new_urls:
+                    new_urls.append(url)
+            if finished:
+                break
+            if jump_to:
+                start = jump_to
+                continue
+            if len(video_urls) < end - start + 1:
+                finished = True  # End of the channel
+                break
+            start = end + 1
 
-        with open(output_file, "w") as f:
-            for url in filtered_urls:
+        with open(output_file, "a" if incremental else "w") as f:
+            for url in new_urls:
                 f.write(url + "\n")
 
-        print(f"\nSuccessfully saved {len(filtered_urls)} video URLs to {output_file}")
+        updated_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        if finished:
+            state.update("video_url_channels", channel_url, latest_video_url=newest or watermark,
+                         resume_after_url=None, resume_index=None, updated_at=updated_at)
+        elif last_listed:
+            # Stopped by the limit before reaching the watermark: keep it and record where to carry on
+            state.update("video_url_channels", channel_url, resume_after_url=last_listed[1],
+                         resume_index=last_listed[0] + 1, updated_at=updated_at)
+
+        print(f"\nSuccessfully saved {len(new_urls)} new video URLs to {output_file} "
+              f"({len(known)} already there)")
         print("You can now run the data ingestion script.")
 
     except FileNotFoundError:
@@ -69,4 +149,13 @@ def get_video_urls_from_channel(channel_url, output_file, limit=None, timeout=60
         print(f"\nAn unexpected error occurred: {e}")
 
 if __name__ == "__main__":
-    get_video_urls_from_channel(CHANNEL_URL, OUTPUT_FILE, limit=VIDEO_LIMIT)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fetch a channel's video URLs with yt-dlp.")
+    parser.add_argument("--channel-url", default=CHANNEL_URL, help="The channel to list.")
+    parser.add_argument("--output-file", default=OUTPUT_FILE, help="The file video URLs are appended to.")
+    parser.add_argument("--limit", type=int, default=VIDEO_LIMIT, help="The maximum number of new videos to fetch.")
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE, help="The incremental crawl state.")
+    parser.add_argument("--full", action="store_true", help="Ignore the existing URLs and rewrite the file.")
+    args = parser.parse_args()
+
+    get_video_urls_from_channel(args.channel_url, args.output_file, limit=args.limit, state_file=args.state_file,
+                                incremental=not args.full)
@@ -1,60 +1,457 @@
 # This script fetches comments from a list of specified YouTube channels
 # using the YouTube Data API. It saves the comments to a CSV file.
+#
+# Requests go through one pooled HTTP session and a rate limiter that also tracks
+# the API quota spent. Comment pages are followed with nextPageToken up to a per-video
+# cap, videos are fetched concurrently, and rows are written to the CSV as they arrive.
+# Point --base-url at mock_youtube_api.py to run without an API key.
+#
+# Crawls are incremental: channel ids and per-channel and per-video watermarks (newest
+# publish time and ids seen) are kept in data/crawl_state.json, so later runs only list
+# videos published since and only read comments newer than the last run, and rows are
+# appended to the CSV without duplicates. --full starts over.
 import requests
 import csv
 import argparse
 import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.crawl_state import DEFAULT_STATE_FILE, CrawlState
 
-def get_youtube_comments(api_key):
+# Channel names (change these as needed)
+CHANNEL_NAMES = ['WhatYuhKnow', 'MachelMontano', 'BujuBanton', 'Aytian']
+BASE_URL = 'https://www.googleapis.com/youtube/v3/'
+# Quota units charged by the Data API for each call
+QUOTA_COSTS = {"search": 100, "commentThreads": 1}
+# Errors worth retrying; quotaExceeded is not, since it lasts until the daily reset
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RETRYABLE_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "backendError"}
+# Videos whose comments cannot be read; they are skipped without retrying
+SKIPPED_REASONS = {"commentsDisabled", "videoNotFound", "forbidden"}
+
+class QuotaExhausted(Exception):
+    """Raised when the run's quota budget is spent or the API reports quotaExceeded."""
+
+class RateLimiter:
     """
-    Fetches comments from specified YouTube channels and saves them to a CSV file.
+    A token bucket for request rate, plus a budget of API quota units for the whole run.
+
+    Args:
+        requests_per_second (float): The sustained request rate.
+        burst (int): How many requests can be sent at once after an idle period.
+        quota_units (int): The quota units this run may spend (the API's default daily quota is 10000).
+    """
+
+    def __init__(self, requests_per_second=10.0, burst=10, quota_units=10000):
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.quota_units = quota_units
+        self.quota_used = 0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cost=1):
+        """Waits for a request slot and charges cost quota units, raising QuotaExhausted if over budget."""
+        with self._lock:
+            if self.quota_used + cost > self.quota_units:
+                raise QuotaExhausted(f"Quota budget of {self.quota_units} units spent")
+            self.quota_used += cost
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.requests_per_second)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.requests_per_second
+            time.sleep(wait)
+
+def error_reason(response):
+    """Returns the Data API error reason of a failed response, e.g. "commentsDisabled"."""
+    try:
+        errors = response.json().get("error", {}).get("errors", [])
+    except ValueError:
+        return None
+    return errors[0].get("reason") if errors else None
+
+class YouTubeClient:
     """
-    # Channel names (change these as needed)
-    CHANNEL_NAMES = ['WhatYuhKnow', 'MachelMontano', 'BujuBanton', 'Aytian']
-    BASE_URL = 'https://www.googleapis.com/youtube/v3/'
+    A YouTube Data API client with connection pooling, rate limiting and retries.
+
+    Args:
+        api_key (str): The YouTube Data API key.
+        base_url (str): The API root; point it at a local mock for benchmarks.
+        limiter (RateLimiter): Shared by every request this client makes.
+        pool_size (int): The number of pooled connections, at least the number of worker threads.
+        max_retries (int): Attempts after the first for rate-limited or failed requests.
+        timeout (float): Seconds to wait for each response.
+    """
+
+    def __init__(self, api_key, base_url=BASE_URL, limiter=None, pool_size=8, max_retries=5, timeout=30):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/') + '/'
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
 
-    def get_channel_id(channel_name, api_key):
-        url = f"{BASE_URL}search?part=snippet&type=channel&q={channel_name}&key={api_key}"
-        response = requests.get(url).json()
-        if 'items' in response and len(response['items']) > 0:
+    def get(self, endpoint, **params):
+        """
+        Calls an API endpoint and returns the decoded JSON, or None if the resource is unavailable.
+        Rate-limited and server errors are retried with exponential backoff and jitter.
+        """
+        params["key"] = self.api_key
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(QUOTA_COSTS.get(endpoint, 1))
+            with self._lock:
+                self.requests += 1
+            delay = min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5)
+            try:
+                response = self.session.get(self.base_url + endpoint, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                reason = str(e)
+            else:
+                if response.status_code == 200:
+                    return response.json()
+                reason = error_reason(response)
+                if reason == "quotaExceeded":
+                    raise QuotaExhausted("The API reports the daily quota is exceeded")
+                if reason in SKIPPED_REASONS or response.status_code == 404:
+                    return None
+                if response.status_code not in RETRYABLE_STATUS and reason not in RETRYABLE_REASONS:
+                    response.raise_for_status()
+                retry_after = response.headers.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    delay = float(retry_after)
+            if attempt == self.max_retries:
+                raise RuntimeError(f"{endpoint} failed after {self.max_retries + 1} attempts: {reason}")
+            with self._lock:
+                self.retries += 1
+            time.sleep(delay)
+
+    def get_channel_id(self, channel_name):
+        response = self.get("search", part="snippet", type="channel", q=channel_name, maxResults=1)
+        if response and response.get('items'):
             return response['items'][0]['id']['channelId']
+        print(f"No channel found for {channel_name}")
+        return None
+
+    def get_videos(self, channel_id, max_videos=50, published_after=None):
+        """
+        Returns (video id, publish time) pairs for a channel's most recent videos, newest first.
+
+        Args:
+            channel_id (str): The channel to list.
+            max_videos (int): The maximum number of videos returned.
+            published_after (str, optional): Only list videos published after this RFC 3339 time.
+        """
+        videos = []
+        page_token = None
+        while len(videos) < max_videos:
+            params = dict(part="snippet", channelId=channel_id, maxResults=min(50, max_videos - len(videos)),
+                          order="date", type="video")
+            if published_after:
+                params["publishedAfter"] = published_after
+            if page_token:
+                params["pageToken"] = page_token
+            response = self.get("search", **params)
+            if not response:
+                break
+            videos.extend((item['id']['videoId'], item['snippet']['publishedAt']) for item in response.get('items', []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+        return videos[:max_videos]
+
+    def iter_comment_pages(self, video_id, max_comments=500, page_token=None):
+        """
+        Yields (rows, next_page_token) for each page of comment rows, newest first, following
+        nextPageToken up to max_comments. Starts from page_token when one is given. The last page
+        of the video's comments has no next_page_token; if the walk ends while it is still set, the
+        comments past it were not read.
+        """
+        fetched = 0
+        while fetched < max_comments:
+            params = dict(part="snippet", videoId=video_id, maxResults=min(100, max_comments - fetched),
+                          order="time", textFormat="plainText")
+            if page_token:
+                params["pageToken"] = page_token
+            response = self.get("commentThreads", **params)
+            if not response:
+                return
+            rows = []
+            for item in response.get('items', [])[:max_comments - fetched]:
+                snippet = item['snippet']['topLevelComment']['snippet']
+                rows.append([snippet['textOriginal'], item['id'], video_id, snippet.get('publishedAt', '')])
+            fetched += len(rows)
+            page_token = response.get("nextPageToken")
+            yield rows, page_token
+            if not page_token:
+                return
+
+class CommentWriter:
+    """
+    Appends comment rows to a CSV file from several threads, flushing after every page.
+    Comments already in the file are never written again.
+
+    Args:
+        output_file (str): The CSV file.
+        append (bool): Whether to add to an existing file instead of replacing it.
+    """
+
+    HEADER = ['Comment', 'comment_id', 'video_id', 'published_at']
+
+    def __init__(self, output_file, append=True):
+        self._seen = set()
+        if append and os.path.exists(output_file) and os.path.getsize(output_file) > 0:
+            with open(output_file, 'r', newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                if next(reader, None) != self.HEADER:
+                    raise ValueError(f"{output_file} was not written by this version of the script; "
+                                     "rerun with --full or choose another --output-file.")
+                self._seen.update(row[1] for row in reader if len(row) > 1)
+            self._file = open(output_file, 'a', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
         else:
-            print(f"No channel found for {channel_name}")
-            return None
-
-    def get_videos(channel_id, api_key):
-        url = f"{BASE_URL}search?part=id&channelId={channel_id}&maxResults=50&order=date&type=video&key={api_key}"
-        response = requests.get(url).json()
-        return [item['id']['videoId'] for item in response.get('items', [])]
-
-    def get_comments(video_id, api_key):
-        url = f"{BASE_URL}commentThreads?part=snippet&videoId={video_id}&key={api_key}"
-        response = requests.get(url).json()
-        return [item['snippet']['topLevelComment']['snippet']['textOriginal'] for item in response.get('items', [])]
-
-    all_comments = []
-    for channel_name in CHANNEL_NAMES:
-        print(f"Fetching comments from {channel_name}...")
-        channel_id = get_channel_id(channel_name, api_key)
-        if channel_id:
-            videos = get_videos(channel_id, api_key)
-            for video in videos:
-                comments = get_comments(video, api_key)
-                all_comments.extend(comments)
-
-    output_file = 'youtube_comments.csv'
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(['Comment'])  # Header row
-        for comment in all_comments:
-            writer.writerow([comment])
-
-    print(f"\nSaved {len(all_comments)} comments to '{output_file}'")
+            self._file = open(output_file, 'w', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.HEADER)  # Header row
+        self._lock = threading.Lock()
+        self.existing = len(self._seen)
+        self.rows = 0
+
+    def write(self, rows):
+        """Writes the rows whose comment ids are new and returns how many were written."""
+        with self._lock:
+            rows = [row for row in rows if row[1] not in self._seen]
+            self._seen.update(row[1] for row in rows)
+            self._writer.writerows(rows)
+            self._file.flush()
+            self.rows += len(rows)
+            return len(rows)
+
+    def close(self):
+        self._file.close()
+
+def fetch_video_comments(client, writer, video_id, max_comments, watermark=None):
+    """
+    Streams one video's comments newer than its watermark into the writer.
+
+    Comments arrive newest first, so paging stops at the first comment the watermark covers.
+    The watermark only advances once the walk has read everything down to it. When the walk
+    stops short (max_comments was reached, or a request failed), the old watermark is kept and
+    the walk's newest comment and next page token are saved as pending_* and resume_page_token,
+    so the next run continues from that page instead of losing the comments in between.
+
+    Args:
+        watermark (dict, optional): The newest publish time seen by an earlier run
+            (last_comment_published_at), the comment ids published at that time, and the
+            position of an unfinished walk, if any.
+
+    Returns:
+        dict: The video's new watermark, including the number of comments written.
+    """
+    watermark = watermark or {}
+    since = watermark.get("last_comment_published_at")
+    since_ids = set(watermark.get("ids_at_watermark", []))
+    resume_token = watermark.get("resume_page_token")
+    if resume_token:
+        # The newest comments were read by the unfinished walk; pick up below them
+        newest = watermark.get("pending_published_at")
+        newest_ids = set(watermark.get("pending_ids", []))
+    else:
+        newest, newest_ids = None, set()
+    written = 0
+    pages = 0
+    next_token = resume_token
+    reached_watermark = False
+    try:
+        for rows, next_token in client.iter_comment_pages(video_id, max_comments, resume_token):
+            pages += 1
+            fresh = []
+            for row in rows:
+                published_at, comment_id = row[3], row[1]
+                # RFC 3339 UTC times compare correctly as strings
+                if since and (published_at < since or (published_at == since and comment_id in since_ids)):
+                    reached_watermark = True
+                    break
+                fresh.append(row)
+                if newest is None or published_at > newest:
+                    newest, newest_ids = published_at, {comment_id}
+                elif published_at == newest:
+                    newest_ids.add(comment_id)
+            written += writer.write(fresh)
+            if reached_watermark:
+                break
+    except QuotaExhausted:
+        raise
+    except Exception as e:
+        if not (resume_token and pages == 0):
+            raise
+        # Page tokens do not last forever; walk from the newest comment again next time
+        print(f"Could not resume comments of video {video_id} ({e}); restarting from the newest.")
+
+    result = {"comments_written": watermark.get("comments_written", 0) + written}
+    if reached_watermark or (pages and next_token is None):
+        # Everything down to the old watermark (or the oldest comment) has been read
+        result.update({
+            "last_comment_published_at": newest if newest is not None else since,
+            "ids_at_watermark": sorted(newest_ids if newest is not None else since_ids),
+            "pending_published_at": None,
+            "pending_ids": [],
+            "resume_page_token": None,
+        })
+    elif resume_token and pages == 0:
+        # The saved page could not be read; keep what the earlier walk found and start over
+        result.update({"pending_published_at": newest, "pending_ids": sorted(newest_ids),
+                       "resume_page_token": None})
+    elif pages:
+        result.update({"pending_published_at": newest, "pending_ids": sorted(newest_ids),
+                       "resume_page_token": next_token})
+    return result
+
+def list_channel_videos(client, state, channel_name, max_videos):
+    """
+    Returns the ids of a channel's most recent videos, listing only those published since the
+    channel's watermark and remembering the channel id, so a repeat run costs one search call.
+    """
+    channel_state = state.get("comment_channels", channel_name)
+    channel_id = channel_state.get("channel_id") or client.get_channel_id(channel_name)
+    if not channel_id:
+        return [], 0
+
+    since = channel_state.get("last_video_published_at")
+    listed = client.get_videos(channel_id, max_videos, published_after=since)
+    known = channel_state.get("video_ids", [])
+    new_ids = [video_id for video_id, _ in listed if video_id not in known]
+    video_ids = (new_ids + known)[:max_videos]
+    published = [published_at for _, published_at in listed]
+    if since:
+        published.append(since)
+    state.update("comment_channels", channel_name, channel_id=channel_id, video_ids=video_ids,
+                 last_video_published_at=max(published) if published else None)
+    return video_ids, len(new_ids)
+
+def get_youtube_comments(api_key, channel_names=CHANNEL_NAMES, output_file='youtube_comments.csv',
+                         base_url=BASE_URL, workers=8, max_comments_per_video=500, max_videos_per_channel=50,
+                         requests_per_second=10.0, quota_units=10000, state_file=DEFAULT_STATE_FILE,
+                         incremental=True):
+    """
+    Fetches comments from specified YouTube channels and saves them to a CSV file.
+
+    Args:
+        api_key (str): The YouTube Data API key.
+        channel_names (list): The channels to harvest.
+        output_file (str): The CSV file rows are appended to.
+        base_url (str): The API root; point it at a local mock for benchmarks.
+        workers (int): The number of videos fetched concurrently.
+        max_comments_per_video (int): The per-video cap on comments, across all pages.
+        max_videos_per_channel (int): How many of each channel's most recent videos are harvested.
+        requests_per_second (float): The request rate limit shared by all workers.
+        quota_units (int): The quota units this run may spend before it stops.
+        state_file (str): The crawl state holding the channel and video watermarks.
+        incremental (bool): Whether to continue from the crawl state; otherwise the CSV and the
+            watermarks are rebuilt from scratch.
+
+    Returns:
+        dict: Counts of channels, videos, comments, requests, retries and quota used, and the elapsed time.
+    """
+    limiter = RateLimiter(requests_per_second, burst=max(1, workers), quota_units=quota_units)
+    client = YouTubeClient(api_key, base_url, limiter, pool_size=workers)
+    state = CrawlState(state_file)
+    if not incremental:
+        state.clear("comment_channels")
+        state.clear("comment_videos")
+    writer = CommentWriter(output_file, append=incremental)
+    if writer.existing:
+        print(f"Appending to {writer.existing} comments already in '{output_file}'")
+    started = time.perf_counter()
+    videos = 0
+    new_videos = 0
+    failed = 0
+
+    def crawl_video(video_id):
+        watermark = fetch_video_comments(client, writer, video_id, max_comments_per_video,
+                                         state.get("comment_videos", video_id))
+        # Saved only once the rows are on disk, so an interrupted video is read again
+        state.update("comment_videos", video_id, **watermark)
+
+    try:
+        video_ids = []
+        for channel_name in channel_names:
+            print(f"Fetching videos from {channel_name}...")
+            channel_video_ids, channel_new = list_channel_videos(client, state, channel_name, max_videos_per_channel)
+            video_ids.extend(channel_video_ids)
+            new_videos += channel_new
+
+        print(f"Fetching comments from {len(video_ids)} videos ({new_videos} new) with {workers} workers...")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(crawl_video, video_id): video_id for video_id in video_ids}
+            for future in futures:
+                try:
+                    future.result()
+                    videos += 1
+                except QuotaExhausted:
+                    raise
+                except Exception as e:
+                    failed += 1
+                    print(f"Failed to fetch comments for video {futures[future]}: {e}")
+    except QuotaExhausted as e:
+        print(f"\nStopping early: {e}")
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"\nSaved {writer.rows} new comments to '{output_file}'")
+    return {
+        "channels": len(channel_names),
+        "videos": videos,
+        "new_videos": new_videos,
+        "failed_videos": failed,
+        "comments": writer.rows,
+        "requests": client.requests,
+        "retries": client.retries,
+        "quota_used": limiter.quota_used,
+        "elapsed_s": elapsed,
+    }
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch comments from YouTube channels into a CSV file.")
+    parser.add_argument("--channels", nargs="+", default=CHANNEL_NAMES, help="The channel names to harvest.")
+    parser.add_argument("--output-file", default="youtube_comments.csv", help="The CSV file to write comments to.")
+    parser.add_argument("--base-url", default=os.getenv("YOUTUBE_API_BASE_URL", BASE_URL), help="The Data API root.")
+    parser.add_argument("--workers", type=int, default=8, help="Videos fetched concurrently.")
+    parser.add_argument("--max-comments", type=int, default=500, help="The maximum comments fetched per video.")
+    parser.add_argument("--max-videos", type=int, default=50, help="The most recent videos harvested per channel.")
+    parser.add_argument("--requests-per-second", type=float, default=10.0, help="The shared request rate limit.")
+    parser.add_argument("--quota", type=int, default=10000, help="Quota units this run may spend.")
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE, help="The incremental crawl state.")
+    parser.add_argument("--full", action="store_true", help="Ignore the crawl state and rebuild the CSV from scratch.")
+    args = parser.parse_args()
+
     load_dotenv()
     api_key = os.getenv("YOUTUBE_API_KEY")
+    if not api_key and args.base_url != BASE_URL:
+        # A local mock of the API does not check keys
+        api_key = "mock"
     if not api_key:
         raise ValueError("API key not found. Provide it in a .env file as YOUTUBE_API_KEY.")
-    get_youtube_comments(api_key)
+    stats = get_youtube_comments(api_key, args.channels, args.output_file, args.base_url, args.workers,
+                                 args.max_comments, args.max_videos, args.requests_per_second, args.quota,
+                                 args.state_file, incremental=not args.full)
+    print(f"{stats['videos']} videos, {stats['requests']} requests ({stats['retries']} retries), "
+          f"{stats['quota_used']} quota units, {stats['elapsed_s']:.1f}s")
@@ -0,0 +1,121 @@
+# This module holds the prompt-and-generate code shared by the web app, the
+# command-line scripts, the evaluation harness and the translation worker.
+# Models are kept in a process-wide registry, so each (model, backend) pair is
+# loaded from disk at most once per process.
+import os
+import threading
+from scripts.decoding_policy import get_policy
+from scripts.model_backends import DEFAULT_BACKEND, DEFAULT_MODEL_PATH, load_translation_model
+from scripts.segmentation import MAX_INPUT_TOKENS, PROMPT_TEMPLATE
+
+_models = {}
+_models_lock = threading.Lock()
+
+def get_model(model_path=DEFAULT_MODEL_PATH, backend=DEFAULT_BACKEND):
+    """
+    Returns the (tokenizer, model) pair for a backend, loading it on first use.
+
+    Args:
+        model_path (str): The fp32 model directory; variants are found next to it.
+        backend (str): The inference backend: "pytorch", "int8" or "onnx".
+    """
+    key = (os.path.abspath(model_path), backend)
+    with _models_lock:
+        if key not in _models:
+            _models[key] = load_translation_model(model_path, backend)
+        return _models[key]
+
+def loaded_models():
+    """Returns the (model path, backend) pairs loaded in this process."""
+    with _models_lock:
+        return list(_models)
+
+def build_prompt(text):
+    """Wraps a dialect phrase in the prompt the model was fine-tuned on."""
+    return PROMPT_TEMPLATE.format(text)
+
+def prompt_overhead(tokenizer):
+    """Returns the number of tokens the prompt wrapper and end-of-sequence token take up."""
+    return len(tokenizer(build_prompt(""))["input_ids"])
+
+def input_lengths(texts, tokenizer):
+    """Returns the token length of each text on its own, without the prompt."""
+    if not texts:
+        return []
+    return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+def encode_prompts(prompts, tokenizer, max_length=None):
+    """Tokenizes prompts without padding, truncating to max_length (or the model's limit)."""
+    return tokenizer(prompts, truncation=True, max_length=max_length)["input_ids"]
+
+def length_sorted_batches(encoded, batch_size):
+    """Yields lists of indices into encoded, grouping inputs of similar token length."""
+    order = sorted(range(len(encoded)), key=lambda idx: len(encoded[idx]))
+    for start in range(0, len(order), batch_size):
+        yield order[start:start + batch_size]
+
+def batch_settings(input_ids, tokenizer, policy=None, latency_budget_ms=None, overhead=None):
+    """
+    Returns the decoding policy's `generate` settings for a batch of encoded prompts.
+
+    The longest prompt in the batch decides, so no input gets a shorter max_length than it needs.
+
+    Args:
+        input_ids (list): The token ids of each prompt in the batch.
+        tokenizer: The model's tokenizer.
+        policy (str, optional): The decoding policy name; defaults to DECODING_POLICY.
+        latency_budget_ms (float, optional): Lets the policy trade beams for speed.
+        overhead (int, optional): The precomputed prompt_overhead of the tokenizer.
+    """
+    if overhead is None:
+        overhead = prompt_overhead(tokenizer)
+    longest = max(len(ids) for ids in input_ids)
+    return get_policy(policy).settings(max(longest - overhead, 1), latency_budget_ms)
+
+def generate_translations(tokenizer, model, input_ids, **generation_params):
+    """
+    Pads one batch of encoded prompts, runs `model.generate` and decodes the outputs.
+
+    Args:
+        tokenizer: The model's tokenizer.
+        model: The translation model of any backend.
+        input_ids (list): The token ids of each prompt in the batch.
+        **generation_params: Keyword arguments for `model.generate`, such as num_beams.
+    """
+    inputs = tokenizer.pad({"input_ids": input_ids}, return_tensors="pt")
+    output_sequences = model.generate(
+        input_ids=inputs['input_ids'],
+        attention_mask=inputs['attention_mask'],
+        **generation_params
+    )
+    translations = tokenizer.batch_decode(output_sequences, skip_special_tokens=True)
+    return [translation.strip() for translation in translations]
+
+def translate_batch(texts, tokenizer, model, **generation_params):
+    """Translates texts in a single `generate` call with the given settings."""
+    prompts = [build_prompt(text) for text in texts]
+    return generate_translations(tokenizer, model, encode_prompts(prompts, tokenizer, MAX_INPUT_TOKENS),
+                                 **generation_params)
+
+def translate_texts(texts, tokenizer, model, batch_size=16, policy=None, latency_budget_ms=None, max_length=None):
+    """
+    Translates any number of texts in length-sorted batches and returns them in input order.
+
+    Args:
+        texts (list): The dialect phrases to translate.
+        tokenizer: The model's tokenizer.
+        model: The translation model of any backend.
+        batch_size (int): The number of texts translated in one `generate` call.
+        policy (str, optional): The decoding policy name; defaults to DECODING_POLICY.
+        latency_budget_ms (float, optional): Lets the policy trade beams for speed.
+        max_length (int, optional): The maximum prompt length in tokens; longer prompts are truncated.
+    """
+    encoded = encode_prompts([build_prompt(text) for text in texts], tokenizer, max_length)
+    overhead = prompt_overhead(tokenizer)
+    translations = [None] * len(texts)
+    for batch_indices in length_sorted_batches(encoded, batch_size):
+        input_ids = [encoded[idx] for idx in batch_indices]
+        settings = batch_settings(input_ids, tokenizer, policy, latency_budget_ms, overhead)
+        for idx, translation in zip(batch_indices, generate_translations(tokenizer, model, input_ids, **settings)):
+            translations[idx] = translation
+    return translations
@@ -0,0 +1,143 @@
+# This module provides local stand-ins for the Twelve Labs client and for yt-dlp, so the
+# ingestion pipeline in phase1_data_ingestion.py can be run and timed without network
+# access or an API key. Delays are simulated with sleeps, and the fake client records how
+# many indexing tasks were in flight at once so concurrency limits can be checked.
+import itertools
+import os
+import subprocess
+import threading
+import time
+
+class FakeSegment:
+    def __init__(self, start, text):
+        self.start = start
+        self.text = text
+
+class FakeIndex:
+    def __init__(self, index_id, name):
+        self.id = index_id
+        self.name = name
+
+class FakeTask:
+    """A simulated indexing task that becomes ready a fixed time after it was created."""
+
+    def __init__(self, task_id, index_id, video_path, ready_at, tasks):
+        self.id = task_id
+        self.index_id = index_id
+        self.video_path = video_path
+        self.ready_at = ready_at
+        self._tasks = tasks
+
+    @property
+    def status(self):
+        return "ready" if time.monotonic() >= self.ready_at else "indexing"
+
+    def wait(self, sleep_interval=0.05):
+        with self._tasks.tracking(self.id):
+            while self.status != "ready":
+                time.sleep(min(sleep_interval, max(0.0, self.ready_at - time.monotonic())))
+        return self
+
+class _FakeIndexes:
+    def __init__(self):
+        self._indexes = []
+        self._ids = itertools.count(1)
+
+    def list(self):
+        return list(self._indexes)
+
+    def create(self, name, models=None):
+        index = FakeIndex(f"fake-index-{next(self._ids)}", name)
+        self._indexes.append(index)
+        return index
+
+class _FakeTasks:
+    def __init__(self, upload_mb_per_s, index_seconds, transcription_seconds, segments_per_video):
+        self.upload_mb_per_s = upload_mb_per_s
+        self.index_seconds = index_seconds
+        self.transcription_seconds = transcription_seconds
+        self.segments_per_video = segments_per_video
+        self._tasks = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def tracking(self, task_id):
+        tasks = self
+
+        class _Tracker:
+            def __enter__(self):
+                with tasks._lock:
+                    tasks.in_flight += 1
+                    tasks.peak_in_flight = max(tasks.peak_in_flight, tasks.in_flight)
+
+            def __exit__(self, *exc):
+                with tasks._lock:
+                    tasks.in_flight -= 1
+
+        return _Tracker()
+
+    def create(self, index_id, file, language="en"):
+        # Simulate the upload at a fixed bandwidth
+        time.sleep(os.path.getsize(file) / (self.upload_mb_per_s * 1024 * 1024))
+        with self._lock:
+            task_id = f"fake-task-{next(self._ids)}"
+            task = FakeTask(task_id, index_id, file, time.monotonic() + self.index_seconds, self)
+            self._tasks[task_id] = task
+            self.created += 1
+        return task
+
+    def retrieve(self, task_id):
+        with self._lock:
+            if task_id not in self._tasks:
+                raise KeyError(f"Unknown task {task_id}")
+            return self._tasks[task_id]
+
+    def transcription(self, task_id):
+        task = self.retrieve(task_id)
+        if task.status != "ready":
+            raise RuntimeError(f"Task {task_id} is still indexing")
+        time.sleep(self.transcription_seconds)
+        name = os.path.basename(task.video_path)
+        return [FakeSegment(float(n * 5), f"Segment {n + 1} of {name}") for n in range(self.segments_per_video)]
+
+class FakeTwelveLabsClient:
+    """
+    Mimics the parts of the TwelveLabs client used for ingestion: index.list, index.create,
+    task.create, task.retrieve, task.wait and task.transcription.
+
+    Args:
+        upload_mb_per_s (float): Simulated upload bandwidth.
+        index_seconds (float): How long each task takes to index after its upload.
+        transcription_seconds (float): How long fetching a transcript takes.
+        segments_per_video (int): The number of transcript segments returned for each video.
+    """
+
+    def __init__(self, upload_mb_per_s=20.0, index_seconds=2.0, transcription_seconds=0.05, segments_per_video=3):
+        self.index = _FakeIndexes()
+        self.task = _FakeTasks(upload_mb_per_s, index_seconds, transcription_seconds, segments_per_video)
+
+def make_fake_downloader(seconds=0.5, size_bytes=1024 * 1024, fail_urls=()):
+    """
+    Returns a downloader with the same interface as download_video that writes a dummy file.
+
+    Args:
+        seconds (float): How long each download takes.
+        size_bytes (int): The size of each downloaded file.
+        fail_urls (iterable): URLs that fail the way yt-dlp does, with CalledProcessError.
+    """
+    fail_urls = set(fail_urls)
+
+    def download(url, output_path):
+        time.sleep(seconds)
+        if url in fail_urls:
+            raise subprocess.CalledProcessError(1, ["yt-dlp", url], stderr=b"ERROR: Video unavailable")
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(output_path, "wb") as f:
+            f.write(b"\0" * size_bytes)
+
+    return download
@@ -0,0 +1,248 @@
+# This module runs long media jobs (upload conversion, transcription, translation)
+# on a bounded pool of background workers, so request threads return immediately.
+# Job state lives in a pluggable store: in memory by default, or in a directory of
+# JSON files or a SQLite database when jobs should survive a restart.
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED_STATES = (DONE, FAILED)
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while every worker and queue slot is taken."""
+
+class InMemoryJobStore:
+    """Keeps job state in a dictionary. Jobs are lost when the process exits."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def save(self, job):
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_unfinished(self):
+        with self._lock:
+            return [dict(job) for job in self._jobs.values() if job["status"] not in FINISHED_STATES]
+
+class FileJobStore:
+    """Keeps each job as a JSON file in a directory."""
+
+    def __init__(self, directory="job_state"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def save(self, job):
+        temp_path = f"{self._path(job['id'])}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(job, f)
+        os.replace(temp_path, self._path(job["id"]))
+
+    def get(self, job_id):
+        # Job ids are generated by uuid4, so anything else cannot name a job file
+        try:
+            uuid.UUID(job_id)
+        except ValueError:
+            return None
+        try:
+            with open(self._path(job_id), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def list_unfinished(self):
+        jobs = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                job = self.get(name[:-len(".json")])
+                if job and job["status"] not in FINISHED_STATES:
+                    jobs.append(job)
+        return jobs
+
+class SQLiteJobStore:
+    """Keeps job state in a SQLite database."""
+
+    def __init__(self, db_path="job_state/jobs.sqlite3"):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, data TEXT NOT NULL)")
+        conn.commit()
+
+    def _connection(self):
+        # SQLite connections cannot be shared between threads or forked processes
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def save(self, job):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (id, status, data) VALUES (?, ?, ?)",
+            (job["id"], job["status"], json.dumps(job)),
+        )
+        conn.commit()
+
+    def get(self, job_id):
+        row = self._connection().execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list_unfinished(self):
+        placeholders = ", ".join("?" for _ in FINISHED_STATES)
+        rows = self._connection().execute(
+            f"SELECT data FROM jobs WHERE status NOT IN ({placeholders})", FINISHED_STATES
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+def create_job_store(kind="memory", path=None):
+    """
+    Creates a job store by name.
+
+    Args:
+        kind (str): One of "memory", "file" or "sqlite".
+        path (str, optional): The directory (file store) or database file (SQLite store).
+    """
+    if kind == "memory":
+        return InMemoryJobStore()
+    if kind == "file":
+        return FileJobStore(path or "job_state")
+    if kind == "sqlite":
+        return SQLiteJobStore(path or "job_state/jobs.sqlite3")
+    raise ValueError(f"Unknown job store: {kind}")
+
+class JobManager:
+    """
+    Runs submitted jobs on a bounded pool of background threads.
+
+    Args:
+        handler (callable): Called with a job's payload; its return value becomes the job result.
+        store: The job store used to persist state.
+        max_workers (int): The number of jobs that run at the same time.
+        max_queued (int): The number of jobs that may wait for a free worker before submissions are rejected.
+    """
+
+    def __init__(self, handler, store=None, max_workers=2, max_queued=16):
+        self.handler = handler
+        self.store = store or InMemoryJobStore()
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self._slots = threading.BoundedSemaphore(max_workers + max_queued)
+        self._changed = threading.Condition()
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._recover_unfinished()
+
+    def _recover_unfinished(self):
+        # Jobs that were queued or running when the previous process stopped will never finish
+        for job in self.store.list_unfinished():
+            self._update(job, status=FAILED, error="Interrupted by a server restart.")
+
+    def _ensure_executor(self):
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job-worker")
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _update(self, job, **fields):
+        job.update(fields)
+        job["updated_at"] = time.time()
+        self.store.save(job)
+        with self._changed:
+            self._changed.notify_all()
+        return job
+
+    def submit(self, payload, on_finish=None):
+        """
+        Queues a job and returns its id immediately.
+
+        Args:
+            payload (dict): JSON-serializable arguments passed to the handler.
+            on_finish (callable, optional): Called with the payload once the job has finished,
+                whether it succeeded or not. Useful for removing temporary files.
+
+        Raises:
+            JobQueueFull: If every worker and queue slot is taken.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFull(f"Too many jobs in progress (limit {self.max_workers + self.max_queued}).")
+        now = time.time()
+        job = {
+            "id": str(uuid.uuid4()),
+            "status": QUEUED,
+            "created_at": now,
+            "updated_at": now,
+            "payload": payload,
+            "result": None,
+            "error": None,
+        }
+        try:
+            self.store.save(job)
+            self._ensure_executor().submit(self._run, job, on_finish)
+        except Exception:
+            self._slots.release()
+            raise
+        return job["id"]
+
+    def _run(self, job, on_finish):
+        try:
+            self._update(job, status=RUNNING, started_at=time.time())
+            result = self.handler(job["payload"])
+            self._update(job, status=DONE, result=result, finished_at=time.time())
+        except Exception as e:
+            print(f"Job {job['id']} failed: {e}")
+            self._update(job, status=FAILED, error=str(e), finished_at=time.time())
+        finally:
+            self._slots.release()
+            if on_finish:
+                try:
+                    on_finish(job["payload"])
+                except Exception as e:
+                    print(f"Cleanup for job {job['id']} failed: {e}")
+
+    def get(self, job_id):
+        """Returns the current state of a job, or None if it does not exist."""
+        return self.store.get(job_id)
+
+    def wait_for_update(self, job_id, since, timeout=15):
+        """
+        Blocks until the job changes after the `since` timestamp, or until timeout.
+
+        Changes made by other processes sharing a persistent store are noticed by
+        re-reading the store once a second.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.store.get(job_id)
+            if job is None or job["updated_at"] > since or job["status"] in FINISHED_STATES:
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+            with self._changed:
+                self._changed.wait(min(remaining, 1.0))
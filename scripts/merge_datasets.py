@@ -1,51 +1,236 @@
 # This script merges the original dataset with a new dataset of translated comments.
 # It creates an augmented dataset for training the translation model.
-import pandas as pd
+#
+# The inputs are streamed in chunks rather than loaded whole, and duplicates are removed
+# in three stages: rows with a missing prompt or response, exact duplicates of the
+# normalized dialect text (casing, punctuation, emoji and spacing ignored), and near
+# duplicates found with MinHash/LSH. Rows are compared on the dialect side only, and the
+# first occurrence wins, so rows from the original dataset are kept over scraped ones.
+import argparse
+import csv
+import hashlib
 import os
+import time
+import unicodedata
+import zlib
+import numpy as np
 
-def merge_datasets():
+DEFAULT_INPUTS = ['dataset.csv', 'translated_youtube_comments.csv']
+DEFAULT_OUTPUT = 'augmented_dataset.csv'
+
+# Unicode categories dropped by normalize_text: punctuation, symbols (emoji included),
+# control and format characters (e.g. zero-width joiners) and combining marks
+# (e.g. emoji variation selectors)
+_DROPPED_CATEGORIES = ('P', 'S', 'C', 'M')
+
+# 2**61 - 1, the modulus of the MinHash permutations
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+def normalize_text(text):
+    """Returns text in the form duplicates are compared in: casefolded, without punctuation, symbols or emoji,
+    and with runs of whitespace collapsed."""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    kept = ''.join(' ' if ch.isspace() else ch for ch in text
+                   if ch.isspace() or not unicodedata.category(ch).startswith(_DROPPED_CATEGORIES))
+    return ' '.join(kept.split())
+
+def dialect_text(prompt):
+    """Strips the 'tec:' prefix translate_new_data.py adds to prompts."""
+    return prompt[4:] if prompt.startswith('tec:') else prompt
+
+def iter_chunks(path, chunk_size):
+    """Yields lists of at most chunk_size (prompt, response) rows from a CSV file, skipping its header."""
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Skip header row
+        chunk = []
+        for row in reader:
+            chunk.append((row[0] if row else '', row[1] if len(row) > 1 else ''))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def choose_bands(threshold, num_perm, recall=0.95):
     """
-    Merges the original dataset.csv with the newly translated youtube_comments.csv.
+    Picks the LSH banding (bands, rows per band) for a similarity threshold. Two texts with Jaccard
+    similarity s share at least one band with probability 1 - (1 - s**rows)**bands; this returns the
+    longest bands that still make texts at the threshold candidates with the given probability.
+    Candidates are verified against their signatures, so a looser banding costs time, not precision.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            best = (bands, rows)
+    return best
+
+class MinHasher:
+    """
+    Computes MinHash signatures of texts' character shingles with num_perm random
+    permutations of the form (a * h + b) mod (2**61 - 1).
+
+    Args:
+        num_perm (int): The signature length.
+        shingle_size (int): The length of the character n-grams compared.
+        seed (int): The seed of the permutations, so signatures are reproducible.
+    """
+
+    def __init__(self, num_perm=64, shingle_size=4, seed=42):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, (1 << 32) - 1, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, (1 << 32) - 1, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text):
+        size = self.shingle_size
+        if len(text) <= size:
+            return {text}
+        return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+    def signature(self, text):
+        """Returns the uint32 signature of an already normalized text."""
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in self.shingles(text)),
+                             dtype=np.uint64)
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+class NearDuplicateIndex:
     """
-    # Define file paths
-    original_dataset_path = 'dataset.csv'
-    new_dataset_path = 'translated_youtube_comments.csv'
-    output_path = 'augmented_dataset.csv'
+    An LSH index over the MinHash signatures of the rows kept so far. A candidate sharing a band
+    is only treated as a duplicate once the signatures' estimated Jaccard similarity reaches the
+    threshold, so band collisions alone never drop a row.
 
+    Every kept row is indexed in every band, so a near duplicate is found whenever it shares any
+    band with it, as choose_bands assumes. Only signatures are kept (num_perm * 4 bytes per row,
+    plus one row id per band), never the texts themselves.
+
+    Args:
+        threshold (float): The Jaccard similarity at or above which two texts are near duplicates.
+        num_perm (int): The signature length.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=64):
+        self.threshold = threshold
+        self.bands, self.rows_per_band = choose_bands(threshold, num_perm)
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = []
+
+    def _band_keys(self, signature):
+        r = self.rows_per_band
+        return [hash(signature[i * r:(i + 1) * r].tobytes()) for i in range(self.bands)]
+
+    def add_if_new(self, signature):
+        """Indexes the signature and returns True, or returns False if a near duplicate is already indexed."""
+        keys = self._band_keys(signature)
+        checked = set()
+        for bucket, key in zip(self._buckets, keys):
+            for candidate in bucket.get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                other = np.frombuffer(self._signatures[candidate], dtype=np.uint32)
+                if np.count_nonzero(other == signature) / len(signature) >= self.threshold:
+                    return False
+
+        row_id = len(self._signatures)
+        self._signatures.append(signature.tobytes())
+        for bucket, key in zip(self._buckets, keys):
+            bucket.setdefault(key, []).append(row_id)
+        return True
+
+    def __len__(self):
+        return len(self._signatures)
+
+def merge_datasets(input_paths=DEFAULT_INPUTS, output_path=DEFAULT_OUTPUT, threshold=0.8, num_perm=64,
+                   chunk_size=10000, near_duplicates=True):
+    """
+    Merges the original dataset.csv with the newly translated youtube_comments.csv.
+
+    Args:
+        input_paths (list): The CSV files of (prompt, response) rows, in priority order.
+        output_path (str): The merged CSV file.
+        threshold (float): The MinHash Jaccard similarity at or above which rows are near duplicates.
+        num_perm (int): The MinHash signature length; longer signatures estimate similarity more precisely.
+        chunk_size (int): The number of rows read and written at a time.
+        near_duplicates (bool): Whether to run the MinHash/LSH stage after exact deduplication.
+
+    Returns:
+        dict: The number of rows read, removed by each stage and written.
+    """
     # Check if files exist
-    if not os.path.exists(original_dataset_path):
-        print(f"Error: {original_dataset_path} not found.")
-        return
-    if not os.path.exists(new_dataset_path):
-        print(f"Error: {new_dataset_path} not found.")
-        return
-
-    # Read the datasets
-    print("Reading datasets...")
-    original_df = pd.read_csv(original_dataset_path)
-    new_df = pd.read_csv(new_dataset_path)
-
-    # Standardize column names if they are different, assuming 'prompt' and 'response'
-    original_df.columns = ['prompt', 'response']
-    new_df.columns = ['prompt', 'response']
-
-    # Concatenate the dataframes
-    print("Merging datasets...")
-    merged_df = pd.concat([original_df, new_df], ignore_index=True)
+    for path in input_paths:
+        if not os.path.exists(path):
+            print(f"Error: {path} not found.")
+            return None
 
-    # Drop rows with missing values
-    merged_df.dropna(inplace=True)
+    hasher = MinHasher(num_perm)
+    index = NearDuplicateIndex(threshold, num_perm)
+    seen = set()
+    stats = {"read": 0, "missing": 0, "exact_duplicates": 0, "near_duplicates": 0, "written": 0}
+    started = time.perf_counter()
 
-    # Remove duplicates
-    merged_df.drop_duplicates(inplace=True)
+    print("Merging datasets...")
+    if near_duplicates:
+        print(f"Near duplicates: Jaccard >= {threshold} on {num_perm}-permutation MinHash "
+              f"({index.bands} bands of {index.rows_per_band} rows)")
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, 'w', newline='', encoding='utf-8') as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(['prompt', 'response'])
+        for path in input_paths:
+            file_rows = 0
+            for chunk in iter_chunks(path, chunk_size):
+                kept = []
+                for prompt, response in chunk:
+                    file_rows += 1
+                    normalized = normalize_text(dialect_text(prompt))
+                    # Drop rows with missing values
+                    if not normalized or not response.strip():
+                        stats["missing"] += 1
+                        continue
+                    # An 8-byte digest keeps the exact-match set small; collisions are negligible
+                    digest = hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).digest()
+                    if digest in seen:
+                        stats["exact_duplicates"] += 1
+                        continue
+                    seen.add(digest)
+                    if near_duplicates and not index.add_if_new(hasher.signature(normalized)):
+                        stats["near_duplicates"] += 1
+                        continue
+                    kept.append((prompt, response))
+                writer.writerows(kept)
+                stats["written"] += len(kept)
+            stats["read"] += file_rows
+            print(f"Read {file_rows} rows from {path}")
+    os.replace(temp_path, output_path)
 
-    # Save the merged dataset
-    print(f"Saving merged dataset to {output_path}...")
-    merged_df.to_csv(output_path, index=False)
-    print("Merge complete.")
-    print(f"Original dataset size: {len(original_df)}")
-    print(f"New data size: {len(new_df)}")
-    print(f"Total augmented dataset size: {len(merged_df)}")
+    elapsed = time.perf_counter() - started
+    print(f"Saved merged dataset to {output_path}")
+    print(f"Rows read:                  {stats['read']}")
+    print(f"Missing values removed:     {stats['missing']}")
+    print(f"Exact duplicates removed:   {stats['exact_duplicates']}")
+    if near_duplicates:
+        print(f"Near duplicates removed:    {stats['near_duplicates']}")
+    print(f"Total augmented dataset size: {stats['written']}")
+    print(f"Merge complete in {elapsed:.1f}s ({stats['read'] / elapsed if elapsed else 0:.0f} rows/s).")
+    stats["elapsed_s"] = elapsed
+    return stats
 
 if __name__ == "__main__":
-    merge_datasets()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Merge and deduplicate the training datasets.")
+    parser.add_argument("--inputs", nargs="+", default=DEFAULT_INPUTS,
+                        help="CSV files of prompt/response rows, in priority order.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="The merged CSV file.")
+    parser.add_argument("--threshold", type=float, default=0.8,
+                        help="Jaccard similarity at or above which rows are near duplicates.")
+    parser.add_argument("--num-perm", type=int, default=64, help="MinHash signature length.")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Rows read and written at a time.")
+    parser.add_argument("--exact-only", action="store_true", help="Skip the near-duplicate stage.")
+    args = parser.parse_args()
+
+    merge_datasets(args.inputs, args.output, args.threshold, args.num_perm, args.chunk_size,
+                   near_duplicates=not args.exact_only)
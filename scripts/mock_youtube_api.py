@@ -0,0 +1,207 @@
+# This script serves a local mock of the parts of the YouTube Data API used by
+# get_youtube_comments.py, so comment harvesting can be run and benchmarked without an
+# API key or quota. Responses have a configurable latency, pages follow nextPageToken,
+# and a fraction of requests can be failed with rate-limit errors to exercise retries.
+#
+#     python scripts/mock_youtube_api.py --port 8765
+#     python scripts/get_youtube_comments.py --base-url http://127.0.0.1:8765/youtube/v3/
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+def format_time(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def parse_time(value):
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+class MockYouTubeData:
+    """
+    The channels, videos and comments served by the mock, generated deterministically.
+
+    Args:
+        channel_names (list): The channel names that can be searched for.
+        videos_per_channel (int): The number of videos each channel starts with.
+        comments_per_video (int): The number of comments each video starts with.
+        comments_disabled_every (int): Every nth video has comments disabled (0 for none).
+    """
+
+    def __init__(self, channel_names, videos_per_channel=20, comments_per_video=250, comments_disabled_every=10):
+        self.comments_disabled_every = comments_disabled_every
+        self._lock = threading.Lock()
+        self._clock = EPOCH
+        self._video_count = 0
+        self.channels = {}
+        self.videos = {}
+        self.comments = {}
+        for name in channel_names:
+            channel_id = f"UC{name}"
+            self.channels[channel_id] = {"name": name, "videos": []}
+            for _ in range(videos_per_channel):
+                self.add_video(channel_id, comments_per_video)
+
+    def _tick(self, minutes=1):
+        self._clock += timedelta(minutes=minutes)
+        return self._clock
+
+    def add_video(self, channel_id, comments=0):
+        """Publishes a new video on a channel with some comments, and returns its id."""
+        with self._lock:
+            self._video_count += 1
+            video_id = f"vid{self._video_count:05d}"
+            self.videos[video_id] = {"channel_id": channel_id, "published_at": self._tick(60),
+                                     "comments_disabled": bool(self.comments_disabled_every)
+                                     and self._video_count % self.comments_disabled_every == 0}
+            # Newest first, like the API's date order
+            self.channels[channel_id]["videos"].insert(0, video_id)
+            self.comments[video_id] = []
+        self.add_comments(video_id, comments)
+        return video_id
+
+    def add_comments(self, video_id, count):
+        """Posts count new comments on a video."""
+        with self._lock:
+            existing = self.comments[video_id]
+            for n in range(len(existing), len(existing) + count):
+                existing.insert(0, {"id": f"{video_id}-c{n:06d}", "published_at": self._tick(),
+                                    "text": f"Comment {n} pon {video_id}, wah gwan"})
+
+class MockYouTubeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, data, latency_ms=50, error_rate=0.0, seed=0):
+        super().__init__(address, MockYouTubeHandler)
+        self.data = data
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.stats_lock = threading.Lock()
+        self.request_counts = {}
+        self.errors_injected = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/youtube/v3/"
+
+class MockYouTubeHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_reason(self, status, reason, headers=None):
+        self.send_json(status, {"error": {"code": status, "errors": [{"reason": reason}]}}, headers)
+
+    def do_GET(self):
+        server = self.server
+        parsed = urllib.parse.urlparse(self.path)
+        endpoint = parsed.path.rstrip("/").rsplit("/", 1)[-1]
+        params = {key: values[0] for key, values in urllib.parse.parse_qs(parsed.query).items()}
+
+        with server.stats_lock:
+            server.request_counts[endpoint] = server.request_counts.get(endpoint, 0) + 1
+            inject_error = server.random.random() < server.error_rate
+            if inject_error:
+                server.errors_injected += 1
+        time.sleep(server.latency_ms / 1000)
+
+        if inject_error:
+            return self.send_error_reason(429, "rateLimitExceeded")
+        if endpoint == "search":
+            return self.handle_search(params)
+        if endpoint == "commentThreads":
+            return self.handle_comment_threads(params)
+        return self.send_error_reason(404, "notFound")
+
+    def page(self, items, params, default_size):
+        """Returns one page of items and the token of the next page, if any."""
+        start = int(params.get("pageToken", 0))
+        size = min(int(params.get("maxResults", default_size)), 100)
+        end = start + size
+        return items[start:end], (str(end) if end < len(items) else None)
+
+    def handle_search(self, params):
+        data = self.server.data
+        if params.get("type") == "channel":
+            query = params.get("q", "").lower()
+            items = [{"id": {"channelId": channel_id}} for channel_id, channel in data.channels.items()
+                     if channel["name"].lower() == query]
+            return self.send_json(200, {"items": items[:1]})
+
+        channel = data.channels.get(params.get("channelId"))
+        if channel is None:
+            return self.send_json(200, {"items": []})
+        with data._lock:
+            video_ids = list(channel["videos"])
+        if "publishedAfter" in params:
+            after = parse_time(params["publishedAfter"])
+            video_ids = [video_id for video_id in video_ids if data.videos[video_id]["published_at"] > after]
+        page, next_token = self.page(video_ids, params, 5)
+        payload = {"items": [{"id": {"videoId": video_id},
+                              "snippet": {"publishedAt": format_time(data.videos[video_id]["published_at"])}}
+                             for video_id in page]}
+        if next_token:
+            payload["nextPageToken"] = next_token
+        self.send_json(200, payload)
+
+    def handle_comment_threads(self, params):
+        data = self.server.data
+        video = data.videos.get(params.get("videoId"))
+        if video is None:
+            return self.send_error_reason(404, "videoNotFound")
+        if video["comments_disabled"]:
+            return self.send_error_reason(403, "commentsDisabled")
+        with data._lock:
+            comments = list(data.comments[params["videoId"]])
+        page, next_token = self.page(comments, params, 20)
+        payload = {"items": [{
+            "id": comment["id"],
+            "snippet": {"topLevelComment": {"snippet": {
+                "textOriginal": comment["text"],
+                "publishedAt": format_time(comment["published_at"]),
+            }}},
+        } for comment in page]}
+        if next_token:
+            payload["nextPageToken"] = next_token
+        self.send_json(200, payload)
+
+def start_mock_server(data, host="127.0.0.1", port=0, latency_ms=50, error_rate=0.0):
+    """Starts the mock on a background thread and returns the server; use server.base_url as the API root."""
+    server = MockYouTubeServer((host, port), data, latency_ms=latency_ms, error_rate=error_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local mock of the YouTube Data API.")
+    parser.add_argument("--port", type=int, default=8765, help="The port to listen on.")
+    parser.add_argument("--channels", nargs="+", default=['WhatYuhKnow', 'MachelMontano', 'BujuBanton', 'Aytian'],
+                        help="The channel names the mock knows.")
+    parser.add_argument("--videos-per-channel", type=int, default=20, help="Videos per channel.")
+    parser.add_argument("--comments-per-video", type=int, default=250, help="Comments per video.")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Delay added to every response.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failed with a 429.")
+    args = parser.parse_args()
+
+    data = MockYouTubeData(args.channels, args.videos_per_channel, args.comments_per_video)
+    server = MockYouTubeServer(("127.0.0.1", args.port), data, latency_ms=args.latency_ms, error_rate=args.error_rate)
+    print(f"Mock YouTube Data API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
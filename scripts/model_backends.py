@@ -0,0 +1,91 @@
+# This module loads the fine-tuned translation model with one of several CPU inference backends:
+#   pytorch - the fp32 model in ./results/final_model
+#   int8    - the same model with dynamically quantized int8 Linear layers
+#   onnx    - the model exported to ONNX and run with ONNX Runtime
+# The int8 and onnx variants are produced by export_model_variants.py.
+# torch and transformers are imported where they are used, so reading the constants
+# here (e.g. for command-line choices) stays cheap.
+import os
+
+DEFAULT_MODEL_PATH = "./results/final_model"
+BACKENDS = ("pytorch", "int8", "onnx")
+DEFAULT_BACKEND = os.getenv("MODEL_BACKEND", "pytorch")
+INT8_WEIGHTS_NAME = "quantized_int8.pt"
+
+def variant_path(model_path=DEFAULT_MODEL_PATH, backend=DEFAULT_BACKEND):
+    """Returns the directory holding a backend's variant of the model."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown model backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+    if backend == "pytorch":
+        return model_path
+    return f"{model_path.rstrip('/')}_{backend}"
+
+def quantize_int8(model):
+    """Replaces a model's Linear layers with dynamically quantized int8 versions."""
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def export_int8(model_path=DEFAULT_MODEL_PATH):
+    """Saves a dynamically quantized copy of the model, with its config and tokenizer."""
+    import torch
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+    output_path = variant_path(model_path, "int8")
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_path)
+    model.eval()
+    quantized = quantize_int8(model)
+
+    os.makedirs(output_path, exist_ok=True)
+    model.config.save_pretrained(output_path)
+    if model.generation_config is not None:
+        model.generation_config.save_pretrained(output_path)
+    tokenizer.save_pretrained(output_path)
+    torch.save(quantized.state_dict(), os.path.join(output_path, INT8_WEIGHTS_NAME))
+    return output_path
+
+def export_onnx(model_path=DEFAULT_MODEL_PATH):
+    """Exports the model to ONNX with its tokenizer, using Hugging Face Optimum."""
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    from transformers import AutoTokenizer
+
+    output_path = variant_path(model_path, "onnx")
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_path, export=True)
+    model.save_pretrained(output_path)
+    AutoTokenizer.from_pretrained(model_path).save_pretrained(output_path)
+    return output_path
+
+def load_translation_model(model_path=DEFAULT_MODEL_PATH, backend=DEFAULT_BACKEND):
+    """
+    Loads the tokenizer and model for a backend. All backends support `model.generate`.
+
+    Args:
+        model_path (str): The fp32 model directory; variants are found next to it.
+        backend (str): One of BACKENDS.
+    """
+    path = variant_path(model_path, backend)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No '{backend}' model at {path}. Run scripts/export_model_variants.py first.")
+    import torch
+    from transformers import AutoConfig, AutoModelForSeq2SeqLM, AutoTokenizer, GenerationConfig
+
+    tokenizer = AutoTokenizer.from_pretrained(path)
+
+    if backend == "pytorch":
+        model = AutoModelForSeq2SeqLM.from_pretrained(path)
+    elif backend == "int8":
+        # Build the quantized module structure, then load the saved int8 weights into it
+        model = quantize_int8(AutoModelForSeq2SeqLM.from_config(AutoConfig.from_pretrained(path)))
+        # The packed int8 weights are not plain tensors, so weights_only loading cannot be used
+        model.load_state_dict(torch.load(os.path.join(path, INT8_WEIGHTS_NAME), weights_only=False))
+        try:
+            model.generation_config = GenerationConfig.from_pretrained(path)
+        except OSError:
+            pass
+    else:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        model = ORTModelForSeq2SeqLM.from_pretrained(path)
+
+    if hasattr(model, "eval"):
+        model.eval()
+    return tokenizer, model
@@ -0,0 +1,82 @@
+# This script compares the int8 and ONNX Runtime variants of the model against fp32
+# on the validation set. Each backend is evaluated in its own process, so peak memory
+# is measured independently, and the report shows the BLEU change, latency, throughput,
+# peak memory and how often each variant produces exactly the fp32 output.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.model_backends import BACKENDS
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def evaluate_backend(backend, validation_file, batch_size, output_file):
+    """Runs evaluate_model.py for one backend in a subprocess and returns its metrics."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        metrics_file = f.name
+    try:
+        command = [
+            sys.executable, os.path.join(SCRIPT_DIR, "evaluate_model.py"),
+            "--backend", backend,
+            "--validation-file", validation_file,
+            "--batch-size", str(batch_size),
+            "--output-file", output_file,
+            "--metrics-file", metrics_file,
+        ]
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        with open(metrics_file, "r") as f:
+            return json.load(f)
+    finally:
+        os.remove(metrics_file)
+
+def load_predictions(output_file):
+    with open(output_file, "r") as f:
+        return {row["sample"]: row["model"] for row in map(json.loads, f)}
+
+def parity_report(validation_file="data/validation.jsonl", backends=BACKENDS, batch_size=16,
+                  output_dir="data/parity"):
+    """Evaluates each backend and prints the comparison against fp32 (the pytorch backend)."""
+    os.makedirs(output_dir, exist_ok=True)
+    backends = ["pytorch"] + [backend for backend in backends if backend != "pytorch"]
+
+    results = {}
+    for backend in backends:
+        print(f"Evaluating the {backend} backend...")
+        output_file = os.path.join(output_dir, f"eval_results_{backend}.jsonl")
+        try:
+            results[backend] = evaluate_backend(backend, validation_file, batch_size, output_file)
+        except subprocess.CalledProcessError:
+            print(f"  Evaluation failed for {backend}; has it been exported?")
+            continue
+        results[backend]["predictions"] = load_predictions(output_file)
+
+    if "pytorch" not in results:
+        print("Error: the fp32 baseline could not be evaluated.")
+        return
+
+    baseline = results["pytorch"]
+    print(f"\n{'backend':<8} {'corpus BLEU':>12} {'change':>8} {'avg BLEU':>9} {'ms/sample':>10} "
+          f"{'samples/s':>10} {'peak MB':>8} {'same as fp32':>13}")
+    for backend, metrics in results.items():
+        same = sum(
+            1 for sample, prediction in metrics["predictions"].items()
+            if baseline["predictions"].get(sample) == prediction
+        )
+        agreement = same / len(baseline["predictions"]) if baseline["predictions"] else 0.0
+        print(f"{backend:<8} {metrics['corpus_bleu']:>12.4f} {metrics['corpus_bleu'] - baseline['corpus_bleu']:>+8.4f} "
+              f"{metrics['average_bleu']:>9.4f} {metrics['latency_per_sample_ms']:>10.1f} "
+              f"{metrics['samples_per_sec']:>10.2f} {metrics['peak_rss_mb']:>8.0f} {agreement:>12.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare quantized and ONNX model variants against fp32.")
+    parser.add_argument("--validation-file", default="data/validation.jsonl", help="The JSONL validation set.")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS),
+                        help="The backends to compare; fp32 is always included as the baseline.")
+    parser.add_argument("--batch-size", type=int, default=16, help="The number of samples translated per generate call.")
+    parser.add_argument("--output-dir", default="data/parity", help="Where per-backend results are written.")
+    args = parser.parse_args()
+
+    parity_report(args.validation_file, args.backends, args.batch_size, args.output_dir)
@@ -1,12 +1,27 @@
 # This script ingests videos from a list of URLs into Twelve Labs for analysis.
 # It downloads each video, uploads it to Twelve Labs, and extracts the transcript.
+#
+# The stages are pipelined: downloads, uploads and in-flight indexing tasks each have
+# their own concurrency limit, so the download of one video overlaps the indexing of
+# others. --sequential processes one video at a time, and --fake runs against local
+# stand-ins for Twelve Labs and yt-dlp (see ingestion_fakes.py).
+#
+# Segments are appended to a JSONL file as each video completes, and a manifest next to
+# it records every URL's state and Twelve Labs task id. A rerun skips transcribed videos
+# and resumes in-flight indexing tasks instead of uploading the videos again.
 import os
 import subprocess
+import hashlib
 import json
 import argparse
-from twelvelabs import TwelveLabs
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+STAGES = ("download", "upload", "index", "transcribe")
+
 def load_video_urls(file_path="data/video_urls.txt"):
     """Loads video URLs from a text file."""
     if not os.path.exists(file_path):
@@ -23,99 +38,404 @@ def get_or_create_index(client, index_name="dialect-translator-videos"):
         if index.name == index_name:
             print(f"Found existing index: {index_name} (ID: {index.id})")
             return index.id
-    
+
     print(f"Index '{index_name}' not found. Creating a new one...")
     index = client.index.create(name=index_name, models=[{"name": "marengo2.7", "options": ["visual", "audio"]}])
     print(f"Successfully created index: {index_name} (ID: {index.id})")
     return index.id
 
-def process_videos(video_urls, index_id):
+def download_video(url, output_path):
+    """Downloads a video locally using yt-dlp. Raises subprocess.CalledProcessError on failure."""
+    download_command = ["yt-dlp", "-o", output_path, url]
+    subprocess.run(download_command, check=True, capture_output=True)
+
+class StageStats:
+    """Records the duration of every pipeline stage, to report per-stage throughput."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.finished = None
+        self._stages = {
+            stage: {"done": 0, "failed": 0, "busy": 0.0, "bytes": 0, "first": None, "last": None}
+            for stage in STAGES
+        }
+
+    def record(self, stage, started, size_bytes=0, failed=False):
+        """Records one run of a stage that began at `started` (a time.perf_counter value)."""
+        finished = time.perf_counter()
+        with self._lock:
+            entry = self._stages[stage]
+            entry["failed" if failed else "done"] += 1
+            entry["busy"] += finished - started
+            entry["bytes"] += size_bytes
+            entry["first"] = started if entry["first"] is None else min(entry["first"], started)
+            entry["last"] = finished if entry["last"] is None else max(entry["last"], finished)
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def summary(self):
+        """
+        Returns, for each stage, the videos completed and failed, the mean time per video, the
+        throughput while the stage was active, and the mean number of videos in the stage at once.
+        """
+        with self._lock:
+            summary = {}
+            for stage, entry in self._stages.items():
+                runs = entry["done"] + entry["failed"]
+                window = entry["last"] - entry["first"] if runs else 0.0
+                summary[stage] = {
+                    "done": entry["done"],
+                    "failed": entry["failed"],
+                    "mean_s": entry["busy"] / runs if runs else 0.0,
+                    "videos_per_min": 60 * entry["done"] / window if window > 0 else 0.0,
+                    "mb_per_s": entry["bytes"] / (1024 * 1024) / window if window > 0 else 0.0,
+                    "mean_concurrency": entry["busy"] / window if window > 0 else 0.0,
+                }
+            summary["wall_time_s"] = (self.finished or time.perf_counter()) - self.started
+            return summary
+
+def print_stage_report(stats):
+    summary = stats.summary()
+    print(f"\n{'stage':<11} {'done':>5} {'failed':>6} {'mean (s)':>9} {'videos/min':>11} {'MB/s':>7} {'concurrency':>12}")
+    for stage in STAGES:
+        entry = summary[stage]
+        print(f"{stage:<11} {entry['done']:>5} {entry['failed']:>6} {entry['mean_s']:>9.2f} "
+              f"{entry['videos_per_min']:>11.1f} {entry['mb_per_s']:>7.1f} {entry['mean_concurrency']:>12.2f}")
+    transcribed = summary["transcribe"]["done"]
+    wall_time = summary["wall_time_s"]
+    print(f"Total: {transcribed} videos in {wall_time:.1f}s "
+          f"({60 * transcribed / wall_time if wall_time > 0 else 0.0:.1f} videos/min)")
+
+class PipelineLimits:
     """
-    Uploads videos to Twelve Labs, waits for indexing,
-    and extracts speech segments.
+    The concurrency limit of each stage.
+
+    Args:
+        download_workers (int): Videos downloaded at once.
+        upload_workers (int): Videos uploaded at once.
+        max_indexing (int): Twelve Labs tasks in flight at once, from the start of the upload
+            until the transcript has been fetched.
     """
-    all_segments = []
 
-    for i, url in enumerate(video_urls):
-        print(f"\n--- Processing video {i+1}/{len(video_urls)}: {url} ---")
-        temp_video_path = None
-        try:
-            # 1. Download video locally using yt-dlp
-            print("  Downloading video locally...")
-            video_filename = f"temp_videos/video_{i+1}.mp4"
-            download_command = ["yt-dlp", "-o", video_filename, url]
-            subprocess.run(download_command, check=True, capture_output=True)
-            temp_video_path = video_filename
-            print(f"  Video downloaded to {temp_video_path}")
-
-            # 2. Upload the local file to Twelve Labs
-            print("  Uploading video file to Twelve Labs...")
-            task = client.task.create(index_id=index_id, file=temp_video_path, language="en")
-            print(f"  Task created with ID: {task.id}")
+    def __init__(self, download_workers=2, upload_workers=2, max_indexing=4):
+        for name, value in (("download_workers", download_workers), ("upload_workers", upload_workers),
+                            ("max_indexing", max_indexing)):
+            if value < 1:
+                raise ValueError(f"{name} must be at least 1")
+        self.download_workers = download_workers
+        self.upload_workers = upload_workers
+        self.max_indexing = max_indexing
+        self.download = threading.BoundedSemaphore(download_workers)
+        self.upload = threading.BoundedSemaphore(upload_workers)
+        self.indexing = threading.BoundedSemaphore(max_indexing)
+
+    @property
+    def max_videos_in_flight(self):
+        return self.download_workers + self.upload_workers + self.max_indexing
+
+class IngestionManifest:
+    """
+    Records the state of every URL and appends finished segments to a JSONL file.
+
+    Each URL moves through "downloaded", "uploaded", "indexed" and "transcribed", or ends up
+    "failed". The manifest also holds the size of the segments file after the last completed
+    video, so anything written after it by an interrupted run can be cut off on resume.
+
+    Args:
+        manifest_file (str): The JSON file the states are saved to after every change.
+        output_file (str): The JSONL file segments are appended to.
+        resume (bool): Whether to continue from an existing manifest instead of starting over.
+    """
+
+    def __init__(self, manifest_file, output_file, resume=True):
+        self.manifest_file = manifest_file
+        self.output_file = output_file
+        self._lock = threading.Lock()
+
+        output_dir = os.path.dirname(output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        manifest = self._load() if resume else None
+        if manifest:
+            self._manifest = manifest
+            # Drop segments written after the last video the manifest knows about
+            with open(output_file, "ab") as f:
+                f.truncate(manifest["output_bytes"])
+        else:
+            self._manifest = {"output_file": os.path.abspath(output_file), "output_bytes": 0, "urls": {}}
+            open(output_file, "w").close()
+            self._save()
+
+    def _load(self):
+        if not os.path.exists(self.manifest_file):
+            return None
+        with open(self.manifest_file, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("output_file") != os.path.abspath(self.output_file):
+            print(f"Ignoring manifest {self.manifest_file}: it was written for {manifest.get('output_file')}")
+            return None
+        if manifest["output_bytes"] and not os.path.exists(self.output_file):
+            print(f"Ignoring manifest {self.manifest_file}: {self.output_file} no longer exists")
+            return None
+        return manifest
+
+    def _save(self):
+        """Atomically replaces the manifest file."""
+        temp_file = f"{self.manifest_file}.tmp"
+        with open(temp_file, "w") as f:
+            json.dump(self._manifest, f, indent=2)
+        os.replace(temp_file, self.manifest_file)
+
+    def entry(self, url):
+        """Returns a copy of a URL's manifest entry (empty for a URL not seen before)."""
+        with self._lock:
+            return dict(self._manifest["urls"].get(url, {}))
+
+    def update(self, url, state, **fields):
+        with self._lock:
+            entry = self._manifest["urls"].setdefault(url, {})
+            entry.update(fields, state=state, updated_at=time.time())
+            if state != "failed":
+                entry.pop("error", None)
+                entry.pop("failed_stage", None)
+            self._save()
+
+    def append_segments(self, url, segments):
+        """Appends a video's segments to the output file, then marks the video transcribed."""
+        with self._lock:
+            with open(self.output_file, "a", encoding="utf-8") as f:
+                for segment in segments:
+                    f.write(json.dumps(segment) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+                output_bytes = f.tell()
+            entry = self._manifest["urls"].setdefault(url, {})
+            entry.update(state="transcribed", segments=len(segments), updated_at=time.time())
+            self._manifest["output_bytes"] = output_bytes
+            self._save()
+
+    def counts(self):
+        """Returns the number of URLs in each state."""
+        with self._lock:
+            counts = {}
+            for entry in self._manifest["urls"].values():
+                counts[entry["state"]] = counts.get(entry["state"], 0) + 1
+            return counts
+
+def temp_video_path_for(url, temp_dir="temp_videos"):
+    """Returns a download path that stays the same for a URL across runs."""
+    return os.path.join(temp_dir, f"video_{hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]}.mp4")
+
+def resume_task(prefix, entry, client):
+    """Returns the Twelve Labs task recorded for a URL, or None if there is none to resume."""
+    if not entry.get("task_id") or entry.get("state") == "transcribed":
+        return None
+    try:
+        task = client.task.retrieve(entry["task_id"])
+    except Exception as e:
+        print(f"{prefix} Could not resume task {entry['task_id']} ({e}); uploading again.")
+        return None
+    print(f"{prefix} Resuming task {task.id} instead of uploading again.")
+    return task
+
+def ingest_video(position, total, url, index_id, client, downloader, limits, stats, manifest, temp_dir="temp_videos"):
+    """
+    Runs one video through download, upload, indexing and transcription, recording each
+    completed stage in the manifest. A video with a task in flight skips straight to indexing.
+
+    Returns:
+        bool: Whether the video was transcribed.
+    """
+    prefix = f"[{position + 1}/{total}]"
+    temp_video_path = temp_video_path_for(url, temp_dir)
+    entry = manifest.entry(url)
+    task = resume_task(prefix, entry, client)
+    stage = "download"
+    started = time.perf_counter()
+    try:
+        if task is None:
+            # 1. Download video locally using yt-dlp, unless a previous run already did
+            if entry.get("state") == "downloaded" and os.path.exists(temp_video_path):
+                print(f"{prefix} Reusing the earlier download of {url}")
+            else:
+                with limits.download:
+                    print(f"{prefix} Downloading {url}...")
+                    started = time.perf_counter()
+                    downloader(url, temp_video_path)
+                    stats.record(stage, started, os.path.getsize(temp_video_path))
+                manifest.update(url, "downloaded", task_id=None)
+            size_bytes = os.path.getsize(temp_video_path)
+
+        # The indexing slot is held from the upload until the transcript has been fetched
+        with limits.indexing:
+            if task is None:
+                # 2. Upload the local file to Twelve Labs
+                stage = "upload"
+                with limits.upload:
+                    print(f"{prefix} Uploading video file to Twelve Labs...")
+                    started = time.perf_counter()
+                    task = client.task.create(index_id=index_id, file=temp_video_path, language="en")
+                    stats.record(stage, started, size_bytes)
+                manifest.update(url, "uploaded", task_id=task.id, index_id=index_id)
+                print(f"{prefix} Task created with ID: {task.id}")
+                # The local copy is not needed once it has been uploaded
+                os.remove(temp_video_path)
 
             # 3. Wait for indexing
-            print("  Waiting for video to be indexed...")
+            stage = "index"
+            started = time.perf_counter()
             task.wait()
-            print(f"  Video indexed successfully.")
+            stats.record(stage, started)
+            manifest.update(url, "indexed")
 
-            # 4. Get transcript
+            # 4. Get transcript and append its segments to the output
+            stage = "transcribe"
+            started = time.perf_counter()
             transcript = client.task.transcription(task.id)
+            segments = [{
+                "timestamp": segment.start,
+                "dialect": "unknown",
+                "original_url": url,
+                "text": segment.text,
+            } for segment in transcript]
+            manifest.append_segments(url, segments)
+            stats.record(stage, started)
 
-            # 5. Store segments
-            for segment in transcript:
-                all_segments.append({
-                    "timestamp": segment.start,
-                    "dialect": "unknown",
-                    "original_url": url,
-                    "text": segment.text,
-                })
-            print(f"  Successfully processed and transcribed video.")
-
-        except subprocess.CalledProcessError as e:
-            print(f"  Failed to download video from URL: {url}")
-            print(f"  Yt-dlp Error: {e.stderr.decode()}")
-        except Exception as e:
-            print(f"  An unexpected error occurred while processing {url}")
-            print(f"  Error: {e}")
-        finally:
-            # 6. Clean up the temporary file
-            if temp_video_path and os.path.exists(temp_video_path):
-                os.remove(temp_video_path)
-                print(f"  Cleaned up temporary file: {temp_video_path}")
+        print(f"{prefix} Successfully processed and transcribed video ({len(segments)} segments).")
+        return True
 
-    # Save to JSON file
-    with open("data/segments.json", "w") as f:
-        json.dump(all_segments, f, indent=2)
+    except subprocess.CalledProcessError as e:
+        stats.record(stage, started, failed=True)
+        manifest.update(url, "failed", failed_stage=stage, error=f"yt-dlp exited with status {e.returncode}")
+        print(f"{prefix} Failed to download video from URL: {url}")
+        print(f"{prefix} Yt-dlp Error: {e.stderr.decode() if e.stderr else e}")
+    except Exception as e:
+        stats.record(stage, started, failed=True)
+        # An indexed task can be asked for its transcript again; otherwise a retry uploads again
+        task_id = task.id if task is not None and stage == "transcribe" else None
+        manifest.update(url, "failed", failed_stage=stage, error=str(e), task_id=task_id)
+        print(f"{prefix} An unexpected error occurred while processing {url} ({stage} stage)")
+        print(f"{prefix} Error: {e}")
+    finally:
+        # 5. Clean up the temporary file
+        if os.path.exists(temp_video_path):
+            os.remove(temp_video_path)
+            print(f"{prefix} Cleaned up temporary file: {temp_video_path}")
+    return False
 
-    print("\nVideo processing complete. Segments saved to data/segments.json")
+def process_videos(video_urls, index_id, client, downloader=download_video, limits=None,
+                   output_file="data/segments.jsonl", resume=True, retry_failed=False):
+    """
+    Uploads videos to Twelve Labs, waits for indexing,
+    and extracts speech segments.
+
+    Args:
+        video_urls (list): The video URLs to ingest.
+        index_id (str): The Twelve Labs index the videos are added to.
+        client: A TwelveLabs client, or a stand-in with the same interface.
+        downloader (callable): Downloads a URL to a local path; defaults to yt-dlp.
+        limits (PipelineLimits, optional): Per-stage concurrency limits. Without limits,
+            videos are processed one at a time.
+        output_file (str): The JSONL file segments are appended to as each video completes.
+            Its manifest is saved next to it as `<output_file>.manifest.json`.
+        resume (bool): Whether to continue from the manifest of an earlier run.
+        retry_failed (bool): Whether to try URLs that failed in an earlier run again.
+
+    Returns:
+        StageStats: The per-stage timings.
+    """
+    manifest = IngestionManifest(f"{output_file}.manifest.json", output_file, resume)
+    counts = manifest.counts()
+    if counts:
+        print(f"Manifest of the previous run: {', '.join(f'{count} {state}' for state, count in sorted(counts.items()))}")
+
+    pending = []
+    for url in dict.fromkeys(video_urls):
+        state = manifest.entry(url).get("state")
+        if state == "transcribed" or (state == "failed" and not retry_failed):
+            continue
+        pending.append(url)
+    skipped = len(dict.fromkeys(video_urls)) - len(pending)
+    if skipped:
+        print(f"Skipping {skipped} URLs finished by an earlier run"
+              f"{'' if retry_failed else ' (pass --retry-failed to retry failures)'}.")
+
+    stats = StageStats()
+    total = len(pending)
+    if limits is None:
+        limits = PipelineLimits(1, 1, 1)
+        for i, url in enumerate(pending):
+            ingest_video(i, total, url, index_id, client, downloader, limits, stats, manifest)
+    else:
+        # Enough threads for every stage to be full at once; the semaphores enforce each limit
+        with ThreadPoolExecutor(max_workers=limits.max_videos_in_flight) as pool:
+            futures = [pool.submit(ingest_video, i, total, url, index_id, client, downloader, limits, stats, manifest)
+                       for i, url in enumerate(pending)]
+            for future in futures:
+                future.result()
+    stats.finish()
+
+    counts = manifest.counts()
+    print(f"\nVideo processing complete. Segments saved to {output_file}")
+    print(f"URL states: {', '.join(f'{count} {state}' for state, count in sorted(counts.items()))}")
+    print_stage_report(stats)
+    return stats
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Ingest videos into Twelve Labs.")
     parser.add_argument("--api-key", help="Your Twelve Labs API key. Overrides the .env file.")
+    parser.add_argument("--urls-file", default="data/video_urls.txt", help="The text file of video URLs.")
+    parser.add_argument("--output-file", help="The JSONL file segments are appended to (default data/segments.jsonl).")
+    parser.add_argument("--download-workers", type=int, default=2, help="Videos downloaded at once.")
+    parser.add_argument("--upload-workers", type=int, default=2, help="Videos uploaded at once.")
+    parser.add_argument("--max-indexing", type=int, default=4, help="Twelve Labs indexing tasks in flight at once.")
+    parser.add_argument("--sequential", action="store_true", help="Process one video at a time.")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore the manifest of an earlier run and start over.")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry URLs that failed in an earlier run.")
+    parser.add_argument("--fake", action="store_true",
+                        help="Use local stand-ins for Twelve Labs and yt-dlp instead of the network.")
     args = parser.parse_args()
 
-    # Determine API Key
-    api_key = args.api_key
-    if not api_key:
-        load_dotenv()
-        api_key = os.getenv("TWELVE_LABS_API_KEY")
-    
-    if api_key:
-        api_key = api_key.strip()
+    limits = None if args.sequential else PipelineLimits(args.download_workers, args.upload_workers, args.max_indexing)
+
+    if args.fake:
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from scripts.ingestion_fakes import FakeTwelveLabsClient, make_fake_downloader
+        client = FakeTwelveLabsClient()
+        downloader = make_fake_downloader()
+        video_urls = load_video_urls(args.urls_file) or [f"https://example.com/fake-video-{n}" for n in range(1, 13)]
+        # Never mix fake segments into the real ones
+        output_file = args.output_file or "data/segments_fake.jsonl"
+    else:
+        # Determine API Key
+        api_key = args.api_key
+        if not api_key:
+            load_dotenv()
+            api_key = os.getenv("TWELVE_LABS_API_KEY")
+
+        if api_key:
+            api_key = api_key.strip()
 
-    if not api_key:
-        raise ValueError("API key not found. Provide it via --api-key or in a .env file as TWELVE_LABS_API_KEY.")
+        if not api_key:
+            raise ValueError("API key not found. Provide it via --api-key or in a .env file as TWELVE_LABS_API_KEY.")
 
-    client = TwelveLabs(api_key=api_key)
+        from twelvelabs import TwelveLabs
+        client = TwelveLabs(api_key=api_key)
+        downloader = download_video
+        video_urls = load_video_urls(args.urls_file)
+        output_file = args.output_file or "data/segments.jsonl"
 
-    video_urls = load_video_urls()
     if video_urls:
         print(f"Found {len(video_urls)} URLs to process.")
         try:
             index_id = get_or_create_index(client)
-            process_videos(video_urls, index_id)
+            process_videos(video_urls, index_id, client, downloader, limits, output_file,
+                           resume=not args.no_resume, retry_failed=args.retry_failed)
         except Exception as e:
             print(f"\nAn error occurred: {e}")
             print("Please double-check your API key and ensure it is valid.")
     else:
-        print("No video URLs to process. Exiting.")
\ No newline at end of file
+        print("No video URLs to process. Exiting.")
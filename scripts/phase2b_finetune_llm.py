@@ -1,10 +1,32 @@
 # This script fine-tunes a T5 model for translation using the Hugging Face Transformers library.
 # It loads a pre-trained model, tokenizes the training and validation data,
 # and then runs the training process, saving the final model.
+#
+# Batches are padded only to their longest sequence, the training sampler groups
+# examples of similar length, and padded label positions are masked out of the loss.
+# The tokenized dataset is cached on disk under cache/tokenized, keyed by the tokenizer
+# and the content hash of the data files, so unchanged data is not tokenized again.
+#
+#     python scripts/phase2b_finetune_llm.py
+#     python scripts/phase2b_finetune_llm.py --compare-padding --max-steps 50
+#
+# The CPU throughput settings (bf16 autocast, gradient accumulation, dataloader workers
+# and prefetching, torch.compile and the thread count) are options; compare them with
+# scripts/benchmark_training.py before changing the defaults.
+#
+# Launched with torchrun, the script trains data-parallel over the gloo backend: every
+# rank trains on its own shard of each epoch, gradients are averaged across ranks, and
+# only rank 0 writes checkpoints and results/final_model.
+#
+#     torchrun --standalone --nproc_per_node 2 scripts/phase2b_finetune_llm.py
+import argparse
+import hashlib
 import os
 import json
+import shutil
+import tempfile
 import torch
-from datasets import load_dataset
+from datasets import load_dataset, load_from_disk
 from transformers import (
     AutoModelForSeq2SeqLM,
     AutoTokenizer,
@@ -13,64 +35,185 @@ from transformers import (
     DataCollatorForSeq2Seq,
 )
 
-def fine_tune_custom_llm():
+MODEL_NAME = "t5-base"  # A more powerful model for seq-to-seq tasks
+MAX_LENGTH = 128
+TOKENIZED_CACHE_DIR = "cache/tokenized"
+# Bump when the tokenization below changes, so older caches are not reused
+TOKENIZATION_VERSION = 1
+PADDING_MODES = ("dynamic", "max_length")
+
+def distributed_world():
+    """Returns (world size, processes on this node) as set by torchrun, or (1, 1) for a plain run."""
+    return int(os.environ.get("WORLD_SIZE", 1)), int(os.environ.get("LOCAL_WORLD_SIZE", 1))
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def tokenizer_fingerprint(tokenizer):
+    """Hashes the tokenizer's full definition where available (fast tokenizers), else its name and vocabulary size."""
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    definition = backend.to_str() if backend is not None else f"{tokenizer.name_or_path}:{len(tokenizer)}"
+    return hashlib.sha256(definition.encode("utf-8")).hexdigest()
+
+def tokenized_cache_path(tokenizer, data_files, max_length, padding, cache_dir=TOKENIZED_CACHE_DIR):
+    key = json.dumps({
+        "version": TOKENIZATION_VERSION,
+        "tokenizer": tokenizer_fingerprint(tokenizer),
+        "files": {split: file_sha256(path) for split, path in sorted(data_files.items())},
+        "max_length": max_length,
+        "padding": padding,
+    }, sort_keys=True)
+    return os.path.join(cache_dir, hashlib.sha256(key.encode("utf-8")).hexdigest()[:16])
+
+def load_tokenized_datasets(tokenizer, data_files, max_length=MAX_LENGTH, padding="dynamic",
+                            cache_dir=TOKENIZED_CACHE_DIR):
+    """
+    Returns the tokenized train and validation sets, from the on-disk cache when the tokenizer
+    and the data files are unchanged.
+
+    Args:
+        tokenizer: The model's tokenizer.
+        data_files (dict): Split name to JSONL file, e.g. {"train": "data/train.jsonl"}.
+        max_length (int): Inputs and labels are truncated to this many tokens.
+        padding (str): "dynamic" leaves sequences unpadded for the collator to pad per batch;
+            "max_length" pads everything to max_length, as earlier versions did.
+        cache_dir (str): Where tokenized datasets are kept.
+    """
+    cache_path = tokenized_cache_path(tokenizer, data_files, max_length, padding, cache_dir)
+    if os.path.isdir(cache_path):
+        print(f"Loading tokenized dataset from {cache_path}...")
+        return load_from_disk(cache_path)
+
+    # Load datasets from JSONL files
+    raw_datasets = load_dataset('json', data_files=data_files)
+    pad_to = "max_length" if padding == "max_length" else False
+
+    def tokenize_function(examples):
+        # T5 uses a prefix for different tasks. We'll use the one from the prompt.
+        model_inputs = tokenizer(examples["input_text"], max_length=max_length, truncation=True, padding=pad_to)
+        labels = tokenizer(text_target=examples["output_text"], max_length=max_length, truncation=True,
+                           padding=pad_to)
+        label_ids = labels["input_ids"]
+        if pad_to:
+            # Padding tokens are not targets; -100 keeps them out of the loss
+            label_ids = [[token if token != tokenizer.pad_token_id else -100 for token in ids] for ids in label_ids]
+        model_inputs["labels"] = label_ids
+        # Read by the length-grouped sampler instead of measuring every example again
+        model_inputs["length"] = [len(input_ids) for input_ids in model_inputs["input_ids"]]
+        return model_inputs
+
+    tokenized_datasets = raw_datasets.map(
+        tokenize_function,
+        batched=True,
+        remove_columns=raw_datasets["train"].column_names,
+    )
+
+    # Saved under a temporary name and renamed, so an interrupted run never leaves a partial cache
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_path = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-")
+    tokenized_datasets.save_to_disk(temp_path)
+    try:
+        os.rename(temp_path, cache_path)
+    except OSError:
+        # Another run finished the same cache first
+        shutil.rmtree(temp_path, ignore_errors=True)
+    print(f"Tokenized dataset cached at {cache_path}")
+    return tokenized_datasets
+
+def fine_tune_custom_llm(train_file="data/train.jsonl", val_file="data/validation.jsonl", output_dir="./results",
+                         model_name=MODEL_NAME, padding="dynamic", max_steps=-1, save_model=True, batch_size=4,
+                         gradient_accumulation_steps=1, bf16=False, dataloader_workers=0, prefetch_factor=None,
+                         torch_compile=False, num_threads=None, ddp_backend="gloo"):
     """
     Fine-tunes a custom Language Model from Hugging Face.
+
+    Args:
+        train_file (str): The JSONL training set.
+        val_file (str): The JSONL validation set.
+        output_dir (str): Where checkpoints and the final model are written.
+        model_name (str): The pre-trained model to start from.
+        padding (str): "dynamic" pads each batch to its longest sequence and groups batches by length;
+            "max_length" pads everything to 128 tokens, as earlier versions did.
+        max_steps (int): Stop after this many optimizer steps (-1 trains the full epochs).
+        save_model (bool): Whether to evaluate, checkpoint and save the final model; throughput
+            measurements turn this off.
+        batch_size (int): Examples per device per forward pass.
+        gradient_accumulation_steps (int): Forward passes per optimizer step, so the effective batch
+            is batch_size * gradient_accumulation_steps.
+        bf16 (bool): Run the forward pass under bfloat16 autocast. It is fastest on CPUs with native
+            bf16 support (AVX512-BF16 or AMX) and can be slower elsewhere.
+        dataloader_workers (int): Processes collating batches in the background (0 collates in the training loop).
+        prefetch_factor (int, optional): Batches each dataloader worker prepares ahead.
+        torch_compile (bool): Compile the model with torch.compile. The first steps are slower while it compiles.
+        num_threads (int, optional): The intra-op threads PyTorch uses (default: one per core, split
+            between the ranks on a node when launched with torchrun).
+        ddp_backend (str): The torch.distributed backend used under torchrun.
+
+    Returns:
+        dict: The training metrics reported by the Trainer, e.g. train_samples_per_second.
     """
     # --- 1. Configuration ---
-    model_name = "t5-base"  # A more powerful model for seq-to-seq tasks
-    train_file = "data/train.jsonl"
-    val_file = "data/validation.jsonl"
-    output_dir = "./results"
-    
+    world_size, local_world_size = distributed_world()
+    if not num_threads and local_world_size > 1:
+        # torchrun caps each rank at one OpenMP thread; share the node's cores out instead
+        num_threads = max(1, (os.cpu_count() or 1) // local_world_size)
+    if num_threads:
+        torch.set_num_threads(num_threads)
+
     # Training arguments
     training_args = TrainingArguments(
         output_dir=output_dir,
         num_train_epochs=3,
-        per_device_train_batch_size=4,
-        per_device_eval_batch_size=4,
+        max_steps=max_steps,
+        per_device_train_batch_size=batch_size,
+        per_device_eval_batch_size=batch_size,
+        gradient_accumulation_steps=gradient_accumulation_steps,
+        bf16=bf16,
+        torch_compile=torch_compile,
+        dataloader_num_workers=dataloader_workers,
+        dataloader_prefetch_factor=prefetch_factor if dataloader_workers else None,
+        # Keep workers alive between epochs instead of forking new ones
+        dataloader_persistent_workers=dataloader_workers > 0,
+        # Pinned memory only speeds up copies to a GPU
+        dataloader_pin_memory=torch.cuda.is_available(),
         warmup_steps=500,
         weight_decay=0.01,
         logging_dir='./logs',
         logging_steps=10,
-        eval_strategy="epoch",
-        save_strategy="epoch",
-        load_best_model_at_end=True,
+        eval_strategy="epoch" if save_model else "no",
+        save_strategy="epoch" if save_model else "no",
+        load_best_model_at_end=save_model,
+        # Batches of similar-length examples waste little on padding
+        group_by_length=padding == "dynamic",
+        length_column_name="length",
+        ddp_backend=ddp_backend if world_size > 1 else None,
+        # T5 uses every parameter in every step, so DDP need not search for unused ones
+        ddp_find_unused_parameters=False,
     )
 
     # --- 2. Load and Prepare Data ---
     print("Loading and preparing dataset...")
-    
-    # Load tokenizer and model
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
 
-    # Load datasets from JSONL files
-    data_files = {"train": train_file, "validation": val_file}
-    raw_datasets = load_dataset('json', data_files=data_files)
+    # The first rank on each node downloads the model and fills the tokenization cache while
+    # the others wait, then they load both from disk
+    with training_args.main_process_first(local=True, desc="loading the model and tokenized dataset"):
+        # Load tokenizer and model
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
 
-    def tokenize_function(examples):
-        # T5 uses a prefix for different tasks. We'll use the one from the prompt.
-        inputs = examples["input_text"]
-        targets = examples["output_text"]
-        
-        # Tokenize inputs and targets
-        model_inputs = tokenizer(inputs, max_length=128, truncation=True, padding="max_length")
-        labels = tokenizer(targets, max_length=128, truncation=True, padding="max_length")
-        
-        model_inputs["labels"] = labels["input_ids"]
-        return model_inputs
+        tokenized_datasets = load_tokenized_datasets(tokenizer, {"train": train_file, "validation": val_file},
+                                                     padding=padding)
 
-    tokenized_datasets = raw_datasets.map(
-        tokenize_function,
-        batched=True,
-        remove_columns=raw_datasets["train"].column_names,
-    )
-
-    # Data collator for sequence-to-sequence models
+    # Data collator for sequence-to-sequence models. It pads each batch to its longest
+    # sequence and pads labels with -100, which the loss ignores.
     data_collator = DataCollatorForSeq2Seq(
         tokenizer=tokenizer,
-        model=model
+        model=model,
+        label_pad_token_id=-100,
     )
 
     # --- 3. Initialize Trainer ---
@@ -85,14 +228,83 @@ def fine_tune_custom_llm():
 
     # --- 4. Start Fine-Tuning ---
     print("Starting fine-tuning...")
-    trainer.train()
+    train_result = trainer.train()
+
+    if not save_model:
+        return train_result.metrics
 
     # --- 5. Save the Model ---
-    print("Fine-tuning complete. Saving model...")
-    model.save_pretrained(f"{output_dir}/final_model")
-    tokenizer.save_pretrained(f"{output_dir}/final_model")
-    
-    print(f"Model saved to {output_dir}/final_model")
+    if trainer.is_world_process_zero():
+        print("Fine-tuning complete. Saving model...")
+    # The ranks hold identical weights; save_model writes them from rank 0 only
+    trainer.save_model(f"{output_dir}/final_model")
+    if trainer.is_world_process_zero():
+        tokenizer.save_pretrained(f"{output_dir}/final_model")
+        print(f"Model saved to {output_dir}/final_model")
+    return train_result.metrics
+
+def compare_padding(train_file="data/train.jsonl", val_file="data/validation.jsonl", max_steps=50,
+                    model_name=MODEL_NAME, **settings):
+    """Trains max_steps steps with each padding mode and prints the throughput of each.
+    Other keyword arguments are passed on to fine_tune_custom_llm."""
+    results = {}
+    for padding in ("max_length", "dynamic"):
+        print(f"\n--- {max_steps} steps with {padding} padding ---")
+        with tempfile.TemporaryDirectory() as output_dir:
+            results[padding] = fine_tune_custom_llm(train_file, val_file, output_dir, model_name, padding=padding,
+                                                    max_steps=max_steps, save_model=False, **settings)
+
+    if int(os.environ.get("RANK", 0)) != 0:
+        return results
+    baseline = results["max_length"]["train_samples_per_second"]
+    print(f"\n{'padding':<12} {'samples/s':>10} {'time (s)':>9} {'speedup':>8}")
+    for padding, metrics in results.items():
+        rate = metrics["train_samples_per_second"]
+        print(f"{padding:<12} {rate:>10.2f} {metrics['train_runtime']:>9.1f} {rate / baseline:>7.2f}x")
+    return results
 
 if __name__ == "__main__":
-    fine_tune_custom_llm()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fine-tune the T5 translation model.")
+    parser.add_argument("--train-file", default="data/train.jsonl", help="The JSONL training set.")
+    parser.add_argument("--val-file", default="data/validation.jsonl", help="The JSONL validation set.")
+    parser.add_argument("--output-dir", default="./results", help="Where checkpoints and the final model go.")
+    parser.add_argument("--model-name", default=MODEL_NAME, help="The pre-trained model to start from.")
+    parser.add_argument("--padding", default="dynamic", choices=PADDING_MODES,
+                        help="Pad per batch (dynamic) or to 128 tokens (max_length, the old behaviour).")
+    parser.add_argument("--max-steps", type=int, default=-1, help="Stop after this many steps (-1 for full epochs).")
+    parser.add_argument("--compare-padding", action="store_true",
+                        help="Measure training throughput with each padding mode instead of training a model.")
+    parser.add_argument("--no-save", action="store_true",
+                        help="Skip evaluation, checkpoints and the final model (for throughput measurements).")
+    parser.add_argument("--metrics-file", help="Write the training metrics to this JSON file.")
+    parser.add_argument("--batch-size", type=int, default=4, help="Examples per forward pass.")
+    parser.add_argument("--gradient-accumulation-steps", type=int, default=1, help="Forward passes per optimizer step.")
+    parser.add_argument("--bf16", action="store_true", help="Train under bfloat16 autocast.")
+    parser.add_argument("--dataloader-workers", type=int, default=0, help="Background processes preparing batches.")
+    parser.add_argument("--prefetch-factor", type=int, help="Batches each dataloader worker prepares ahead.")
+    parser.add_argument("--torch-compile", action="store_true", help="Compile the model with torch.compile.")
+    parser.add_argument("--num-threads", type=int,
+                        help="PyTorch intra-op threads (default: one per core, split between the ranks on a node).")
+    parser.add_argument("--ddp-backend", default="gloo", help="The torch.distributed backend used under torchrun.")
+    args = parser.parse_args()
+
+    settings = dict(
+        batch_size=args.batch_size,
+        gradient_accumulation_steps=args.gradient_accumulation_steps,
+        bf16=args.bf16,
+        dataloader_workers=args.dataloader_workers,
+        prefetch_factor=args.prefetch_factor,
+        torch_compile=args.torch_compile,
+        num_threads=args.num_threads,
+        ddp_backend=args.ddp_backend,
+    )
+    if args.compare_padding:
+        compare_padding(args.train_file, args.val_file, args.max_steps if args.max_steps > 0 else 50, args.model_name,
+                        **settings)
+    else:
+        metrics = fine_tune_custom_llm(args.train_file, args.val_file, args.output_dir, args.model_name,
+                                       padding=args.padding, max_steps=args.max_steps, save_model=not args.no_save,
+                                       **settings)
+        if args.metrics_file and int(os.environ.get("RANK", 0)) == 0:
+            with open(args.metrics_file, "w") as f:
+                json.dump(metrics, f, indent=2)
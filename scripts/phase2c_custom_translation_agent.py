@@ -1,47 +1,68 @@
 # This script provides a command-line interface to translate a single
 # Caribbean dialect phrase to standard English using the fine-tuned model.
-import torch
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+# If a translation worker is running (see translation_worker.py), the phrase is sent
+# to it, so repeated invocations do not load the model from disk every time.
 import argparse
+import os
+import sys
 
-def translate_with_custom_model(input_text):
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.model_backends import BACKENDS, DEFAULT_BACKEND
+from scripts.decoding_policy import DEFAULT_POLICY, POLICIES
+from scripts.inference import get_model, translate_texts
+from scripts.segmentation import MAX_INPUT_TOKENS
+from scripts.worker_client import DEFAULT_SOCKET_PATH, WorkerClient, WorkerError, worker_available
+
+def translate_with_custom_model(input_text, backend=DEFAULT_BACKEND, policy=DEFAULT_POLICY, latency_budget_ms=None):
     """
     Translates a given dialect phrase to standard English using the fine-tuned model.
+    Beam width and output length come from the named decoding policy.
+    The model is loaded on the first call and reused by later calls in the same process.
     """
     model_path = "./results/final_model"
-    
+
     try:
-        # Load the fine-tuned model and tokenizer
-        tokenizer = AutoTokenizer.from_pretrained(model_path)
-        model = AutoModelForSeq2SeqLM.from_pretrained(model_path)
-        
-        # Prepare the input text with the same prompt used during training
-        prompt = f"Translate the following Caribbean dialect phrase to standard English: \"{input_text}\""
-        inputs = tokenizer(prompt, return_tensors="pt", padding=True, truncation=True, max_length=128)
-
-        # Generate the translation
-        output_sequences = model.generate(
-            input_ids=inputs['input_ids'],
-            attention_mask=inputs['attention_mask'],
-            max_length=50,
-            num_beams=5,  # Beam search for better quality
-            early_stopping=True
-        )
-        
-        # Decode the output
-        translation = tokenizer.decode(output_sequences[0], skip_special_tokens=True)
-
-        return translation.strip()
+        tokenizer, model = get_model(model_path, backend)
+        return translate_texts([input_text], tokenizer, model, policy=policy, latency_budget_ms=latency_budget_ms,
+                               max_length=MAX_INPUT_TOKENS)[0]
 
     except Exception as e:
         return f"An error occurred: {e}"
 
+def translate_phrase(input_text, backend=DEFAULT_BACKEND, policy=DEFAULT_POLICY, latency_budget_ms=None,
+                     socket_path=DEFAULT_SOCKET_PATH):
+    """
+    Translates a phrase with the running translation worker, or with a model loaded here if there is none.
+
+    Args:
+        input_text (str): The dialect phrase to translate.
+        backend (str): The backend used when no worker is running; a worker uses its own backend.
+        policy (str): The decoding policy to use.
+        latency_budget_ms (float, optional): Drop beams until decoding is expected to fit this budget.
+        socket_path (str, optional): The worker's socket, or None to always load the model here.
+    """
+    if socket_path and worker_available(socket_path):
+        try:
+            with WorkerClient(socket_path) as client:
+                return client.translate(input_text, policy, latency_budget_ms)
+        except WorkerError as e:
+            return f"An error occurred: {e}"
+        except OSError as e:
+            # A stale socket from a worker that is no longer running
+            print(f"Translation worker unavailable ({e}); loading the model instead.", file=sys.stderr)
+    return translate_with_custom_model(input_text, backend, policy, latency_budget_ms)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Translate dialect to standard English using a custom fine-tuned model.")
     parser.add_argument("dialect_phrase", type=str, help="The Caribbean dialect phrase to translate.")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS, help="The inference backend to use.")
+    parser.add_argument("--policy", default=DEFAULT_POLICY, choices=list(POLICIES), help="The decoding policy to use.")
+    parser.add_argument("--latency-budget-ms", type=float, help="Drop beams until decoding is expected to fit this budget.")
+    parser.add_argument("--worker-socket", default=DEFAULT_SOCKET_PATH, help="The translation worker's socket.")
+    parser.add_argument("--no-worker", action="store_true", help="Load the model here even if a worker is running.")
     args = parser.parse_args()
-    
-    translation = translate_with_custom_model(args.dialect_phrase)
+
+    translation = translate_phrase(args.dialect_phrase, args.backend, args.policy, args.latency_budget_ms,
+                                   socket_path=None if args.no_worker else args.worker_socket)
     print(f"\nDialect Phrase: {args.dialect_phrase}")
     print(f"Standard English Translation: {translation}")
-    
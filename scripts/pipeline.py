@@ -0,0 +1,337 @@
+# This script runs the data and model workflow as a pipeline of stages, from fetching
+# comments to evaluating the fine-tuned model. Each stage declares the files it reads
+# and writes and the parameters it is run with, and is fingerprinted by the content
+# hash of its inputs, its code and its command line. A stage is skipped when its
+# fingerprint and outputs match the last successful run, so a small data change only
+# reruns the stages downstream of it. Stages whose inputs are ready run in parallel as
+# subprocesses, and each stage's wall time is recorded in data/pipeline_state.json.
+#
+#     python scripts/pipeline.py                  # everything that is out of date
+#     python scripts/pipeline.py split            # a stage and whatever it depends on
+#     python scripts/pipeline.py --dry-run
+#     python scripts/pipeline.py --force comments --set merge.threshold=0.9
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_STATE_FILE = "data/pipeline_state.json"
+DEFAULT_LOG_DIR = "logs/pipeline"
+
+INFERENCE_CODE = ["scripts/inference.py", "scripts/decoding_policy.py", "scripts/model_backends.py",
+                  "scripts/segmentation.py"]
+
+class Stage:
+    """
+    One step of the pipeline: a script run with parameters, reading inputs and writing outputs.
+
+    Args:
+        name (str): The stage name used on the command line.
+        script (str): The script to run, relative to the repository root.
+        inputs (list): Files or directories the stage reads. A stage depends on the stages that write them.
+        outputs (list): Files or directories the stage writes.
+        params (dict): Command-line options passed to the script, e.g. {"batch_size": 16}.
+            True adds a bare flag and False or None leaves the option out.
+        code (list): Other source files whose changes should rerun the stage.
+    """
+
+    def __init__(self, name, script, inputs=(), outputs=(), params=None, code=()):
+        self.name = name
+        self.script = script
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = dict(params or {})
+        self.code = [script] + list(code)
+
+    def command(self):
+        command = [sys.executable, self.script]
+        for key, value in self.params.items():
+            flag = "--" + key.replace("_", "-")
+            if value is True:
+                command.append(flag)
+            elif value not in (False, None):
+                command.extend([flag, str(value)])
+        return command
+
+# The stages in workflow order. The translation model used by `translate` is deliberately
+# not an input: it is the output of `finetune`, and tracking it would retrain forever.
+# `video_urls` and `comments` read from YouTube, so they only rerun when forced.
+STAGES = [
+    Stage("video_urls", "scripts/get_channel_videos.py", outputs=["data/video_urls.txt"]),
+    Stage("ingest", "scripts/phase1_data_ingestion.py", inputs=["data/video_urls.txt"],
+          outputs=["data/segments.jsonl"], params={"urls_file": "data/video_urls.txt"}),
+    Stage("comments", "scripts/get_youtube_comments.py", outputs=["youtube_comments.csv"],
+          params={"output_file": "youtube_comments.csv"}, code=["scripts/crawl_state.py"]),
+    Stage("translate", "scripts/translate_new_data.py", inputs=["youtube_comments.csv"],
+          outputs=["translated_youtube_comments.csv"],
+          params={"input_file": "youtube_comments.csv", "output_file": "translated_youtube_comments.csv",
+                  "batch_size": 16},
+          code=INFERENCE_CODE),
+    Stage("merge", "scripts/merge_datasets.py", inputs=["dataset.csv", "translated_youtube_comments.csv"],
+          outputs=["augmented_dataset.csv"], params={"output": "augmented_dataset.csv", "threshold": 0.8}),
+    Stage("prepare", "scripts/phase1b_prepare_training_data.py", inputs=["augmented_dataset.csv"],
+          outputs=["data/training_data.jsonl"]),
+    Stage("split", "scripts/split_dataset.py", inputs=["data/training_data.jsonl"],
+          outputs=["data/train.jsonl", "data/validation.jsonl"],
+          params={"input_file": "data/training_data.jsonl", "test_size": 0.2}, code=["scripts/merge_datasets.py"]),
+    Stage("finetune", "scripts/phase2b_finetune_llm.py", inputs=["data/train.jsonl", "data/validation.jsonl"],
+          outputs=["results/final_model"]),
+    Stage("evaluate", "scripts/evaluate_model.py", inputs=["data/validation.jsonl", "results/final_model"],
+          outputs=["data/eval_results.jsonl", "data/eval_metrics.json"],
+          params={"validation_file": "data/validation.jsonl", "output_file": "data/eval_results.jsonl",
+                  "metrics_file": "data/eval_metrics.json"},
+          code=INFERENCE_CODE),
+]
+
+class PipelineState:
+    """
+    The JSON file remembering each stage's last successful run (fingerprint, output hashes and
+    wall time) and the content hashes of files, keyed by size and modification time so unchanged
+    files are not read again.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {"stages": {}, "files": {}}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self._data.update(json.load(f))
+
+    def stage(self, name):
+        with self._lock:
+            return dict(self._data["stages"].get(name, {}))
+
+    def record_stage(self, name, **fields):
+        with self._lock:
+            self._data["stages"][name] = fields
+            self._save()
+
+    def file_hash(self, path):
+        """Returns the sha256 of a file, reusing the cached value while its size and mtime are unchanged."""
+        status = os.stat(path)
+        key = os.path.abspath(path)
+        with self._lock:
+            cached = self._data["files"].get(key)
+        if cached and cached["size"] == status.st_size and cached["mtime_ns"] == status.st_mtime_ns:
+            return cached["sha256"]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        with self._lock:
+            self._data["files"][key] = {"size": status.st_size, "mtime_ns": status.st_mtime_ns,
+                                        "sha256": digest.hexdigest()}
+        return digest.hexdigest()
+
+    def path_hash(self, path):
+        """Returns the content hash of a file or a directory tree, or None if it does not exist."""
+        if os.path.isfile(path):
+            return self.file_hash(path)
+        if not os.path.isdir(path):
+            return None
+        digest = hashlib.sha256()
+        for directory, subdirectories, files in os.walk(path):
+            subdirectories.sort()
+            for name in sorted(files):
+                file_path = os.path.join(directory, name)
+                digest.update(os.path.relpath(file_path, path).encode("utf-8"))
+                digest.update(self.file_hash(file_path).encode("ascii"))
+        return digest.hexdigest()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        """Atomically replaces the state file."""
+        state_dir = os.path.dirname(self.path)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        temp_file = f"{self.path}.tmp"
+        with open(temp_file, "w") as f:
+            json.dump(self._data, f, indent=2)
+        os.replace(temp_file, self.path)
+
+def stage_dependencies(stages):
+    """Maps each stage name to the names of the stages that write its inputs."""
+    producers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            producers[os.path.normpath(output)] = stage.name
+    dependencies = {}
+    for stage in stages:
+        dependencies[stage.name] = {producers[os.path.normpath(path)] for path in stage.inputs
+                                    if os.path.normpath(path) in producers and producers[os.path.normpath(path)] != stage.name}
+    return dependencies
+
+def select_stages(stages, targets, dependencies):
+    """Returns the names of the target stages and everything they depend on (all stages without targets)."""
+    if not targets:
+        return {stage.name for stage in stages}
+    selected = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(dependencies[name])
+    return selected
+
+def fingerprint(stage, state):
+    """Hashes a stage's command line, code and input contents. Missing inputs hash as None."""
+    payload = {
+        "command": stage.command()[1:],
+        "code": {path: state.path_hash(path) for path in stage.code},
+        "inputs": {path: state.path_hash(path) for path in stage.inputs},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+def is_up_to_date(stage, state, stage_fingerprint):
+    """A stage is up to date if it last succeeded with this fingerprint and its outputs are unchanged since."""
+    previous = state.stage(stage.name)
+    if previous.get("fingerprint") != stage_fingerprint:
+        return False
+    return all(state.path_hash(path) == previous.get("outputs", {}).get(path) for path in stage.outputs)
+
+def run_stage(stage, state, stage_fingerprint, log_dir):
+    """Runs a stage's script and records it if it exits cleanly and writes all its outputs."""
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f"{stage.name}.log")
+    started = time.perf_counter()
+    with open(log_path, "w") as log:
+        returncode = subprocess.run(stage.command(), stdout=log, stderr=subprocess.STDOUT).returncode
+    elapsed = time.perf_counter() - started
+
+    missing = [path for path in stage.outputs if not os.path.exists(path)]
+    if returncode != 0 or missing:
+        # Several scripts print an error and exit 0, so missing outputs also count as a failure
+        reason = f"exit code {returncode}" if returncode != 0 else f"did not write {', '.join(missing)}"
+        return {"status": "failed", "reason": reason, "wall_time_s": elapsed, "log": log_path}
+
+    state.record_stage(stage.name, fingerprint=stage_fingerprint,
+                       outputs={path: state.path_hash(path) for path in stage.outputs},
+                       wall_time_s=round(elapsed, 3), finished_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    return {"status": "ran", "wall_time_s": elapsed, "log": log_path}
+
+def run_pipeline(stages=STAGES, targets=None, force=(), jobs=2, state_file=DEFAULT_STATE_FILE,
+                 log_dir=DEFAULT_LOG_DIR, dry_run=False):
+    """
+    Runs the out-of-date stages needed for the targets, starting each as soon as the stages it
+    depends on have finished.
+
+    Args:
+        stages (list): The Stage objects of the pipeline.
+        targets (list, optional): Stage names to bring up to date; all stages by default.
+        force (list): Stage names to rerun even if they are up to date.
+        jobs (int): The maximum number of stages running at once.
+        state_file (str): The JSON file of fingerprints, output hashes and wall times.
+        log_dir (str): The directory each stage's output is logged to.
+        dry_run (bool): Only report which stages are stale.
+
+    Returns:
+        dict: Each selected stage's result: status ("ran", "up to date", "failed", "blocked" or "stale")
+            and wall time.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    unknown = [name for name in list(targets or []) + list(force) if name not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(unknown)}. Choose from {', '.join(by_name)}.")
+
+    dependencies = stage_dependencies(stages)
+    selected = select_stages(stages, targets, dependencies)
+    state = PipelineState(state_file)
+    results = {}
+    remaining = [stage.name for stage in stages if stage.name in selected]
+    running = {}
+    started = time.perf_counter()
+
+    def settled(name):
+        return name not in selected or name in results
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while remaining or running:
+            for name in list(remaining):
+                if not all(settled(dependency) for dependency in dependencies[name]):
+                    continue
+                remaining.remove(name)
+                upstream = [results[dependency]["status"] for dependency in dependencies[name] if dependency in results]
+                if "failed" in upstream or "blocked" in upstream:
+                    results[name] = {"status": "blocked", "wall_time_s": 0.0}
+                    print(f"[{name}] blocked by a failed stage")
+                    continue
+                stage = by_name[name]
+                # Inputs are hashed only now, after the stages writing them have finished
+                stage_fingerprint = fingerprint(stage, state)
+                if name not in force and "stale" not in upstream and is_up_to_date(stage, state, stage_fingerprint):
+                    results[name] = {"status": "up to date", "wall_time_s": 0.0}
+                    print(f"[{name}] up to date")
+                elif dry_run:
+                    results[name] = {"status": "stale", "wall_time_s": 0.0}
+                    print(f"[{name}] would run: {' '.join(stage.command()[1:])}")
+                else:
+                    print(f"[{name}] running: {' '.join(stage.command()[1:])}")
+                    running[pool.submit(run_stage, stage, state, stage_fingerprint, log_dir)] = name
+
+            if not running:
+                if remaining and not any(all(settled(dependency) for dependency in dependencies[name])
+                                         for name in remaining):
+                    raise ValueError(f"The stages {', '.join(remaining)} depend on each other in a cycle.")
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = future.result()
+                result = results[name]
+                if result["status"] == "failed":
+                    print(f"[{name}] failed after {result['wall_time_s']:.1f}s ({result['reason']}); see {result['log']}")
+                else:
+                    print(f"[{name}] finished in {result['wall_time_s']:.1f}s")
+    state.save()
+
+    elapsed = time.perf_counter() - started
+    print(f"\n{'stage':<12} {'status':<12} {'wall time (s)':>13}")
+    for stage in stages:
+        if stage.name in results:
+            result = results[stage.name]
+            print(f"{stage.name:<12} {result['status']:<12} {result['wall_time_s']:>13.1f}")
+    print(f"Pipeline finished in {elapsed:.1f}s")
+    return results
+
+def apply_overrides(stages, overrides):
+    """Applies --set stage.option=value overrides to the stages' parameters."""
+    by_name = {stage.name: stage for stage in stages}
+    for override in overrides:
+        key, separator, value = override.partition("=")
+        name, dot, option = key.partition(".")
+        if not separator or not dot or name not in by_name:
+            raise ValueError(f"Invalid override '{override}'; expected stage.option=value")
+        by_name[name].params[option.replace("-", "_")] = value
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the out-of-date stages of the data and model pipeline.")
+    parser.add_argument("targets", nargs="*", help="Stages to bring up to date, with their dependencies (default: all).")
+    parser.add_argument("--force", nargs="+", default=[], metavar="STAGE", help="Rerun these stages even if up to date.")
+    parser.add_argument("--jobs", type=int, default=2, help="The maximum number of stages running at once.")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="STAGE.OPTION=VALUE",
+                        help="Override a stage parameter, e.g. merge.threshold=0.9.")
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE, help="Where fingerprints and wall times are kept.")
+    parser.add_argument("--log-dir", default=DEFAULT_LOG_DIR, help="Where each stage's output is logged.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which stages would run.")
+    args = parser.parse_args()
+
+    # The stage paths are relative to the repository root
+    os.chdir(ROOT)
+    try:
+        apply_overrides(STAGES, args.overrides)
+        results = run_pipeline(STAGES, args.targets, args.force, args.jobs, args.state_file, args.log_dir, args.dry_run)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+    sys.exit(1 if any(result["status"] == "failed" for result in results.values()) else 0)
@@ -0,0 +1,40 @@
+# This module reads per-process memory figures from /proc, so serving workers can
+# report how much of the model they actually share with each other.
+import os
+
+def memory_usage(pid="self"):
+    """
+    Returns the RSS, PSS, shared and private memory of a process in megabytes.
+
+    PSS splits shared pages evenly between the processes using them, so the PSS of all
+    workers adds up to their real combined footprint. Returns an empty dict where
+    /proc/<pid>/smaps_rollup is unavailable (e.g. on macOS).
+    """
+    fields = {"Rss": 0, "Pss": 0, "Shared_Clean": 0, "Shared_Dirty": 0, "Private_Clean": 0, "Private_Dirty": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    fields[key] = int(value.split()[0])  # Reported in kB
+    except (FileNotFoundError, PermissionError, ProcessLookupError):
+        return {}
+    return {
+        "rss_mb": fields["Rss"] / 1024,
+        "pss_mb": fields["Pss"] / 1024,
+        "shared_mb": (fields["Shared_Clean"] + fields["Shared_Dirty"]) / 1024,
+        "private_mb": (fields["Private_Clean"] + fields["Private_Dirty"]) / 1024,
+    }
+
+def child_pids(pid):
+    """Returns the ids of a process's direct children (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", "r") as f:
+            return [int(child) for child in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+def threads_per_worker(workers, cpu_count=None):
+    """Splits the machine's cores evenly between workers, with at least one thread each."""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return max(1, cpu_count // max(1, workers))
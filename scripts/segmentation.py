@@ -0,0 +1,60 @@
+# This module splits long transcripts into sentence or utterance chunks that fit
+# the translation model's input length, so they can be translated as one batch
+# instead of being truncated.
+import re
+
+# The maximum tokenized input length used when fine-tuning (see phase2b_finetune_llm.py)
+MAX_INPUT_TOKENS = 128
+PROMPT_TEMPLATE = "Translate the following Caribbean dialect phrase to standard English: \"{}\""
+
+# Whitespace after sentence-ending punctuation (optionally closed by a quote or bracket), or a line break
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|(?<=[.!?…][\"')\]])\s+|\s*\n+\s*")
+
+def split_sentences(text):
+    """Splits text into sentences and utterances on end punctuation and line breaks."""
+    return [sentence.strip() for sentence in _SENTENCE_BOUNDARY.split(text) if sentence and sentence.strip()]
+
+def _split_long_sentence(sentence, tokenizer, budget):
+    """Splits a sentence at word boundaries into pieces of at most budget tokens."""
+    words = sentence.split()
+    word_lengths = [len(ids) for ids in tokenizer(words, add_special_tokens=False)["input_ids"]]
+
+    pieces = []
+    current = []
+    current_length = 0
+    for word, length in zip(words, word_lengths):
+        if current and current_length + length > budget:
+            pieces.append(" ".join(current))
+            current = []
+            current_length = 0
+        # A single word longer than the budget is left for the tokenizer to truncate
+        current.append(word)
+        current_length += length
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+def segment_for_translation(text, tokenizer, max_tokens=MAX_INPUT_TOKENS):
+    """
+    Splits text into chunks whose full translation prompt fits within max_tokens.
+
+    Each sentence becomes its own chunk, matching the short phrases the model was
+    trained on; sentences that are still too long are split at word boundaries.
+    Returns the chunks in their original order.
+    """
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+
+    # Tokens taken up by the prompt wrapper and the end-of-sequence token
+    overhead = len(tokenizer(PROMPT_TEMPLATE.format(""))["input_ids"])
+    budget = max(1, max_tokens - overhead)
+
+    lengths = [len(ids) for ids in tokenizer(sentences, add_special_tokens=False)["input_ids"]]
+    chunks = []
+    for sentence, length in zip(sentences, lengths):
+        if length <= budget:
+            chunks.append(sentence)
+        else:
+            chunks.extend(_split_long_sentence(sentence, tokenizer, budget))
+    return chunks
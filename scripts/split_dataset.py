@@ -1,16 +1,53 @@
 # This script splits the training data into a training set and a validation set.
 # This is a crucial step for evaluating the performance of the model during training.
+#
+# Each pair is assigned by a stable hash of its normalized dialect text rather than by a
+# random shuffle, in a single streaming pass. A pair always lands in the same split, so
+# adding data never moves existing rows between train and validation, and duplicates of
+# the same phrase never straddle both sets.
+import argparse
+import hashlib
 import json
 import os
-from sklearn.model_selection import train_test_split
+import re
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.merge_datasets import normalize_text
 
-def split_dataset(input_path="data/training_data.jsonl", test_size=0.2):
+# The dialect phrase is the quoted part of the prompt phase1b_prepare_training_data.py writes
+_QUOTED_TEXT = re.compile(r'"(.*)"\s*$', re.DOTALL)
+
+def dialect_key(input_text):
+    """Returns the normalized dialect text a pair is split by."""
+    match = _QUOTED_TEXT.search(input_text)
+    return normalize_text(match.group(1) if match else input_text)
+
+def validation_fraction(key, seed=""):
+    """Maps a key to a stable number in [0, 1); keys below test_size go to the validation set."""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8, person=seed.encode("utf-8")[:16]).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64
+
+def length_bucket(key, boundaries):
+    """Returns the label of the word-count bucket a key falls in, e.g. '1-8' or '33+'."""
+    words = len(key.split())
+    lower = 1
+    for upper in boundaries:
+        if words <= upper:
+            return f"{lower}-{upper}"
+        lower = upper + 1
+    return f"{lower}+"
+
+def split_dataset(input_path="data/training_data.jsonl", test_size=0.2, length_buckets=None, seed=""):
     """
     Splits the training data into a training set and a validation set.
 
     Args:
         input_path (str): Path to the full training_data.jsonl file.
         test_size (float): The proportion of the dataset to allocate to the validation set.
+        length_buckets (list, optional): Word-count boundaries, e.g. [8, 16, 32]. Since the hash does not
+            depend on length, every bucket gets test_size of its pairs in expectation; the per-bucket
+            counts are reported so the balance can be checked.
+        seed (str, optional): Salts the hash. Changing it reshuffles every assignment.
     """
     output_train_path = "data/train.jsonl"
     output_val_path = "data/validation.jsonl"
@@ -20,27 +57,53 @@ def split_dataset(input_path="data/training_data.jsonl", test_size=0.2):
         print("Please run phase1b_prepare_training_data.py first.")
         return
 
-    with open(input_path, "r") as f:
-        data = [json.loads(line) for line in f]
+    counts = {"train": 0, "validation": 0}
+    buckets = {}
+    # Written to temporary files and swapped in at the end, so a failed run leaves the old split intact
+    with open(input_path, "r") as f_in, \
+         open(f"{output_train_path}.tmp", "w") as f_train, \
+         open(f"{output_val_path}.tmp", "w") as f_val:
+        for line in f_in:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            key = dialect_key(item["input_text"])
+            split = "validation" if validation_fraction(key, seed) < test_size else "train"
+            (f_val if split == "validation" else f_train).write(json.dumps(item) + "\n")
+            counts[split] += 1
+            if length_buckets:
+                bucket = buckets.setdefault(length_bucket(key, length_buckets), {"train": 0, "validation": 0})
+                bucket[split] += 1
 
-    if len(data) < 2:
+    if counts["train"] + counts["validation"] < 2:
+        os.remove(f"{output_train_path}.tmp")
+        os.remove(f"{output_val_path}.tmp")
         print("Error: Not enough data to split. You need at least 2 samples.")
         return
 
-    # Split the data
-    train_data, val_data = train_test_split(data, test_size=test_size, random_state=42)
-
-    # Save the training set
-    with open(output_train_path, "w") as f:
-        for item in train_data:
-            f.write(json.dumps(item) + "\n")
-    print(f"Training set saved to {output_train_path} ({len(train_data)} samples)")
+    os.replace(f"{output_train_path}.tmp", output_train_path)
+    os.replace(f"{output_val_path}.tmp", output_val_path)
+    print(f"Training set saved to {output_train_path} ({counts['train']} samples)")
+    print(f"Validation set saved to {output_val_path} ({counts['validation']} samples)")
+    if counts["validation"] == 0:
+        print("Warning: the validation set is empty; the dataset may be too small for this test size.")
 
-    # Save the validation set
-    with open(output_val_path, "w") as f:
-        for item in val_data:
-            f.write(json.dumps(item) + "\n")
-    print(f"Validation set saved to {output_val_path} ({len(val_data)} samples)")
+    if length_buckets:
+        print(f"\n{'words':>8} {'train':>8} {'validation':>11} {'val share':>10}")
+        for label in sorted(buckets, key=lambda label: int(label.split("-")[0].rstrip("+"))):
+            bucket = buckets[label]
+            total = bucket["train"] + bucket["validation"]
+            print(f"{label:>8} {bucket['train']:>8} {bucket['validation']:>11} {bucket['validation'] / total:>10.1%}")
+    return counts
 
 if __name__ == "__main__":
-    split_dataset()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Split the training data into training and validation sets.")
+    parser.add_argument("--input-file", default="data/training_data.jsonl", help="The JSONL file of training pairs.")
+    parser.add_argument("--test-size", type=float, default=0.2, help="The share of pairs in the validation set.")
+    parser.add_argument("--length-buckets", type=int, nargs="+",
+                        help="Word-count boundaries to report the split per length bucket, e.g. 8 16 32.")
+    parser.add_argument("--seed", default="", help="Salts the split hash; changing it reshuffles every pair.")
+    args = parser.parse_args()
+
+    split_dataset(args.input_file, args.test_size, sorted(args.length_buckets) if args.length_buckets else None,
+                  args.seed)
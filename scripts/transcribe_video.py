@@ -1,43 +1,110 @@
+import hashlib
+import json
 import os
-from twelvelabs import TwelveLabs
+import threading
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Initialize TwelveLabs client
 API_KEY = os.getenv("TWELVE_LABS_API_KEY")
-if not API_KEY:
-    raise ValueError("TWELVE_LABS_API_KEY not found in .env file")
-client = TwelveLabs(api_key=API_KEY)
 
-def transcribe_video(video_path):
-    """Uploads video to Twelve Labs and returns transcript"""
+INDEX_NAME = "hacking7"
+# Transcripts are stored here by the SHA-256 of the media they came from
+TRANSCRIPT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR", "cache/transcripts")
+
+_client = None
+_index_id = None
+_index_lock = threading.Lock()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "stored": 0}
+
+def get_client():
+    """Creates the TwelveLabs client on first use, so importing this module needs no API key."""
+    global _client
+    with _index_lock:
+        if _client is None:
+            if not API_KEY:
+                raise ValueError("TWELVE_LABS_API_KEY not found in .env file")
+            from twelvelabs import TwelveLabs
+            _client = TwelveLabs(api_key=API_KEY)
+        return _client
+
+def get_index_id(index_name=INDEX_NAME):
+    """Looks up (or creates) the index once and reuses its id for the rest of the process."""
+    global _index_id
+    client = get_client()
+    with _index_lock:
+        if _index_id is None:
+            indexes = client.index.list()
+            index = next((i for i in indexes if i.name == index_name), None)
+
+            if not index:
+                print(f"Creating new index: {index_name}")
+                models = [
+                        {
+                        "name": "pegasus1",
+                        "options": ["visual", "audio"]
+                        }
+                ]
+                index = client.index.create(
+                    models=models,
+                    name=index_name
+                )
+            _index_id = index.id
+        return _index_id
+
+def hash_media(path, chunk_size=1024 * 1024):
+    """Returns the SHA-256 hex digest of a media file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _cache_path(media_hash):
+    return os.path.join(TRANSCRIPT_CACHE_DIR, f"{media_hash}.json")
+
+def get_cached_transcript(media_hash):
+    """Returns the cached transcript for a media hash, or None on a miss."""
+    try:
+        with open(_cache_path(media_hash), "r", encoding="utf-8") as f:
+            transcript = json.load(f)["transcript"]
+    except (FileNotFoundError, ValueError, KeyError):
+        transcript = None
+    with _cache_lock:
+        _cache_stats["hits" if transcript is not None else "misses"] += 1
+    return transcript
+
+def store_transcript(media_hash, transcript):
+    """Saves a transcript under the hash of the media it came from."""
+    os.makedirs(TRANSCRIPT_CACHE_DIR, exist_ok=True)
+    temp_path = f"{_cache_path(media_hash)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"transcript": transcript}, f)
+    os.replace(temp_path, _cache_path(media_hash))
+    with _cache_lock:
+        _cache_stats["stored"] += 1
+
+def transcript_cache_stats():
+    """Returns the transcript cache hit and miss counters."""
+    with _cache_lock:
+        stats = dict(_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+def upload_and_transcribe(video_path):
+    """Uploads video to Twelve Labs and returns transcript, without consulting the cache"""
     print("Uploading for transcription...")
-    
-    index_name = "hacking7"
-    indexes = client.index.list()
-    index = next((i for i in indexes if i.name == index_name), None)
-
-    if not index:
-        print(f"Creating new index: {index_name}")
-        models = [
-                {
-                "name": "pegasus1",
-                "options": ["visual", "audio"]
-                }
-        ]
-        index = client.index.create(
-            models=models,
-            name=index_name
-        )
+    client = get_client()
 
     with open(video_path, "rb") as f:
         task = client.task.create(
-            index_id=index.id,
+            index_id=get_index_id(),
             file=f
         )
-    
+
     print(f"Task ID: {task.id} - Waiting for processing...")
     def on_task_update(task):
         print(f"  Status={task.status}")
@@ -46,16 +113,37 @@ def transcribe_video(video_path):
         raise RuntimeError(f"Indexing failed with status {task.status}")
     print(f"The unique identifier of your video is {task.video_id}.")
 
-    
+
     # transcript = client.task.transcription(task.id)
     prompt = "Generate a verbatim transcript for this video."
-        
+
     res = client.generate.text(video_id=task.video_id, prompt=prompt, temperature=0.25)
-    
+
     if res:
         return res.data
     return None
 
+def transcribe_video(video_path, media_hash=None):
+    """
+    Returns the transcript of a video, uploading it to Twelve Labs only if the
+    same media has not been transcribed before.
+
+    Args:
+        video_path (str): Path to the video file.
+        media_hash (str, optional): A precomputed SHA-256 of the media, e.g. of the
+            original upload when video_path was converted from it.
+    """
+    media_hash = media_hash or hash_media(video_path)
+    transcript = get_cached_transcript(media_hash)
+    if transcript is not None:
+        print("Transcript found in cache.")
+        return transcript
+
+    transcript = upload_and_transcribe(video_path)
+    if transcript:
+        store_transcript(media_hash, transcript)
+    return transcript
+
 if __name__ == "__main__":
     import argparse
 
@@ -66,4 +154,4 @@ if __name__ == "__main__":
     transcript = transcribe_video(args.video_path)
     if transcript:
         print("\nTranscript:")
-        print(transcript)
\ No newline at end of file
+        print(transcript)
@@ -0,0 +1,133 @@
+# This module defines the transcription backends the web app can use.
+# "twelvelabs" uploads media to Twelve Labs (converting audio to video first),
+# while "local" runs a CPU-only Whisper model in-process with no network round trips.
+# The default backend is chosen with TRANSCRIPTION_BACKEND and can be overridden per request.
+import os
+import tempfile
+import threading
+from scripts.convert_audio_to_video import convert_audio_to_video
+from scripts.transcribe_video import (
+    upload_and_transcribe,
+    hash_media,
+    get_cached_transcript,
+    store_transcript,
+)
+
+DEFAULT_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "twelvelabs")
+
+class TranscriptionBackend:
+    """Base class for transcription backends."""
+
+    name = None
+
+    def transcribe(self, media_path, content_type="video/mp4"):
+        """Returns the transcript of an audio or video file, or None if no speech was found."""
+        raise NotImplementedError
+
+class TwelveLabsBackend(TranscriptionBackend):
+    """
+    Transcribes media with Twelve Labs.
+
+    Args:
+        use_cache (bool): Whether to reuse transcripts of media that was transcribed before.
+    """
+
+    name = "twelvelabs"
+
+    def __init__(self, use_cache=True):
+        self.use_cache = use_cache
+
+    def transcribe(self, media_path, content_type="video/mp4"):
+        # Key the cache on the original upload so repeats also skip the conversion
+        media_hash = hash_media(media_path) if self.use_cache else None
+        if media_hash:
+            transcript = get_cached_transcript(media_hash)
+            if transcript is not None:
+                return transcript
+
+        if content_type.startswith('audio/'):
+            # A unique name next to the upload, so it lands in the same scratch space and the
+            # sweeper reclaims it even if this process dies
+            fd, video_path = tempfile.mkstemp(suffix="_converted.mp4", dir=os.path.dirname(media_path) or None)
+            os.close(fd)
+            try:
+                # ffmpeg may leave a partial file behind when it fails
+                if not convert_audio_to_video(media_path, video_path):
+                    raise RuntimeError("Failed to convert audio to video.")
+                transcript = upload_and_transcribe(video_path)
+            finally:
+                if os.path.exists(video_path):
+                    os.remove(video_path)
+        else:
+            transcript = upload_and_transcribe(media_path)
+
+        if transcript and media_hash:
+            store_transcript(media_hash, transcript)
+        return transcript
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """
+    Transcribes media on the CPU with faster-whisper. Audio and video files are
+    decoded directly, so no conversion or upload is needed.
+
+    Args:
+        model_size (str): The Whisper model to load, e.g. "tiny", "base" or "small".
+        compute_type (str): The CTranslate2 compute type; "int8" is fastest on CPU.
+        cpu_threads (int): Threads used for inference; 0 lets CTranslate2 decide.
+        beam_size (int): Beam width used for decoding.
+    """
+
+    name = "local"
+
+    def __init__(self, model_size=None, compute_type="int8", cpu_threads=None, beam_size=1):
+        self.model_size = model_size or os.getenv("LOCAL_ASR_MODEL", "base")
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads if cpu_threads is not None else int(os.getenv("LOCAL_ASR_THREADS", "0"))
+        self.beam_size = beam_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load_model(self):
+        with self._lock:
+            if self._model is None:
+                try:
+                    from faster_whisper import WhisperModel
+                except ImportError:
+                    raise RuntimeError("The local backend requires faster-whisper. Install it with: pip install faster-whisper")
+                print(f"Loading local speech recognition model '{self.model_size}'...")
+                self._model = WhisperModel(
+                    self.model_size,
+                    device="cpu",
+                    compute_type=self.compute_type,
+                    cpu_threads=self.cpu_threads,
+                )
+            return self._model
+
+    def transcribe(self, media_path, content_type="video/mp4"):
+        model = self._load_model()
+        segments, _ = model.transcribe(media_path, beam_size=self.beam_size, vad_filter=True)
+        transcript = " ".join(segment.text.strip() for segment in segments).strip()
+        return transcript or None
+
+BACKENDS = {
+    TwelveLabsBackend.name: TwelveLabsBackend,
+    LocalWhisperBackend.name: LocalWhisperBackend,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+def get_backend(name=None):
+    """
+    Returns the shared instance of a backend, creating it on first use.
+
+    Args:
+        name (str, optional): A key of BACKENDS. Defaults to TRANSCRIPTION_BACKEND or "twelvelabs".
+    """
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = BACKENDS[name]()
+        return _instances[name]
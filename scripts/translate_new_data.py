@@ -1,65 +1,155 @@
 # This script uses a fine-tuned translation model to generate draft translations
 # for a new dataset of comments. The output is a CSV file with prompts and responses.
+#
+# Comments are read in chunks, sorted by token length into batches so that padding
+# is kept to a minimum, and written back in their original order. A checkpoint file
+# is updated after every chunk, so an interrupted run resumes where it stopped.
+import argparse
 import csv
+import json
 import os
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+import sys
 
-def translate_new_data():
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.model_backends import BACKENDS, DEFAULT_BACKEND
+from scripts.decoding_policy import DEFAULT_POLICY, POLICIES
+from scripts.inference import get_model, translate_texts
+
+def input_signature(input_file):
+    """Returns the size and modification time a checkpoint records for its input file."""
+    stat = os.stat(input_file)
+    return {"input_size": stat.st_size, "input_mtime_ns": stat.st_mtime_ns}
+
+def load_checkpoint(checkpoint_file, input_file):
+    """
+    Returns the saved progress for input_file, or None if there is nothing to resume. A checkpoint
+    is ignored if the input has changed since it was written, e.g. when get_youtube_comments.py
+    appended new comments, since its row count would no longer line up with the file.
+    """
+    if not os.path.exists(checkpoint_file):
+        return None
+    with open(checkpoint_file, "r") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("input_file") != os.path.abspath(input_file):
+        print(f"Ignoring checkpoint {checkpoint_file}: it was written for {checkpoint.get('input_file')}")
+        return None
+    if any(checkpoint.get(key) != value for key, value in input_signature(input_file).items()):
+        print(f"Ignoring checkpoint {checkpoint_file}: {input_file} has changed since it was written")
+        return None
+    return checkpoint
+
+def save_checkpoint(checkpoint_file, checkpoint):
+    """Atomically replaces the checkpoint file."""
+    temp_file = f"{checkpoint_file}.tmp"
+    with open(temp_file, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_file, checkpoint_file)
+
+def translate_new_data(input_file='youtube_comments.csv', output_file='translated_youtube_comments.csv',
+                       batch_size=16, chunk_size=512, resume=True, backend=DEFAULT_BACKEND, policy=DEFAULT_POLICY):
     """
     Uses the current fine-tuned model to create draft translations for a new dataset.
+
+    Args:
+        input_file (str): The CSV file of comments to translate.
+        output_file (str): The CSV file the prompts and draft translations are written to.
+        batch_size (int): The number of comments translated in one `generate` call.
+        chunk_size (int): The number of rows sorted, translated and checkpointed together.
+        resume (bool): Whether to continue from an existing checkpoint instead of starting over.
+        backend (str): The inference backend to use: "pytorch", "int8" or "onnx".
+        policy (str): The decoding policy that picks beam width and output length per batch.
     """
-    input_file = 'youtube_comments.csv'
-    output_file = 'translated_youtube_comments.csv'
     model_path = "./results/final_model"
+    checkpoint_file = f"{output_file}.checkpoint.json"
 
     if not os.path.exists(input_file):
         print(f"Error: Input file not found at {input_file}")
         return
 
-    print("Loading translation model...")
-    tokenizer = AutoTokenizer.from_pretrained(model_path)
-    model = AutoModelForSeq2SeqLM.from_pretrained(model_path)
-
-    def translate_text(text):
-        prompt = f"Translate the following Caribbean dialect phrase to standard English: \"{text}\""
-        inputs = tokenizer(prompt, return_tensors="pt", padding=True, truncation=True)
-        
-        output_sequences = model.generate(
-            input_ids=inputs['input_ids'],
-            attention_mask=inputs['attention_mask'],
-            max_length=100,
-            num_beams=5,
-            early_stopping=True
-        )
-        
-        return tokenizer.decode(output_sequences[0], skip_special_tokens=True).strip()
+    print(f"Loading translation model ({backend})...")
+    tokenizer, model = get_model(model_path, backend)
+
+    def translate_chunk(texts):
+        # Sorted by token length so each batch holds inputs of similar size
+        return translate_texts(texts, tokenizer, model, batch_size=batch_size, policy=policy)
+
+    checkpoint = load_checkpoint(checkpoint_file, input_file) if resume else None
+    # Taken before reading, so a change made during the run also invalidates its checkpoint
+    signature = input_signature(input_file)
+    if checkpoint and os.path.exists(output_file):
+        rows_done = checkpoint["rows_done"]
+        # Drop anything written after the last completed chunk
+        with open(output_file, 'rb+') as f_out:
+            f_out.truncate(checkpoint["output_bytes"])
+        print(f"Resuming after {rows_done} rows of {input_file}...")
+    else:
+        rows_done = 0
+        with open(output_file, 'w', newline='', encoding='utf-8') as f_out:
+            csv.writer(f_out).writerow(['prompt', 'response'])  # Write new header
 
     with open(input_file, 'r', encoding='utf-8') as f_in, \
-         open(output_file, 'w', newline='', encoding='utf-8') as f_out:
-        
+         open(output_file, 'a', newline='', encoding='utf-8') as f_out:
+
         reader = csv.reader(f_in)
         writer = csv.writer(f_out)
-        
+
         header = next(reader)  # Skip header
-        writer.writerow(['prompt', 'response'])  # Write new header
+        for _ in range(rows_done):
+            next(reader, None)
 
         print(f"Translating comments from {input_file}...")
-        for i, row in enumerate(reader):
-            dialect_comment = row[0]
-            
-            # Add the required prefix to the prompt
-            prompt_text = f"tec:{dialect_comment}"
-            
-            # Get the draft translation
-            draft_translation = translate_text(dialect_comment)
-            
-            writer.writerow([prompt_text, draft_translation])
-            
-            if (i + 1) % 10 == 0:
-                print(f"  ...translated {i + 1} comments")
+        rows_read = rows_done
+        translated = 0
+        while True:
+            chunk = []
+            for row in reader:
+                rows_read += 1
+                if row:
+                    chunk.append(row[0])
+                if rows_read - rows_done >= chunk_size:
+                    break
+            if rows_read == rows_done:
+                break
 
+            draft_translations = translate_chunk(chunk) if chunk else []
+            for dialect_comment, draft_translation in zip(chunk, draft_translations):
+                # Add the required prefix to the prompt
+                writer.writerow([f"tec:{dialect_comment}", draft_translation])
+
+            f_out.flush()
+            os.fsync(f_out.fileno())
+            rows_done = rows_read
+            translated += len(chunk)
+            save_checkpoint(checkpoint_file, {
+                "input_file": os.path.abspath(input_file),
+                **signature,
+                "rows_done": rows_done,
+                "output_bytes": f_out.tell(),
+            })
+            print(f"  ...translated {translated} comments ({rows_done} rows done)")
+
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
     print(f"\nDraft translations saved to {output_file}")
     print("Please review and correct the translations in this file before retraining the model.")
 
 if __name__ == "__main__":
-    translate_new_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate draft translations for a new dataset of comments.")
+    parser.add_argument("--input-file", default="youtube_comments.csv", help="The CSV file of comments to translate.")
+    parser.add_argument("--output-file", default="translated_youtube_comments.csv", help="The CSV file to write translations to.")
+    parser.add_argument("--batch-size", type=int, default=16, help="The number of comments translated per generate call.")
+    parser.add_argument("--chunk-size", type=int, default=512, help="The number of rows translated between checkpoints.")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore any checkpoint and start over.")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS, help="The inference backend to use.")
+    parser.add_argument("--policy", default=DEFAULT_POLICY, choices=list(POLICIES), help="The decoding policy to use.")
+    args = parser.parse_args()
+
+    translate_new_data(
+        input_file=args.input_file,
+        output_file=args.output_file,
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        resume=not args.no_resume,
+        backend=args.backend,
+        policy=args.policy,
+    )
@@ -0,0 +1,165 @@
+# This module provides a two-tier cache for model translations.
+# A bounded in-memory LRU sits in front of a SQLite database on disk, so repeated
+# phrases are served without running the model, even after a restart.
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+def normalize_text(text):
+    """Normalizes unicode and whitespace so trivially different inputs share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+def model_fingerprint(model_path):
+    """
+    Returns a short fingerprint of the files in a saved model directory.
+
+    The fingerprint covers every file's relative path, size and modification time,
+    so saving a retrained model to the same directory produces a new fingerprint.
+    """
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(model_path):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            digest.update(os.path.relpath(path, model_path).encode("utf-8"))
+            digest.update(f":{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+class TranslationCache:
+    """
+    Caches translations keyed on normalized text, model fingerprint and generation parameters.
+
+    Args:
+        model_path (str): The saved model directory, used to compute the model fingerprint.
+        generation_params (dict): The default keyword arguments passed to `model.generate`.
+            get and put accept per-call parameters when the settings vary between inputs.
+        db_path (str): The SQLite file backing the persistent tier. It can be shared by processes serving
+            different models or backends, since the fingerprint is part of every key.
+        max_memory_entries (int): The maximum number of entries kept in the in-memory LRU.
+        max_disk_entries (int): The maximum number of entries kept on disk; the oldest are evicted first,
+            which also clears out entries of models that are no longer served.
+    """
+
+    # How many puts go by between checks of the disk tier's size
+    DISK_EVICTION_INTERVAL = 1000
+
+    def __init__(self, model_path, generation_params, db_path="cache/translations.sqlite3", max_memory_entries=4096,
+                 max_disk_entries=200000):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.fingerprint = model_fingerprint(model_path)
+        self.generation_params = dict(generation_params)
+        self._params_key = json.dumps(self.generation_params, sort_keys=True)
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._conn = None
+        self._conn_pid = None
+        self._puts_since_eviction = 0
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "disk_evictions": 0,
+        }
+
+    def _connection(self):
+        """Opens the SQLite connection lazily, and again in a forked child process."""
+        if self._conn is not None and self._conn_pid == os.getpid():
+            return self._conn
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, text TEXT NOT NULL, translation TEXT NOT NULL, "
+            "created_at REAL NOT NULL DEFAULT 0)"
+        )
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(translations)")]
+        if "created_at" not in columns:
+            # Files written before entries were timestamped; their entries count as the oldest
+            conn.execute("ALTER TABLE translations ADD COLUMN created_at REAL NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS translations_created_at ON translations (created_at)")
+        conn.commit()
+        self._conn = conn
+        self._conn_pid = os.getpid()
+        self._evict_disk(conn)
+        return conn
+
+    def _evict_disk(self, conn):
+        """Deletes the oldest entries beyond max_disk_entries, whichever model wrote them."""
+        excess = conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0] - self.max_disk_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM translations WHERE key IN "
+                "(SELECT key FROM translations ORDER BY created_at LIMIT ?)", (excess,)
+            )
+            conn.commit()
+            self._counters["disk_evictions"] += excess
+        self._puts_since_eviction = 0
+
+    def _key(self, text, generation_params=None):
+        params_key = self._params_key if generation_params is None else json.dumps(generation_params, sort_keys=True)
+        payload = f"{self.fingerprint}\n{params_key}\n{normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key, translation):
+        self._memory[key] = translation
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def get(self, text, generation_params=None):
+        """Returns the cached translation of text, or None on a miss."""
+        key = self._key(text, generation_params)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return self._memory[key]
+            row = self._connection().execute(
+                "SELECT translation FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["disk_hits"] += 1
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, text, translation, generation_params=None):
+        """Stores a translation in both tiers."""
+        key = self._key(text, generation_params)
+        with self._lock:
+            self._remember(key, translation)
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO translations (key, fingerprint, text, translation, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, self.fingerprint, normalize_text(text), translation, time.time()),
+            )
+            conn.commit()
+            self._puts_since_eviction += 1
+            if self._puts_since_eviction >= self.DISK_EVICTION_INTERVAL:
+                self._evict_disk(conn)
+
+    def stats(self):
+        """Returns the hit, miss and eviction counters."""
+        with self._lock:
+            stats = dict(self._counters)
+            lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+            stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+            stats["memory_entries"] = len(self._memory)
+            stats["max_memory_entries"] = self.max_memory_entries
+            stats["model_fingerprint"] = self.fingerprint
+            return stats
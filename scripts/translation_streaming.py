@@ -0,0 +1,80 @@
+# This module streams a translation piece by piece while the model is still decoding,
+# and records latency figures such as time-to-first-token.
+import threading
+from collections import deque
+from transformers import TextIteratorStreamer
+from scripts.inference import build_prompt
+
+class LatencyRecorder:
+    """
+    Keeps the most recent latency samples and summarizes them.
+
+    Args:
+        max_samples (int): How many recent samples the summary is computed over.
+    """
+
+    def __init__(self, max_samples=1000):
+        self._samples = deque(maxlen=max_samples)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self._count += 1
+
+    def summary(self):
+        """Returns the total count and the mean, median, p95 and max of recent samples in milliseconds."""
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self._count
+        if not samples:
+            return {"count": count, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        return {
+            "count": count,
+            "mean_ms": 1000 * sum(samples) / len(samples),
+            "p50_ms": 1000 * samples[len(samples) // 2],
+            "p95_ms": 1000 * samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            "max_ms": 1000 * samples[-1],
+        }
+
+def stream_translation(text, model, tokenizer, num_beams=1, max_length=100):
+    """
+    Yields pieces of the translation of text as they are decoded.
+
+    Greedy decoding (num_beams=1) streams token by token. Beam search only knows its
+    best hypothesis once decoding ends, so with num_beams > 1 the whole translation
+    is yielded as a single piece.
+    """
+    inputs = tokenizer(build_prompt(text), return_tensors="pt", truncation=True)
+    generate_kwargs = dict(
+        input_ids=inputs['input_ids'],
+        attention_mask=inputs['attention_mask'],
+        max_length=max_length,
+        num_beams=num_beams,
+    )
+
+    if num_beams > 1:
+        output_sequences = model.generate(early_stopping=True, **generate_kwargs)
+        yield tokenizer.decode(output_sequences[0], skip_special_tokens=True).strip()
+        return
+
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    errors = []
+
+    def generate():
+        try:
+            model.generate(streamer=streamer, **generate_kwargs)
+        except Exception as e:
+            errors.append(e)
+            # Unblock the consumer, which would otherwise wait for tokens forever
+            streamer.end()
+
+    thread = threading.Thread(target=generate, daemon=True)
+    thread.start()
+    for piece in streamer:
+        if piece:
+            yield piece
+    thread.join()
+    if errors:
+        raise errors[0]
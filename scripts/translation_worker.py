@@ -0,0 +1,153 @@
+# This script runs a long-lived translation worker that loads the model once and then
+# answers translation requests, so scripts making thousands of one-off translations
+# do not pay the model load each time. It speaks JSON Lines, one request per line:
+#
+#     {"id": 1, "texts": ["Wah gwan", "Mi deh yah"], "policy": "fast", "latency_budget_ms": 200}
+#     {"id": 1, "translations": ["What's going on", "I'm here"]}
+#
+# "text" may be given instead of "texts" (answered with "translation"), "policy" and
+# "latency_budget_ms" are optional, and {"op": "stats"} returns batching statistics.
+# Failed requests are answered with {"id": ..., "error": "..."}.
+#
+# Serve on a local unix socket (used by phase2c_custom_translation_agent.py when running):
+#     python scripts/translation_worker.py
+# Or over stdin/stdout, e.g. as a coprocess of another program:
+#     python scripts/translation_worker.py --stdio < requests.jsonl > answers.jsonl
+import argparse
+import json
+import os
+import socketserver
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.batch_translator import BatchTranslator
+from scripts.decoding_policy import get_policy
+from scripts.inference import get_model, input_lengths, translate_batch
+from scripts.model_backends import BACKENDS, DEFAULT_BACKEND, DEFAULT_MODEL_PATH
+from scripts.worker_client import DEFAULT_SOCKET_PATH
+
+class TranslationWorker:
+    """
+    Answers JSON translation requests with a model loaded once for the life of the process.
+
+    Args:
+        model_path (str): The fp32 model directory; variants are found next to it.
+        backend (str): The inference backend: "pytorch", "int8" or "onnx".
+        max_batch_size (int): The maximum number of texts sent to the model in one call.
+        max_wait_ms (float): How long a request waits for others to share its batch.
+    """
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, backend=DEFAULT_BACKEND, max_batch_size=8, max_wait_ms=10):
+        self.backend = backend
+        self.tokenizer, self.model = get_model(model_path, backend)
+        self.started = time.time()
+        # Requests from concurrent socket connections share batches
+        self.translator = BatchTranslator(
+            lambda texts, **generation_params: translate_batch(texts, self.tokenizer, self.model, **generation_params),
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+        )
+
+    def translate(self, texts, policy=None, latency_budget_ms=None):
+        # One request is decoded as one batch, so its longest text picks the settings, as in
+        # batch_settings; requests from other connections join it when their beams match
+        settings = get_policy(policy).settings(max(input_lengths(texts, self.tokenizer)), latency_budget_ms)
+        return self.translator.translate_many(texts, [settings] * len(texts))
+
+    def handle(self, request):
+        """Returns the answer to one decoded request."""
+        answer = {"id": request.get("id")} if isinstance(request, dict) else {"id": None}
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("Each request must be a JSON object.")
+            if request.get("op") == "stats":
+                answer["stats"] = {
+                    "backend": self.backend,
+                    "uptime_s": time.time() - self.started,
+                    "batching": self.translator.stats(),
+                }
+                return answer
+
+            texts = request["texts"] if "texts" in request else [request.get("text")]
+            if not isinstance(texts, list) or not texts or not all(isinstance(text, str) and text.strip() for text in texts):
+                raise ValueError("Provide 'text' or 'texts' as non-empty strings.")
+            latency_budget_ms = request.get("latency_budget_ms")
+            if latency_budget_ms is not None and (not isinstance(latency_budget_ms, (int, float)) or latency_budget_ms <= 0):
+                raise ValueError("latency_budget_ms must be a positive number.")
+
+            translations = self.translate(texts, request.get("policy"), latency_budget_ms)
+            if "texts" in request:
+                answer["translations"] = translations
+            else:
+                answer["translation"] = translations[0]
+        except Exception as e:
+            answer["error"] = str(e)
+        return answer
+
+    def handle_line(self, line):
+        """Decodes one JSON line and returns the encoded answer, or None for a blank line."""
+        if not line.strip():
+            return None
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return json.dumps({"id": None, "error": f"Invalid JSON: {e}"})
+        return json.dumps(self.handle(request))
+
+def serve_stdio(worker):
+    """Answers requests from stdin on stdout until stdin is closed."""
+    for line in sys.stdin:
+        answer = worker.handle_line(line)
+        if answer is not None:
+            sys.stdout.write(answer + "\n")
+            sys.stdout.flush()
+
+def serve_socket(worker, socket_path):
+    """Answers requests on a unix socket, one thread per connection, until interrupted."""
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                answer = worker.handle_line(line.decode("utf-8"))
+                if answer is not None:
+                    self.wfile.write((answer + "\n").encode("utf-8"))
+                    self.wfile.flush()
+
+    socket_dir = os.path.dirname(socket_path)
+    if socket_dir:
+        os.makedirs(socket_dir, exist_ok=True)
+    if os.path.exists(socket_path):
+        # Left behind by a worker that did not shut down cleanly
+        os.remove(socket_path)
+
+    server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    server.daemon_threads = True
+    # Only the current user may connect
+    os.chmod(socket_path, 0o600)
+    print(f"Translation worker ({worker.backend}) listening on {socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a long-lived translation worker with the model loaded once.")
+    parser.add_argument("--stdio", action="store_true", help="Answer JSON Lines on stdin/stdout instead of a socket.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="The unix socket to listen on.")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKENDS, help="The inference backend to use.")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH, help="The fine-tuned model directory.")
+    parser.add_argument("--batch-size", type=int, default=8, help="The maximum number of texts per generate call.")
+    args = parser.parse_args()
+
+    # Progress goes to stderr so stdout carries only answers in --stdio mode
+    print(f"Loading translation model ({args.backend})...", file=sys.stderr)
+    worker = TranslationWorker(args.model_path, args.backend, max_batch_size=args.batch_size)
+    if args.stdio:
+        serve_stdio(worker)
+    else:
+        serve_socket(worker, args.socket)
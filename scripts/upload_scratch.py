@@ -0,0 +1,300 @@
+# This module manages the scratch space used for uploaded and recorded media.
+# Multipart uploads are streamed straight into uniquely named files (small ones can
+# go to a tmpfs directory), every file is removed when its request ends, and a
+# background sweeper reclaims anything abandoned, so disk usage stays bounded.
+#
+# The quota is enforced with a byte counter rather than by scanning the directories:
+# space is reserved when a file is created, reservations grow as uploads of unknown size
+# are written, and they are released when files are removed. Under several worker
+# processes each one counts its own files exactly and re-reads the others' usage from
+# disk at every sweep.
+import os
+import tempfile
+import threading
+import time
+import uuid
+from flask import Request, request
+from werkzeug.exceptions import InsufficientStorage
+from werkzeug.utils import secure_filename
+
+class ScratchSpaceFull(Exception):
+    """Raised when a new file would push the scratch space over its size quota."""
+
+class QuotaFile:
+    """
+    Wraps an open scratch file so that writes past its reservation reserve more space,
+    raising `error` once the scratch space has none left. Everything else is delegated
+    to the file.
+    """
+
+    def __init__(self, scratch, f, reserved, error=ScratchSpaceFull):
+        self._scratch = scratch
+        self._file = f
+        self._reserved = reserved
+        self._error = error
+
+    def write(self, data):
+        end = self._file.tell() + len(data)
+        if end > self._reserved:
+            try:
+                self._scratch._grow(self._file.name, end - self._reserved)
+            except ScratchSpaceFull as e:
+                raise self._error(str(e))
+            self._reserved = end
+        return self._file.write(data)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            # Give back whatever was reserved beyond what was actually written
+            self._scratch.settle(self._file.name)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ScratchSpace:
+    """
+    A directory of short-lived media files with a size quota and an age limit.
+
+    Args:
+        directory (str): Where files are written.
+        memory_directory (str, optional): A tmpfs directory (e.g. /dev/shm/context) used for
+            files no larger than memory_threshold. Disabled when None.
+        memory_threshold (int): The largest file, in bytes, placed in memory_directory.
+        max_total_bytes (int): The quota across both directories.
+        max_age (float): Files older than this many seconds are removed by the sweeper.
+    """
+
+    def __init__(self, directory="temp_uploads", memory_directory=None, memory_threshold=8 * 1024 * 1024,
+                 max_total_bytes=2 * 1024 * 1024 * 1024, max_age=4 * 3600):
+        self.directory = directory
+        self.memory_directory = memory_directory
+        self.memory_threshold = memory_threshold
+        self.max_total_bytes = max_total_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._sweeper_pid = None
+        self._stats = {"files_created": 0, "files_removed": 0, "files_swept": 0, "bytes_swept": 0, "rejected": 0}
+        for path in self._directories():
+            os.makedirs(path, exist_ok=True)
+        # Bytes reserved for each file this process created, and their total
+        self._reservations = {}
+        self._reserved_bytes = 0
+        # Bytes held by files this process is not tracking (left by an earlier run or another
+        # worker), refreshed from disk by every sweep
+        self._untracked_bytes = self.usage()[1]
+
+    def _directories(self):
+        return [path for path in (self.directory, self.memory_directory) if path]
+
+    def _pick_directory(self, expected_size):
+        if self.memory_directory and expected_size is not None and expected_size <= self.memory_threshold:
+            return self.memory_directory
+        return self.directory
+
+    def usage(self):
+        """Returns the number of files and bytes currently held in the scratch space."""
+        files = 0
+        total = 0
+        for path in self._directories():
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        files += 1
+                        total += entry.stat(follow_symlinks=False).st_size
+        return files, total
+
+    def _check_space(self, size):
+        # Called with the lock held
+        if self._untracked_bytes + self._reserved_bytes + size > self.max_total_bytes:
+            self._stats["rejected"] += 1
+            raise ScratchSpaceFull("Not enough scratch space for this upload. Please try again later.")
+
+    def _reserve(self, path, size):
+        """Reserves size bytes for a new file, atomically with the quota check."""
+        with self._lock:
+            self._check_space(size)
+            self._reservations[path] = size
+            self._reserved_bytes += size
+            self._stats["files_created"] += 1
+
+    def _grow(self, path, size):
+        """Reserves size more bytes for a file that is being written past its reservation."""
+        with self._lock:
+            self._check_space(size)
+            self._reservations[path] = self._reservations.get(path, 0) + size
+            self._reserved_bytes += size
+
+    def _release(self, path):
+        # Called with the lock held
+        self._reserved_bytes -= self._reservations.pop(path, 0)
+
+    def settle(self, path):
+        """Sets a file's reservation to its actual size, e.g. once an external tool has written it."""
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if path in self._reservations:
+                self._reserved_bytes += size - self._reservations[path]
+                self._reservations[path] = size
+
+    def new_path(self, suffix="", expected_size=None):
+        """
+        Returns a unique path for a file that the caller will create, reserving expected_size bytes
+        for it. Call settle() once the file is written so the reservation matches its size.
+        """
+        path = os.path.join(self._pick_directory(expected_size), f"{uuid.uuid4().hex}{suffix}")
+        self._reserve(path, expected_size or 0)
+        return path
+
+    def create_file(self, suffix="", expected_size=None, full_error=ScratchSpaceFull):
+        """
+        Creates and opens a uniquely named file for writing and reading back. When expected_size is
+        unknown (e.g. a chunked upload), space is reserved as the file is written, and a write that
+        would exceed the quota raises full_error.
+        """
+        with self._lock:
+            # Fail fast before creating anything when there is no room at all
+            self._check_space(expected_size or 0)
+        f = tempfile.NamedTemporaryFile(
+            mode="w+b", dir=self._pick_directory(expected_size), prefix="upload_", suffix=suffix, delete=False
+        )
+        try:
+            self._reserve(f.name, expected_size or 0)
+        except ScratchSpaceFull:
+            f.close()
+            os.remove(f.name)
+            raise
+        return QuotaFile(self, f, expected_size or 0, full_error)
+
+    def remove(self, path):
+        """Removes a scratch file if it still exists and releases its reservation."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._release(path)
+            return
+        with self._lock:
+            self._release(path)
+            self._stats["files_removed"] += 1
+
+    def sweep(self):
+        """Removes files older than max_age and returns how many files and bytes were reclaimed."""
+        cutoff = time.time() - self.max_age
+        files = 0
+        reclaimed = 0
+        swept = []
+        untracked = 0
+        for path in self._directories():
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        stat = entry.stat(follow_symlinks=False)
+                        if stat.st_mtime < cutoff:
+                            os.remove(entry.path)
+                            swept.append(entry.path)
+                            files += 1
+                            reclaimed += stat.st_size
+                        else:
+                            with self._lock:
+                                tracked = entry.path in self._reservations
+                            if not tracked:
+                                untracked += stat.st_size
+                    except FileNotFoundError:
+                        continue
+        with self._lock:
+            for path in swept:
+                self._release(path)
+            self._untracked_bytes = untracked
+            self._stats["files_swept"] += files
+            self._stats["bytes_swept"] += reclaimed
+        return files, reclaimed
+
+    def start_sweeper(self, interval=300):
+        """Starts the background sweeper once per process (again after a fork)."""
+        with self._lock:
+            if self._sweeper_pid == os.getpid():
+                return
+            self._sweeper_pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    files, reclaimed = self.sweep()
+                    if files:
+                        print(f"Scratch sweeper removed {files} abandoned files ({reclaimed} bytes).")
+                except Exception as e:
+                    print(f"Scratch sweeper failed: {e}")
+
+        threading.Thread(target=run, daemon=True, name="scratch-sweeper").start()
+
+    def stats(self):
+        """Returns the current usage and lifetime counters."""
+        files, total = self.usage()
+        with self._lock:
+            stats = dict(self._stats)
+            stats["reserved_bytes"] = self._reserved_bytes
+            stats["untracked_bytes"] = self._untracked_bytes
+        stats.update({"files": files, "bytes": total, "max_total_bytes": self.max_total_bytes})
+        return stats
+
+def scratch_request_class(scratch):
+    """
+    Returns a Flask request class that streams multipart file uploads directly into
+    the scratch space instead of werkzeug's own temporary files.
+
+    Every file created for a request is removed when the request ends (see
+    cleanup_request_files) unless it was handed over with keep_upload.
+    """
+
+    class ScratchRequest(Request):
+        def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+            suffix = os.path.splitext(secure_filename(filename or ""))[1]
+            try:
+                # Uploads without a Content-Length are held to the quota as they are written
+                f = scratch.create_file(suffix=suffix, expected_size=total_content_length,
+                                        full_error=InsufficientStorage)
+            except ScratchSpaceFull as e:
+                raise InsufficientStorage(str(e))
+            self.scratch_files.append(f)
+            return f
+
+        @property
+        def scratch_files(self):
+            if "_scratch_files" not in self.__dict__:
+                self.__dict__["_scratch_files"] = []
+            return self.__dict__["_scratch_files"]
+
+    return ScratchRequest
+
+def upload_path(file_storage):
+    """Flushes an uploaded file to its scratch file and returns the path."""
+    file_storage.stream.flush()
+    return file_storage.stream.name
+
+def keep_upload(file_storage):
+    """Detaches an upload from the current request so it outlives it, and returns its path."""
+    path = upload_path(file_storage)
+    request.scratch_files[:] = [f for f in request.scratch_files if f.name != path]
+    return path
+
+def cleanup_request_files(scratch):
+    """Closes and removes the scratch files created for the current request."""
+    for f in getattr(request, "scratch_files", []):
+        f.close()
+        scratch.remove(f.name)
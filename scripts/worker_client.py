@@ -0,0 +1,67 @@
+# This module talks to a running translation worker (see translation_worker.py) over its
+# local socket. It only uses the standard library, so importing it does not pay for
+# loading torch or transformers.
+import json
+import os
+import socket
+
+DEFAULT_SOCKET_PATH = os.getenv("TRANSLATION_WORKER_SOCKET", "cache/translation_worker.sock")
+
+class WorkerError(Exception):
+    """Raised when the worker answers a request with an error."""
+
+def worker_available(socket_path=DEFAULT_SOCKET_PATH):
+    """Returns True if a worker socket exists at socket_path."""
+    return os.path.exists(socket_path)
+
+class WorkerClient:
+    """
+    A connection to the translation worker. Several requests can be sent over one connection.
+
+    Args:
+        socket_path (str): The worker's unix socket.
+        timeout (float): Seconds to wait for each answer.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, timeout=600):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(socket_path)
+        self._reader = self._sock.makefile("r", encoding="utf-8")
+        self._next_id = 0
+
+    def request(self, payload):
+        """Sends one JSON request and returns the worker's answer."""
+        self._next_id += 1
+        payload = dict(payload, id=self._next_id)
+        self._sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("The translation worker closed the connection.")
+        response = json.loads(line)
+        if "error" in response:
+            raise WorkerError(response["error"])
+        return response
+
+    def translate(self, text, policy=None, latency_budget_ms=None):
+        """Translates a single dialect phrase."""
+        return self.translate_many([text], policy, latency_budget_ms)[0]
+
+    def translate_many(self, texts, policy=None, latency_budget_ms=None):
+        """Translates several phrases in one request, so the worker can batch them."""
+        payload = {"texts": list(texts)}
+        if policy:
+            payload["policy"] = policy
+        if latency_budget_ms is not None:
+            payload["latency_budget_ms"] = latency_budget_ms
+        return self.request(payload)["translations"]
+
+    def close(self):
+        self._reader.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,43 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.batch_translator import BatchTranslator
+
+
+class RecordingTranslateFn:
+    """Stands in for the model: records each call and echoes the texts back."""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, texts, **settings):
+        with self._lock:
+            self.calls.append((list(texts), settings))
+        return [text.upper() for text in texts]
+
+
+def test_mixed_length_texts_share_one_call():
+    translate_fn = RecordingTranslateFn()
+    translator = BatchTranslator(translate_fn, max_batch_size=8, max_wait_ms=200)
+    texts = ["a", "bb cc", "dd ee ff", "gg hh ii jj", "kk ll mm nn oo", "pp qq rr ss tt uu"]
+    # Per-text settings as the decoding policy picks them: same beams, a max_length per length
+    settings = [{"num_beams": 5, "early_stopping": True, "max_length": 12 + 2 * i} for i in range(len(texts))]
+
+    assert translator.translate_many(texts, settings, timeout=5) == [text.upper() for text in texts]
+    assert len(translate_fn.calls) == 1
+    called_texts, called_settings = translate_fn.calls[0]
+    assert called_texts == texts
+    assert called_settings == {"num_beams": 5, "early_stopping": True, "max_length": 22}
+    assert translator.stats()["batch_size_distribution"] == {"6": 1}
+
+
+def test_different_beams_are_not_mixed():
+    translate_fn = RecordingTranslateFn()
+    translator = BatchTranslator(translate_fn, max_batch_size=8, max_wait_ms=200)
+    settings = [{"num_beams": 5, "early_stopping": True, "max_length": 20}, {"num_beams": 1, "max_length": 40}]
+
+    translator.translate_many(["short", "long text"], settings, timeout=5)
+    assert sorted(call[1]["num_beams"] for call in translate_fn.calls) == [1, 5]